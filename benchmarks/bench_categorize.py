@@ -0,0 +1,66 @@
+"""
+Benchmark FinDB.categorize_transactions: categorize every transaction of a generated
+ledger (see ledger.py) of N transactions with a few dozen rules, and print transactions
+per second, and the time spent matching alone.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_categorize.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import logging
+import subprocess
+import tempfile
+import time
+
+import fintrackr.testing_utils as utils
+from fintrackr.categorize import CategoryRule, CompiledRules
+
+from ledger import generate_ledger, write_statement_exports
+
+def bench_rules(n_rules: int = 40) -> list[CategoryRule]:
+    """
+    Substring, regex and amount-range rules, in the proportions a real rules file might have;
+    some match the ledger's descriptions and most don't.
+    """
+    rules = [CategoryRule(label="income", min_amount=0.01)]
+    rules += [CategoryRule(label=f"merchant_{i}", contains=[f"REF{i:04d}", f"STORE {i}"]) for i in range(n_rules // 2)]
+    rules += [CategoryRule(label=f"pattern_{i}", pattern=rf"x{i:03d}\d") for i in range(n_rules // 4)]
+    rules += [CategoryRule(label=f"range_{i}", min_amount=-100.0 * (i + 1), max_amount=-100.0 * i) for i in range(n_rules // 4)]
+    return rules
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+    logging.getLogger().setLevel(logging.WARNING)
+    rules = bench_rules()
+
+    for n in sizes:
+        params = utils.config_params()
+        FinDB = utils.set_up_test_DB(params=params)
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for name, accnt in generate_ledger(n_transactions=n, n_accounts=1).items():
+                    paths = write_statement_exports(accnt, os.path.join(tmp_dir, name), overlap_days=0)
+                    FinDB.add_transactions_many(paths=paths, source_info=name)
+                    start = time.perf_counter()
+                    CompiledRules(rules).match(accnt.descriptions, accnt.cents)
+                    match_seconds = time.perf_counter() - start
+            FinDB._execute_action("ANALYZE;")
+
+            start = time.perf_counter()
+            categorized = FinDB.categorize_transactions(rules=rules, categorization="bench")
+            seconds = time.perf_counter() - start
+            total = FinDB.execute_query("SELECT count(*) FROM transactions;")[0][0]
+            print(f"rows: {total:>10,}  categorized {categorized:>10,} in {seconds:6.2f} s  {total / seconds:12,.0f} rows/s  "
+                  f"(matching alone: {match_seconds:5.2f} s)")
+        finally:
+            FinDB.close()
+            subprocess.run(["dropdb", params["test_db_name"]])
+            subprocess.run(["dropuser", params["user"]])
+            subprocess.run(["dropuser", params["test_owner"]])
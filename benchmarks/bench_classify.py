@@ -0,0 +1,68 @@
+"""
+Benchmark the naive Bayes classifier (fintrackr.classify): train on a generated ledger (see
+ledger.py) of N transactions labeled by merchant, and print training time, held-out accuracy
+and labeling speed; then label every transaction in the db with FinDB.classify_transactions
+and print transactions per second.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_classify.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import logging
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+import fintrackr.testing_utils as utils
+from fintrackr.classify import fit_and_evaluate
+
+from ledger import MERCHANTS, RECURRING, generate_ledger, write_statement_exports
+
+# A label per merchant; several merchants share one, as categories do
+LABELS = {merchant: ("groceries", "eating out", "transport", "shopping", "health")[i % 5] for i, merchant in enumerate(MERCHANTS)}
+LABELS.update({desc: desc.split()[0].lower() for desc, _, _, _ in RECURRING})
+
+def ledger_labels(descriptions: np.ndarray) -> np.ndarray:
+    """
+    Label of each generated description, from the merchant it starts with.
+    """
+    labels = np.empty(len(descriptions), dtype=object)
+    for name, label in LABELS.items():
+        labels[np.char.startswith(descriptions.astype(str), name)] = label
+    return labels
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for n in sizes:
+        params = utils.config_params()
+        FinDB = utils.set_up_test_DB(params=params)
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for name, accnt in generate_ledger(n_transactions=n, n_accounts=1).items():
+                    paths = write_statement_exports(accnt, os.path.join(tmp_dir, name), overlap_days=0)
+                    FinDB.add_transactions_many(paths=paths, source_info=name)
+                    model, report = fit_and_evaluate(accnt.descriptions, accnt.cents, ledger_labels(accnt.descriptions))
+            FinDB._execute_action("ANALYZE;")
+
+            start = time.perf_counter()
+            classified = FinDB.classify_transactions(model=model, categorization="bench")
+            seconds = time.perf_counter() - start
+            total = FinDB.execute_query("SELECT count(*) FROM transactions;")[0][0]
+            print(f"rows: {total:>10,}  train {report.train_seconds:5.2f} s  held-out accuracy {report.accuracy:6.1%}  "
+                  f"predict {report.predict_rows_per_second:12,.0f} rows/s  "
+                  f"classified {classified:>10,} in {seconds:6.2f} s  {total / seconds:12,.0f} rows/s")
+        finally:
+            FinDB.close()
+            subprocess.run(["dropdb", params["test_db_name"]])
+            subprocess.run(["dropuser", params["user"]])
+            subprocess.run(["dropuser", params["test_owner"]])
@@ -0,0 +1,123 @@
+"""
+EXPLAIN ANALYZE the query behind data_from_date_range (one account, one month) on a
+transactions table with N rows spread over many accounts: first as it was before
+transactions.data_source_id and its indexes (joining through data_load_metadata, no
+indexes), then as it is now. Prints the scans used on transactions and the execution times.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_date_range_indexes.py [N ...]
+
+N defaults to 1000000 10000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import json
+import sys
+import subprocess
+import psycopg
+
+import fintrackr.testing_utils as utils
+
+N_ACCOUNTS = 20
+DATE_RANGE = ("2020-03-01", "2020-03-31")
+
+LEGACY_QUERY = """
+    SELECT t.posted_date, t.amount
+    FROM transactions AS t
+    JOIN data_load_metadata AS m ON m.id = t.metadatum_id
+    JOIN data_sources AS s ON s.id = m.data_source_id
+    WHERE t.posted_date BETWEEN %s AND %s
+    AND s.name=%s;
+"""
+
+QUERY = """
+    SELECT t.posted_date, t.amount
+    FROM transactions AS t
+    JOIN data_sources AS s ON s.id = t.data_source_id
+    WHERE t.posted_date BETWEEN %s AND %s
+    AND s.name=%s;
+"""
+
+INDEXES = {
+    "transactions_data_source_id_posted_date_idx": "transactions (data_source_id, posted_date)",
+    "transactions_metadatum_id_idx": "transactions (metadatum_id)",
+    "data_load_metadata_data_source_id_idx": "data_load_metadata (data_source_id)",
+}
+
+def fill_transactions(FinDB, first: int, last: int) -> None:
+    """
+    Add transactions numbered first..last, round robin over N_ACCOUNTS accounts with one
+    data_load_metadata row each, over about 25 years of dates.
+    """
+    FinDB.execute_query("SELECT ensure_transaction_partitions(date '2000-01-01', date '2000-01-01' + 9000);")
+    for a in range(N_ACCOUNTS):
+        source_id = FinDB.add_data_source(f"bench_accnt_{a}")
+        meta_id = FinDB.execute_query(
+            "INSERT INTO data_load_metadata (date_added, username, source, data_source_id) VALUES (now(), %s, %s, %s) RETURNING id;",
+            (FinDB.user, f"bench_fill_{a}_{last}", source_id)
+        )[0][0]
+        FinDB._execute_action(
+            "INSERT INTO transactions (posted_date, amount, description, metadatum_id, data_source_id, fingerprint) "
+            "SELECT d, a, m, " + str(meta_id) + ", " + str(source_id) + ", transaction_fingerprint(d, a, m, 1) "
+            "FROM ( "
+            "    SELECT date '2000-01-01' + (i % 9000) AS d, "
+            "        ((i % 20000) / 100.0 - 100)::numeric::money AS a, "
+            "        'Bench merchant ' || i AS m "
+            "    FROM generate_series(" + str(first + a) + ", " + str(last) + ", " + str(N_ACCOUNTS) + ") AS i "
+            ") AS g;"
+        )
+    FinDB._execute_action("ANALYZE;")
+
+def explain(FinDB, query: str) -> dict:
+    """
+    Scans on transactions (or its partitions) and execution time of query, from EXPLAIN (ANALYZE, FORMAT JSON).
+    """
+    plan = FinDB.execute_query("EXPLAIN (ANALYZE, FORMAT JSON) " + query, (*DATE_RANGE, "bench_accnt_0"))[0][0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+    def walk(node):
+        # Partitions are named transactions_<period>
+        if node.get("Relation Name", "").startswith("transactions"):
+            scans.append(node["Node Type"] + (f" using {node['Index Name']}" if "Index Name" in node else ""))
+        for child in node.get("Plans", []):
+            walk(child)
+    walk(plan[0]["Plan"])
+
+    return {"scans": scans, "execution_ms": plan[0]["Execution Time"]}
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [1_000_000, 10_000_000]
+
+    params = utils.config_params()
+    FinDB = utils.set_up_test_DB(params=params)
+    # Only the owner can drop and create indexes
+    owner = psycopg.connect(f"dbname={params['test_db_name']} user={params['test_owner']} password={params['owner_pw']} host='localhost'", autocommit=True)
+    try:
+        filled = 0
+        for n in sorted(sizes):
+            # Filling is faster without the indexes, and the "before" query needs them gone anyway
+            for name in INDEXES:
+                owner.execute(f"DROP INDEX IF EXISTS {name};")
+            fill_transactions(FinDB, filled + 1, n)
+            filled = n
+            legacy = explain(FinDB, LEGACY_QUERY)
+
+            for name, columns in INDEXES.items():
+                owner.execute(f"CREATE INDEX {name} ON {columns};")
+            owner.execute("ANALYZE;")
+            current = explain(FinDB, QUERY)
+
+            print(f"table rows: {n:>11,}\n"
+                  f"    before: {legacy['execution_ms']:9.1f} ms  {', '.join(legacy['scans'])}\n"
+                  f"    after:  {current['execution_ms']:9.1f} ms  {', '.join(current['scans'])}")
+    finally:
+        owner.close()
+        FinDB.close()
+        subprocess.run(["dropdb", params["test_db_name"]])
+        subprocess.run(["dropuser", params["user"]])
+        subprocess.run(["dropuser", params["test_owner"]])
@@ -0,0 +1,113 @@
+"""
+Benchmark dedup on load: time add_transactions for a small file against a transactions
+table that already holds N rows, and compare with the old LEFT JOIN anti-join.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_dedup.py [N ...]
+
+N defaults to 1000000 10000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+from datetime import date, timedelta
+
+import fintrackr.testing_utils as utils
+
+FILE_ROWS = 1000
+
+LEGACY_ANTI_JOIN = "SELECT s.* " \
+    "    FROM staging s " \
+    "    LEFT JOIN transactions t ON " \
+    "        t.posted_date = s.posted_date AND " \
+    "        t.amount = s.amount AND " \
+    "        t.description = s.description " \
+    "    WHERE t.id IS NULL;"
+
+def fill_transactions(FinDB, first: int, last: int) -> None:
+    """
+    Add transactions numbered first..last (all distinct) in one set-based INSERT.
+    """
+    source_id = FinDB.add_data_source("bench_fill")
+    meta_id = FinDB.execute_query(
+        "INSERT INTO data_load_metadata (date_added, username, source, data_source_id) VALUES (now(), %s, %s, %s) RETURNING id;",
+        (FinDB.user, f"bench_fill_{last}", source_id)
+    )[0][0]
+    FinDB.execute_query("SELECT ensure_transaction_partitions(date '2000-01-01', date '2000-01-01' + 9000);")
+    FinDB._execute_action(
+        "INSERT INTO transactions (posted_date, amount, description, metadatum_id, data_source_id, fingerprint) "
+        "SELECT d, a, m, " + str(meta_id) + ", " + str(source_id) + ", transaction_fingerprint(d, a, m, 1) "
+        "FROM ( "
+        "    SELECT date '2000-01-01' + (i % 9000) AS d, "
+        "        ((i % 20000) / 100.0 - 100)::numeric::money AS a, "
+        "        'Bench merchant ' || i AS m "
+        "    FROM generate_series(" + str(first) + ", " + str(last) + ") AS i "
+        ") AS g;"
+    )
+    FinDB._execute_action("ANALYZE transactions;")
+
+def write_file(path: str, n_rows: int, n_existing: int) -> None:
+    """
+    csv of n_rows transactions, half of which are already in the table.
+    """
+    rng = np.random.default_rng(0)
+    existing = rng.integers(1, n_existing, size=n_rows // 2)
+    with open(path, "w") as f:
+        for i in existing:
+            d = date(2000, 1, 1) + timedelta(days=int(i % 9000))
+            f.write(f"{d},{(i % 20000) / 100.0 - 100:.2f},Bench merchant {i}\n")
+        for i in range(n_rows - len(existing)):
+            f.write(f"2030-01-01,{i / 100.0:.2f},Bench new {i}\n")
+
+def time_load(FinDB, path: str) -> dict:
+    start = time.perf_counter()
+    FinDB.stage_transactions(path_to_transactions=path)
+    staged = time.perf_counter()
+    FinDB.execute_query(LEGACY_ANTI_JOIN)
+    legacy = time.perf_counter()
+    FinDB._execute_action("DROP TABLE staging;")
+
+    start_load = time.perf_counter()
+    inserted = FinDB.add_transactions(path_to_source_file=path, source_info="bench")
+    end = time.perf_counter()
+
+    return {
+        "stage_s": staged - start,
+        "legacy_anti_join_s": legacy - staged,
+        "add_transactions_s": end - start_load,
+        "inserted": inserted,
+    }
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [1_000_000, 10_000_000]
+
+    params = utils.config_params()
+    FinDB = utils.set_up_test_DB(params=params)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filled = 0
+            for n in sorted(sizes):
+                fill_transactions(FinDB, filled + 1, n)
+                filled = n
+                path = os.path.join(tmp_dir, f"bench_{n}.csv")
+                write_file(path, FILE_ROWS, n)
+                result = time_load(FinDB, path)
+                # Remove what was just loaded so the next size starts from a clean table
+                FinDB._execute_action("DELETE FROM transactions WHERE description LIKE 'Bench new %';")
+                print(f"table rows: {n:>11,}  file rows: {FILE_ROWS}  "
+                      f"legacy anti-join: {result['legacy_anti_join_s']*1000:9.1f} ms  "
+                      f"add_transactions (total): {result['add_transactions_s']*1000:8.1f} ms  "
+                      f"inserted: {result['inserted']}")
+    finally:
+        FinDB.close()
+        subprocess.run(["dropdb", params["test_db_name"]])
+        subprocess.run(["dropuser", params["user"]])
+        subprocess.run(["dropuser", params["test_owner"]])
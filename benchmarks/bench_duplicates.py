@@ -0,0 +1,84 @@
+"""
+Benchmark fuzzy duplicate detection: fintrackr.duplicates.find_duplicates on N random
+transactions in monthly statements of four accounts, with the last week of each statement
+exported again in the next one, some of it a day or two later and with store numbers added,
+printing transactions per second and how many of the re-exports were found; then
+FinDB.find_duplicates on a generated ledger (see ledger.py) of N transactions loaded into the db.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_duplicates.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import logging
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+import fintrackr.testing_utils as utils
+from fintrackr.duplicates import find_duplicates
+
+from ledger import generate_ledger, write_statement_exports
+
+def random_reexports(n: int, seed: int = 0) -> tuple:
+    """
+    Descriptions, days, cents, accounts and loads of n transactions, and the (original,
+    duplicate) index pairs of the re-exports among them.
+    """
+    rng = np.random.default_rng(seed)
+    merchants = np.array([f"MERCHANT {k} {'ABCDEFGHIJ'[k % 10]}{'KLMNOPQRST'[k // 10 % 10]}" for k in range(2_000)], dtype=object)
+    n_original = n * 9 // 10
+    days = rng.integers(0, 5 * 365, size=n_original)
+    cents = -np.round(rng.lognormal(mean=3.0, sigma=1.1, size=n_original) * 100).astype(np.int64) - 1
+    accounts = rng.integers(0, 4, size=n_original)
+    descriptions = merchants[rng.zipf(1.3, size=n_original) % len(merchants)]
+    loads = accounts * 1_000 + days // 30
+
+    # Re-exported in the next statement: the last week of each month, shifted up to 2 days, with store numbers
+    last_week = np.flatnonzero(days % 30 >= 23)
+    chosen = rng.choice(last_week, size=min(n - n_original, len(last_week)), replace=False)
+    shifted = days[chosen] + rng.integers(0, 3, size=len(chosen))
+    numbered = descriptions[chosen] + np.array([f" #{k}" for k in rng.integers(1_000, 9_999, size=len(chosen))], dtype=object)
+    pairs = set(zip(chosen.tolist(), range(n_original, n_original + len(chosen))))
+    return (np.concatenate([descriptions, numbered]), np.concatenate([days, shifted]), np.concatenate([cents, cents[chosen]]),
+            np.concatenate([accounts, accounts[chosen]]), np.concatenate([loads, loads[chosen] + 1]), pairs)
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for n in sizes:
+        descriptions, days, cents, accounts, loads, pairs = random_reexports(n)
+        start = time.perf_counter()
+        found = find_duplicates(descriptions, days, cents, accounts, loads, window_days=3)
+        seconds = time.perf_counter() - start
+        real = len(pairs & set(zip(found["original"].tolist(), found["duplicate"].tolist())))
+        print(f"in memory: {len(days):>10,} rows  {len(found):>8,} duplicates in {seconds:6.2f} s  {len(days) / seconds:12,.0f} rows/s  "
+              f"({real / len(pairs):6.1%} of the real ones)")
+
+        params = utils.config_params()
+        FinDB = utils.set_up_test_DB(params=params)
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for name, accnt in generate_ledger(n_transactions=n, n_accounts=4).items():
+                    paths = write_statement_exports(accnt, os.path.join(tmp_dir, name))
+                    FinDB.add_transactions_many(paths=paths, source_info=name)
+            FinDB._execute_action("ANALYZE;")
+
+            start = time.perf_counter()
+            num_queued, _ = FinDB.find_duplicates(window_days=3)
+            seconds = time.perf_counter() - start
+            total = FinDB.execute_query("SELECT count(*) FROM transactions;")[0][0]
+            print(f"db:        {total:>10,} rows  {num_queued:>8,} queued in {seconds:6.2f} s  {total / seconds:12,.0f} rows/s")
+        finally:
+            FinDB.close()
+            subprocess.run(["dropdb", params["test_db_name"]])
+            subprocess.run(["dropuser", params["user"]])
+            subprocess.run(["dropuser", params["test_owner"]])
@@ -0,0 +1,71 @@
+"""
+Benchmark FinDB._import_file on a csv of N transactions: the old line-at-a-time COPY,
+the block-at-a-time csv COPY, and the binary COPY of rows parsed client-side. Prints
+rows per second for each.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_import_file.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import subprocess
+import tempfile
+import time
+
+import fintrackr.testing_utils as utils
+
+from ledger import generate_ledger, write_statement_exports
+
+def legacy_import(FinDB, dest_table: str, path: str) -> None:
+    with FinDB._conn.cursor() as curs:
+        with open(path, "r") as f:
+            with curs.copy(f"COPY {dest_table} FROM STDIN WITH (FORMAT csv, HEADER false)") as copy:
+                for line in f:
+                    copy.write(line)
+
+def one_file(n: int, tmp_dir: str) -> str:
+    """
+    All of a generated account's transactions in one csv.
+    """
+    accnt = next(iter(generate_ledger(n_transactions=n, n_accounts=1).values()))
+    paths = write_statement_exports(accnt, os.path.join(tmp_dir, str(n)), overlap_days=0)
+    path = os.path.join(tmp_dir, f"all_{n}.csv")
+    with open(path, "w") as out:
+        for p in paths:
+            with open(p, "r") as f:
+                out.write(f.read())
+    return path
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+
+    params = utils.config_params()
+    FinDB = utils.set_up_test_DB(params=params)
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for n in sizes:
+                path = one_file(n, tmp_dir)
+                modes = {
+                    "line at a time": lambda: legacy_import(FinDB, "bench_import", path),
+                    "csv blocks": lambda: FinDB._import_file("bench_import", path),
+                    "binary": lambda: FinDB._import_file("bench_import", path, binary=True),
+                }
+                for name, run in modes.items():
+                    FinDB._execute_action("CREATE TABLE bench_import(posted_date date, amount money, description text);")
+                    start = time.perf_counter()
+                    run()
+                    seconds = time.perf_counter() - start
+                    rows = FinDB.execute_query("SELECT count(*) FROM bench_import;")[0][0]
+                    FinDB._execute_action("DROP TABLE bench_import;")
+                    print(f"rows: {rows:>10,}  {name:<15} {seconds:8.2f} s  {rows / seconds:12,.0f} rows/s")
+    finally:
+        FinDB.close()
+        subprocess.run(["dropdb", params["test_db_name"]])
+        subprocess.run(["dropuser", params["user"]])
+        subprocess.run(["dropuser", params["test_owner"]])
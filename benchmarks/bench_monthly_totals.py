@@ -0,0 +1,75 @@
+"""
+Benchmark the monthly category rollup: on a generated ledger (see ledger.py) of N
+transactions, categorized as expenses or income, time the GROUP BY over the ledger that
+FinDB.monthly_category_totals replaces, building the rollup from scratch, refreshing it after
+loading one more month of statements, and reading it.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_monthly_totals.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import logging
+import subprocess
+import tempfile
+import time
+
+import fintrackr.testing_utils as utils
+from fintrackr.categorize import CategoryRule
+
+from ledger import generate_ledger, write_statement_exports
+
+LEDGER_QUERY = """
+    SELECT t.data_source_id, date_trunc('month', t.posted_date), c.label, sum(t.amount), count(*)
+    FROM spending_transactions t
+    LEFT JOIN (transactions_categories_xref x JOIN categories c ON c.id = x.category_id)
+    ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date
+    GROUP BY 1, 2, 3;
+"""
+
+def timed(f, *args, **kwargs) -> tuple:
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+    logging.getLogger().setLevel(logging.WARNING)
+    rules = [CategoryRule(label="expenses", max_amount=-0.01), CategoryRule(label="income", min_amount=0.01)]
+
+    for n in sizes:
+        params = utils.config_params()
+        FinDB = utils.set_up_test_DB(params=params)
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                last_months = {}
+                for name, accnt in generate_ledger(n_transactions=n, n_accounts=4).items():
+                    paths = write_statement_exports(accnt, os.path.join(tmp_dir, name))
+                    FinDB.add_transactions_many(paths=paths[:-1], source_info=name)
+                    last_months[name] = paths[-1]
+                FinDB.categorize_transactions(rules)
+                FinDB._execute_action("ANALYZE;")
+                total = FinDB.execute_query("SELECT count(*) FROM transactions;")[0][0]
+
+                _, ledger_seconds = timed(FinDB.execute_query, LEDGER_QUERY)
+                months, build_seconds = timed(FinDB.refresh_monthly_totals)
+
+                for name, path in last_months.items():
+                    FinDB.add_transactions_many(paths=[path], source_info=name)
+                FinDB.categorize_transactions(rules)
+                refreshed, refresh_seconds = timed(FinDB.refresh_monthly_totals)
+                totals, read_seconds = timed(FinDB.monthly_category_totals)
+
+            print(f"{total:>10,} rows  GROUP BY over the ledger {ledger_seconds:6.2f} s  build {months} months {build_seconds:6.2f} s  "
+                  f"refresh {refreshed} months {refresh_seconds:6.2f} s  read {len(totals)} rows {read_seconds * 1000:6.1f} ms")
+        finally:
+            FinDB.close()
+            subprocess.run(["dropdb", params["test_db_name"]])
+            subprocess.run(["dropuser", params["user"]])
+            subprocess.run(["dropuser", params["test_owner"]])
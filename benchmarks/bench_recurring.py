@@ -0,0 +1,57 @@
+"""
+Benchmark FinDB.detect_recurring_charges: find the recurring charges of a generated ledger
+(see ledger.py) of N transactions over several accounts, and print transactions per second,
+the time spent detecting alone, and how many of the ledger's recurring charges were found.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_recurring.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import logging
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+import fintrackr.testing_utils as utils
+from fintrackr.recurring import detect_recurring, merchant_keys
+
+from ledger import generate_ledger, write_statement_exports
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for n in sizes:
+        params = utils.config_params()
+        FinDB = utils.set_up_test_DB(params=params)
+        try:
+            detect_seconds = 0.0
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for name, accnt in generate_ledger(n_transactions=n, n_accounts=3).items():
+                    paths = write_statement_exports(accnt, os.path.join(tmp_dir, name), overlap_days=0)
+                    FinDB.add_transactions_many(paths=paths, source_info=name)
+                    start = time.perf_counter()
+                    detect_recurring(merchant_keys(accnt.descriptions), accnt.dates, accnt.cents)
+                    detect_seconds += time.perf_counter() - start
+            FinDB._execute_action("ANALYZE;")
+
+            start = time.perf_counter()
+            groups = FinDB.detect_recurring_charges(categorization=None)
+            seconds = time.perf_counter() - start
+            total = FinDB.execute_query("SELECT count(*) FROM transactions;")[0][0]
+            recurring = groups[groups["frequency"] != "irregular"]
+            print(f"rows: {total:>10,}  {len(groups):>6,} merchants, {len(recurring):>3} recurring in {seconds:6.2f} s  "
+                  f"{total / seconds:12,.0f} rows/s  (detecting alone: {detect_seconds:5.2f} s)")
+        finally:
+            FinDB.close()
+            subprocess.run(["dropdb", params["test_db_name"]])
+            subprocess.run(["dropuser", params["user"]])
+            subprocess.run(["dropuser", params["test_owner"]])
@@ -0,0 +1,56 @@
+"""
+Benchmark the running-balance engine (balances.running_balances) on synthetic
+transactions, and the list-of-Transactions wrapper relative_bal_by_date around it.
+
+No db needed. Run from the repo root:
+
+    python benchmarks/bench_running_balances.py [N ...]
+
+N defaults to 1000000 10000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import sys
+import time
+import numpy as np
+
+from fintrackr.balances import running_balances
+from fintrackr.plot_accnt_balances import relative_bal_by_date
+from fintrackr.utils import Transaction
+
+LIST_PATH_MAX = 1_000_000 # the list wrapper is dominated by making Python objects; don't wait on it past this
+
+def synthetic(n: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    dates = np.datetime64("2015-01-01") + rng.integers(0, 3650, size=n).astype("timedelta64[D]")
+    cents = rng.integers(-50_000, 20_000, size=n, dtype=np.int64)
+    return dates, cents
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [1_000_000, 10_000_000]
+
+    for n in sizes:
+        dates, cents = synthetic(n)
+        ref_date = dates.max() - np.timedelta64(365, "D")
+
+        start = time.perf_counter()
+        running_balances(dates, cents, ref_date=ref_date, ref_cents=500_000)
+        engine_s = time.perf_counter() - start
+
+        # As they come from the db (ORDER BY posted_date)
+        order = np.argsort(dates, kind="stable")
+        sorted_dates, sorted_cents = dates[order], cents[order]
+        start = time.perf_counter()
+        running_balances(sorted_dates, sorted_cents, ref_date=ref_date, ref_cents=500_000)
+        engine_sorted_s = time.perf_counter() - start
+
+        line = f"transactions: {n:>11,}  running_balances: {engine_s*1000:8.1f} ms (unsorted), {engine_sorted_s*1000:8.1f} ms (sorted)"
+
+        if n <= LIST_PATH_MAX:
+            transactions = [Transaction(date=d, amount=a) for d, a in zip(dates.tolist(), (cents / 100).tolist())]
+            start = time.perf_counter()
+            relative_bal_by_date(references=[Transaction(date=ref_date.item(), amount=5000.00)], transactions=transactions)
+            line += f"  relative_bal_by_date (lists): {(time.perf_counter() - start)*1000:8.1f} ms"
+
+        print(line)
@@ -0,0 +1,60 @@
+"""
+Compare memory use and running-balance throughput of a list of Transactions against a
+TransactionBatch holding the same transactions.
+
+No db needed. Run from the repo root:
+
+    python benchmarks/bench_transaction_batch.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from fintrackr.plot_accnt_balances import relative_bal_by_date
+from fintrackr.utils import Transaction, TransactionBatch
+
+def synthetic_rows(n: int, seed: int = 0) -> list[tuple]:
+    """
+    (date, cents) rows sorted by date, as iter_date_range's cursor returns them.
+    """
+    rng = np.random.default_rng(seed)
+    dates = np.sort(np.datetime64("2015-01-01") + rng.integers(0, 3650, size=n).astype("timedelta64[D]"))
+    cents = rng.integers(-50_000, 20_000, size=n, dtype=np.int64)
+    return list(zip(dates.tolist(), cents.tolist()))
+
+def measure(build) -> tuple:
+    """
+    Peak memory (bytes) allocated while building, and the result.
+    """
+    tracemalloc.start()
+    result = build()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, result
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+
+    for n in sizes:
+        rows = synthetic_rows(n)
+        reference = [Transaction(date=rows[n // 2][0], amount=5000.00)]
+
+        list_mem, transactions = measure(lambda: [Transaction(date=d, amount=c / 100) for d, c in rows])
+        batch_mem, batch = measure(lambda: TransactionBatch.from_rows(rows))
+
+        start = time.perf_counter()
+        relative_bal_by_date(references=reference, transactions=transactions)
+        list_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        relative_bal_by_date(references=reference, transactions=batch)
+        batch_s = time.perf_counter() - start
+
+        print(f"transactions: {n:>10,}  memory: list {list_mem/2**20:8.1f} MiB, batch {batch_mem/2**20:6.1f} MiB"
+              f"  relative_bal_by_date: list {list_s*1000:8.1f} ms, batch {batch_s*1000:6.1f} ms")
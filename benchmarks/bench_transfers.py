@@ -0,0 +1,82 @@
+"""
+Benchmark transfer matching: fintrackr.transfers.match_transfers on N random transactions
+over four accounts, a tenth of them the two sides of transfers a few days apart, printing
+transactions per second and how many of the transfers were found; then FinDB.match_transfers
+on a generated ledger (see ledger.py) of N transactions loaded into the db.
+
+Run from the repo root (uses the test db in tests/data/test_config.yml, which is created
+and dropped here, so it must not already exist):
+
+    python benchmarks/bench_transfers.py [N ...]
+
+N defaults to 100000 1000000.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import logging
+import subprocess
+import tempfile
+import time
+import numpy as np
+
+import fintrackr.testing_utils as utils
+from fintrackr.transfers import match_transfers
+
+from ledger import generate_ledger, write_statement_exports
+
+def random_transfers(n: int, seed: int = 0) -> tuple:
+    """
+    Days, cents and accounts of n transactions, and the (expense, income) index pairs of the
+    transfers among them.
+    """
+    rng = np.random.default_rng(seed)
+    n_transfers = n // 20
+    n_other = n - 2 * n_transfers
+    days = rng.integers(0, 5 * 365, size=n_other)
+    cents = -np.round(rng.lognormal(mean=3.0, sigma=1.1, size=n_other) * 100).astype(np.int64) - 1
+    accounts = rng.integers(0, 4, size=n_other)
+
+    t_days = rng.integers(0, 5 * 365, size=n_transfers)
+    t_cents = rng.integers(1_000, 500_000, size=n_transfers)
+    t_from = rng.integers(0, 4, size=n_transfers)
+    t_to = (t_from + rng.integers(1, 4, size=n_transfers)) % 4
+    days = np.concatenate([days, t_days, t_days + rng.integers(0, 4, size=n_transfers)])
+    cents = np.concatenate([cents, -t_cents, t_cents])
+    accounts = np.concatenate([accounts, t_from, t_to])
+    pairs = set(zip(range(n_other, n_other + n_transfers), range(n_other + n_transfers, n_other + 2 * n_transfers)))
+    return days, cents, accounts, pairs
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000]
+    logging.getLogger().setLevel(logging.WARNING)
+
+    for n in sizes:
+        days, cents, accounts, pairs = random_transfers(n)
+        start = time.perf_counter()
+        out_idx, in_idx = match_transfers(days, cents, accounts, window_days=3)
+        seconds = time.perf_counter() - start
+        found = len(pairs & set(zip(out_idx.tolist(), in_idx.tolist())))
+        print(f"in memory: {len(days):>10,} rows  {len(out_idx):>8,} transfers in {seconds:6.2f} s  {len(days) / seconds:12,.0f} rows/s  "
+              f"({found / len(pairs):6.1%} of the real ones)")
+
+        params = utils.config_params()
+        FinDB = utils.set_up_test_DB(params=params)
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for name, accnt in generate_ledger(n_transactions=n, n_accounts=4).items():
+                    paths = write_statement_exports(accnt, os.path.join(tmp_dir, name), overlap_days=0)
+                    FinDB.add_transactions_many(paths=paths, source_info=name)
+            FinDB._execute_action("ANALYZE;")
+
+            start = time.perf_counter()
+            num_transfers = FinDB.match_transfers(window_days=3)
+            seconds = time.perf_counter() - start
+            total = FinDB.execute_query("SELECT count(*) FROM transactions;")[0][0]
+            print(f"db:        {total:>10,} rows  {num_transfers:>8,} transfers in {seconds:6.2f} s  {total / seconds:12,.0f} rows/s")
+        finally:
+            FinDB.close()
+            subprocess.run(["dropdb", params["test_db_name"]])
+            subprocess.run(["dropuser", params["user"]])
+            subprocess.run(["dropuser", params["test_owner"]])
@@ -0,0 +1,52 @@
+"""
+Compare two result files from run_suite.py (e.g. from the base commit and a branch):
+median time of each benchmark at each scale, new / old. Exits with status 1 if anything
+got slower by more than the threshold, so it can gate CI.
+
+Run from anywhere:
+
+    python benchmarks/compare.py <old.json> <new.json> [threshold]
+
+threshold defaults to 0.10 (10% slower).
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import json
+import sys
+
+def load(path: str) -> tuple[dict, dict]:
+    with open(path, "r") as f:
+        run = json.load(f)
+    return run["meta"], {(r["benchmark"], r["scale"]): r for r in run["results"]}
+
+def compare(old: dict, new: dict, threshold: float) -> list[tuple]:
+    """
+    (benchmark, scale, old median, new median, ratio, regressed) for every benchmark in both runs.
+    """
+    rows = []
+    for key in sorted(old.keys() & new.keys(), key=lambda k: (k[1], k[0])):
+        ratio = new[key]["median_s"] / old[key]["median_s"] if old[key]["median_s"] > 0 else float("inf")
+        rows.append((*key, old[key]["median_s"], new[key]["median_s"], ratio, ratio > 1 + threshold))
+    return rows
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        raise TypeError("compare.py takes 2 or 3 input args: (1) old results; (2) new results; (3) threshold (default 0.10)")
+    threshold = float(sys.argv[3]) if len(sys.argv) == 4 else 0.10
+
+    old_meta, old = load(sys.argv[1])
+    new_meta, new = load(sys.argv[2])
+    print(f"old: {old_meta.get('commit')} ({old_meta.get('started')})\nnew: {new_meta.get('commit')} ({new_meta.get('started')})")
+    for key in ("seed", "accounts", "postgres", "platform"):
+        if old_meta.get(key) != new_meta.get(key):
+            print(f"warning: runs differ in {key}: {old_meta.get(key)} vs {new_meta.get(key)}")
+
+    rows = compare(old, new, threshold)
+    if len(rows) == 0:
+        print("No benchmarks at the same scale in both runs")
+    for benchmark, scale, old_s, new_s, ratio, regressed in rows:
+        print(f"{benchmark:<26} {scale:>11,}  {old_s * 1000:10.1f} ms -> {new_s * 1000:10.1f} ms  x{ratio:5.2f}"
+              + ("  REGRESSION" if regressed else ""))
+
+    sys.exit(1 if any(r[-1] for r in rows) else 0)
@@ -0,0 +1,162 @@
+"""
+Seeded generator of realistic multi-account ledgers for the benchmarks: daily spending
+with a long tail of amounts, recurring payroll/rent/subscriptions, genuine repeated
+charges (the same amount at the same merchant twice in a day), month-end balances, and
+monthly statement exports that overlap the previous month, as downloads from a bank
+usually do, so loading all of them exercises dedup.
+
+The same (n_transactions, n_accounts, seed) always gives the same ledger and files.
+
+Every description ends with the account's card/reference number: duplicates are detected by
+date, amount and description regardless of account, so without it the same rent payment in
+two checking accounts would be loaded only once.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import csv
+import os
+import numpy as np
+
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List
+
+MERCHANTS = [
+    "Corner Grocery", "Blue Bottle Coffee", "Shell #4411", "Amazon Mktp US", "Target T-1832",
+    "Hardware Depot", "City Parking", "Thai Basil, Inc.", "Pharmacy 24", "Metro Transit",
+    "Bookshop & Cafe", "Movie Palace", "Pet Supplies Plus", "Farmers Market", "Ride Share *Trip",
+]
+
+# (description, day of month, amount in cents, account types it applies to)
+RECURRING = [
+    ("Payroll ACME Corp", 1, 412_500, ("checking",)),
+    ("Payroll ACME Corp", 15, 412_500, ("checking",)),
+    ("Rent - Oak St Apts", 3, -215_000, ("checking",)),
+    ("Electric Utility Co", 12, -9_870, ("checking",)),
+    ("Streaming Service", 20, -1_599, ("credit",)),
+    ("Gym Membership", 5, -4_500, ("credit",)),
+    ("Interest Paid", 28, 312, ("savings",)),
+]
+
+ACCOUNT_TYPES = ("checking", "credit", "savings")
+
+
+@dataclass
+class AccountLedger:
+    """
+    One account's transactions, in order of date, and its month-end balances.
+    """
+    name: str
+    dates: np.ndarray  # datetime64[D]
+    cents: np.ndarray  # int64
+    descriptions: np.ndarray  # object (str)
+    balances: List[tuple] = field(default_factory=list)  # (date, "123.45")
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+def generate_ledger(n_transactions: int, n_accounts: int = 4, seed: int = 0,
+                    start: date = date(2015, 1, 1), years: int = 5) -> Dict[str, AccountLedger]:
+    """
+    Parameters
+    ----------
+    n_transactions : int
+        About how many transactions in total, over all accounts
+    n_accounts : int
+        Accounts are named <type>_<i>, with types cycling through checking, credit, savings
+    seed : int
+        Seed for numpy's default_rng
+    start : date
+        First day of the ledger
+    years : int
+        Length of the ledger
+
+    Returns
+    -------
+    dict[str, AccountLedger]
+    """
+    rng = np.random.default_rng(seed)
+    first = np.datetime64(start, "D")
+    n_days = years * 365
+    months = np.arange(np.datetime64(start, "M"), np.datetime64(start, "M") + years * 12)
+
+    ledger = {}
+    for a in range(n_accounts):
+        accnt_type = ACCOUNT_TYPES[a % len(ACCOUNT_TYPES)]
+        name = f"{accnt_type}_{a}"
+
+        # Day-to-day spending: lognormal amounts (mostly small, some large), a few refunds
+        n = n_transactions // n_accounts
+        n_repeats = n // 200
+        n_random = max(n - n_repeats - len(months) * len(RECURRING), 1)
+        dates = first + rng.integers(0, n_days, size=n_random).astype("timedelta64[D]")
+        cents = -np.round(rng.lognormal(mean=3.0, sigma=1.1, size=n_random) * 100).astype(np.int64) - 1
+        refunds = rng.random(n_random) < 0.02
+        cents[refunds] = -cents[refunds]
+        merchants = np.array(MERCHANTS, dtype=object)[rng.integers(0, len(MERCHANTS), size=n_random)]
+        # Store numbers make most descriptions distinct, as in real exports
+        descriptions = merchants + " " + rng.integers(100, 999, size=n_random).astype(str).astype(object) + f" x{a:04d}"
+
+        # Recurring charges on fixed days of each month
+        rec = [(m.astype("datetime64[D]") + (day - 1), amount, f"{desc} REF{a:04d}")
+               for m in months for desc, day, amount, types in RECURRING if accnt_type in types]
+        if rec:
+            r_dates, r_cents, r_desc = zip(*rec)
+            dates = np.concatenate([dates, np.array(r_dates, dtype="datetime64[D]")])
+            cents = np.concatenate([cents, np.array(r_cents, dtype=np.int64)])
+            descriptions = np.concatenate([descriptions, np.array(r_desc, dtype=object)])
+
+        # Genuine repeats: identical rows on the same day, which must both be kept
+        repeat = rng.integers(0, len(dates), size=n_repeats)
+        dates = np.concatenate([dates, dates[repeat]])
+        cents = np.concatenate([cents, cents[repeat]])
+        descriptions = np.concatenate([descriptions, descriptions[repeat]])
+
+        order = np.argsort(dates, kind="stable")
+        dates, cents, descriptions = dates[order], cents[order], descriptions[order]
+
+        # Month-end balances, from an opening balance plus the running total
+        opening = int(rng.integers(100_000, 1_000_000))
+        running = opening + np.cumsum(cents)
+        month_ends = (months + 1).astype("datetime64[D]") - 1
+        idx = np.searchsorted(dates, month_ends, side="right") - 1
+        balances = [(d.item(), f"{(running[i] if i >= 0 else opening) / 100:.2f}") for d, i in zip(month_ends, idx)]
+
+        ledger[name] = AccountLedger(name=name, dates=dates, cents=cents, descriptions=descriptions, balances=balances)
+
+    return ledger
+
+
+def write_statement_exports(accnt: AccountLedger, out_dir: str, overlap_days: int = 7) -> List[str]:
+    """
+    Write accnt's transactions as one csv per month (Date as MM/DD/YYYY, Amount, Description;
+    no header), each also repeating the last overlap_days days of the month before.
+
+    Returns
+    -------
+    List[str]
+        Paths, oldest first
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    if len(accnt) == 0:
+        return []
+
+    date_strs = np.datetime_as_string(accnt.dates, unit="D")
+    amount_strs = [f"{c / 100:.2f}" for c in accnt.cents.tolist()]
+
+    months = np.arange(accnt.dates[0].astype("datetime64[M]"), accnt.dates[-1].astype("datetime64[M]") + 1)
+    paths = []
+    for m in months:
+        lo = np.searchsorted(accnt.dates, m.astype("datetime64[D]") - overlap_days)
+        hi = np.searchsorted(accnt.dates, (m + 1).astype("datetime64[D]"))
+        path = os.path.join(out_dir, f"{accnt.name}_{m}.csv")
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            for i in range(lo, hi):
+                y, mo, d = date_strs[i].split("-")
+                writer.writerow((f"{mo}/{d}/{y}", amount_strs[i], accnt.descriptions[i]))
+        paths.append(path)
+
+    return paths
@@ -0,0 +1,74 @@
+"""
+A disposable Postgres cluster for the benchmarks: initdb in a temporary directory, started
+on a free port, and deleted afterwards, so results don't depend on (or disturb) whatever
+server is already running. The PostgreSQL bin directory must be on PATH, and initdb won't
+run as root.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+from contextlib import contextmanager
+from typing import Iterator
+
+def server_version() -> str | None:
+    """
+    server_version of the server libpq connects to by default, or None if it can't be reached.
+    """
+    out = subprocess.run(["psql", "-d", "postgres", "-Atc", "SHOW server_version;"], capture_output=True, text=True)
+    return out.stdout.strip() if out.returncode == 0 else None
+
+@contextmanager
+def temporary_cluster(settings: dict | None = None) -> Iterator[dict]:
+    """
+    Create and start a cluster, and point libpq (PGHOST, PGPORT) and the command line tools
+    at it for the duration of the with block. The cluster trusts every local connection,
+    so the passwords the benchmarks use are accepted but not checked.
+
+    Parameters
+    ----------
+    settings : dict or None
+        Extra server settings, e.g. {"shared_buffers": "1GB"}
+
+    Yields
+    ------
+    dict
+        data_dir, port, and version (server_version) of the running cluster
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="fintrackr_pg_")
+    data_dir = os.path.join(tmp_dir, "data")
+    log_path = os.path.join(tmp_dir, "server.log")
+    saved_env = {k: os.environ.get(k) for k in ("PGHOST", "PGPORT")}
+
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port = s.getsockname()[1]
+
+    options = [f"-p {port}", f"-k {tmp_dir}", "-c listen_addresses=localhost"]
+    options += [f"-c {k}={v}" for k, v in (settings or {}).items()]
+
+    started = False
+    try:
+        subprocess.run(["initdb", "-D", data_dir, "--auth=trust", "--encoding=UTF8", "--locale=C", "--no-sync"],
+                       check=True, capture_output=True)
+        subprocess.run(["pg_ctl", "-D", data_dir, "-l", log_path, "-w", "-o", " ".join(options), "start"],
+                       check=True, capture_output=True)
+        started = True
+
+        os.environ["PGHOST"] = tmp_dir
+        os.environ["PGPORT"] = str(port)
+        yield {"data_dir": data_dir, "port": port, "version": server_version()}
+    finally:
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        if started:
+            subprocess.run(["pg_ctl", "-D", data_dir, "-m", "fast", "-w", "stop"], capture_output=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,187 @@
+"""
+Benchmark suite: time add_transactions, stage_transactions, data_from_date_range,
+relative_bal_by_date and plot_balances on generated ledgers (see ledger.py) at several
+sizes, each in a fresh db, and save the results as JSON so runs on different commits can
+be compared with compare.py.
+
+By default each run gets its own temporary Postgres cluster (see pg_cluster.py); with
+--existing-cluster it uses the server libpq would connect to, like the other benchmarks,
+with the test db in tests/data/test_config.yml (which must not already exist).
+
+Run from the repo root:
+
+    python benchmarks/run_suite.py [--scales N ...] [--accounts A] [--seed S] [--repeat R]
+                                   [--out results.json] [--existing-cluster]
+
+Scales (total transactions over all accounts) default to 10000 100000 1000000. Results go
+to benchmarks/results/<time>_<commit>.json unless --out is given.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os
+# Before anything imports pyplot: plot_balances must not need a display here
+os.environ["MPLBACKEND"] = "Agg"
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import warnings
+
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Callable, List
+
+import matplotlib.pyplot as plt
+import numpy as np
+import psycopg
+
+import fintrackr.testing_utils as utils
+from fintrackr.plot_accnt_balances import plot_balances, relative_bal_by_date
+
+from ledger import generate_ledger, write_statement_exports
+from pg_cluster import server_version, temporary_cluster
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def result(benchmark: str, scale: int, times: List[float], **extra) -> dict:
+    return {
+        "benchmark": benchmark,
+        "scale": scale,
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "times_s": times,
+        **extra,
+    }
+
+def time_calls(fn: Callable[[], object], repeat: int) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+def run_scale(n: int, n_accounts: int, seed: int, repeat: int, tmp_dir: str) -> List[dict]:
+    """
+    Generate a ledger of about n transactions, load it into a new test db, and time each
+    benchmark against it.
+    """
+    ledger = generate_ledger(n_transactions=n, n_accounts=n_accounts, seed=seed)
+    exports = {name: write_statement_exports(accnt, os.path.join(tmp_dir, f"exports_{n}")) for name, accnt in ledger.items()}
+    expected_rows = sum(len(accnt) for accnt in ledger.values())
+    print(f"scale {n:,}: {expected_rows:,} transactions in {sum(len(p) for p in exports.values())} statement files", flush=True)
+
+    params = utils.config_params()
+    FinDB = utils.set_up_test_DB(params=params)
+    results = []
+    try:
+        # Staging alone, for the biggest statement file
+        biggest = max((p for paths in exports.values() for p in paths), key=os.path.getsize)
+        def stage():
+            rows = FinDB.stage_transactions(path_to_transactions=biggest)
+            FinDB._execute_action("DROP TABLE staging;")
+            return rows
+        results.append(result("stage_transactions", n, time_calls(stage, repeat), rows=stage()))
+
+        # Every statement of every account, oldest first; the overlaps are skipped as duplicates
+        times, inserted = [], 0
+        for name, paths in exports.items():
+            for path in paths:
+                start = time.perf_counter()
+                inserted += FinDB.add_transactions(path_to_source_file=path, source_info=name)
+                times.append(time.perf_counter() - start)
+        if inserted != expected_rows:
+            raise ValueError(f"add_transactions inserted {inserted} transactions; the ledger has {expected_rows}")
+        results.append(result("add_transactions", n, times, rows=inserted, files=len(times), total_s=sum(times)))
+
+        for name, accnt in ledger.items():
+            for bal_date, bal_amt in accnt.balances:
+                FinDB.add_balance(accnt=name, bal_date=bal_date, bal_amt=bal_amt)
+        FinDB._execute_action("ANALYZE;")
+
+        # One year of one account, and the whole ledger of the same account
+        accnt = next(iter(ledger.values()))
+        year = [accnt.dates[0].item(), accnt.dates[0].item().replace(year=accnt.dates[0].item().year + 1)]
+        everything = [accnt.dates[0].item(), accnt.dates[-1].item()]
+        data = FinDB.data_from_date_range(data_source=accnt.name, date_range=list(year))
+        results.append(result("data_from_date_range", n,
+                              time_calls(lambda: FinDB.data_from_date_range(data_source=accnt.name, date_range=list(year)), repeat),
+                              rows=len(data["transactions"]), days=(year[1] - year[0]).days))
+        data = FinDB.data_from_date_range(data_source=accnt.name, date_range=list(everything))
+        results.append(result("data_from_date_range_all", n,
+                              time_calls(lambda: FinDB.data_from_date_range(data_source=accnt.name, date_range=list(everything)), repeat),
+                              rows=len(data["transactions"]), days=(everything[1] - everything[0]).days))
+
+        calculated = relative_bal_by_date(data["balances"], data["transactions"])
+        results.append(result("relative_bal_by_date", n,
+                              time_calls(lambda: relative_bal_by_date(data["balances"], data["transactions"]), repeat),
+                              rows=len(data["transactions"])))
+
+        def plot():
+            with warnings.catch_warnings():
+                # plt.show() warns that Agg can't show anything
+                warnings.simplefilter("ignore", UserWarning)
+                plot_balances(all_balances=data["balances"], calculated_balances=calculated)
+            plt.close("all")
+        results.append(result("plot_balances", n, time_calls(plot, repeat), rows=len(calculated)))
+    finally:
+        FinDB.close()
+        subprocess.run(["dropdb", params["test_db_name"]])
+        subprocess.run(["dropuser", params["user"]])
+        subprocess.run(["dropuser", params["test_owner"]])
+
+    for r in results:
+        print(f"    {r['benchmark']:<26} median {r['median_s'] * 1000:10.1f} ms  (rows: {r.get('rows')})", flush=True)
+    return results
+
+def git_info() -> dict:
+    def git(*args):
+        out = subprocess.run(["git", *args], capture_output=True, text=True)
+        return out.stdout.strip() if out.returncode == 0 else None
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time FinDB and plotting at several ledger sizes")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--accounts", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", default=None)
+    parser.add_argument("--existing-cluster", action="store_true")
+    args = parser.parse_args()
+    # INFO logging from FinDB would be part of what's timed
+    logging.getLogger().setLevel(logging.WARNING)
+
+    meta = {
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        **git_info(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "psycopg": psycopg.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "accounts": args.accounts,
+        "repeat": args.repeat,
+        "cluster": "existing" if args.existing_cluster else "temporary",
+    }
+
+    results = []
+    with (nullcontext({}) if args.existing_cluster else temporary_cluster()) as cluster:
+        meta["postgres"] = cluster.get("version") or server_version()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for n in args.scales:
+                results.extend(run_scale(n, n_accounts=args.accounts, seed=args.seed, repeat=args.repeat, tmp_dir=tmp_dir))
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}_{(meta['commit'] or 'nogit')[:8]}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2, default=str)
+    print(f"Results written to {out}")
@@ -0,0 +1,273 @@
+# async_fin_db.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+"""
+asyncio version of the parts of FinDB that a service needs: execute_query, add_balance,
+add_transactions and data_from_date_range, on psycopg's AsyncConnection.
+
+Every call borrows a connection from an async pool for just as long as it needs it, so
+independent calls (e.g. reads for several accounts, gathered with asyncio.gather) run
+concurrently on separate connections from one process.
+
+This is the database access layer; business logic should be elsewhere.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import asyncio
+import logging
+import threading
+import uuid
+
+from datetime import date
+from decimal import Decimal
+from typing import List
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool
+
+from fintrackr.fin_db import (ADD_TRANSACTIONS_QUERY, DATE_RANGE_BALANCES_QUERY, DATE_RANGE_TRANSACTIONS_QUERY,
+                              MONEY_OID, FinDB, MoneyCentsBinaryLoader, register_money_loaders)
+from fintrackr.ingest import file_content_hash, read_transactions_file
+from fintrackr.metrics import instrument, log_statement
+from fintrackr.utils import TransactionBatch
+
+logger = logging.getLogger(__name__)
+
+# One pool per set of credentials (and event loop: a pool can only be used from the loop it was opened on)
+_async_pools: dict[tuple[str, int], AsyncConnectionPool] = {}
+_async_pools_lock = threading.Lock()
+
+async def _configure(conn: psycopg.AsyncConnection) -> None:
+    register_money_loaders(conn)
+
+async def get_async_pool(conninfo: str, pool_config: dict | None = None) -> AsyncConnectionPool:
+    """
+    Return the shared async pool for conninfo in the running event loop, creating (and
+    opening) it on first use. See fin_db.get_pool for pool_config; "enabled" is ignored,
+    since AsyncFinDB always uses a pool.
+    """
+    pool_config = pool_config or {}
+    key = (conninfo, id(asyncio.get_running_loop()))
+    with _async_pools_lock:
+        pool = _async_pools.get(key)
+        if pool is None:
+            pool = AsyncConnectionPool(
+                conninfo,
+                min_size=pool_config.get("min_size", 1),
+                max_size=pool_config.get("max_size", 4),
+                max_idle=pool_config.get("max_idle", 300),
+                check=AsyncConnectionPool.check_connection if pool_config.get("check", True) else None,
+                kwargs={"autocommit": True},
+                configure=_configure,
+                open=False,
+            )
+            _async_pools[key] = pool
+    await pool.open()
+    return pool
+
+async def close_async_pools() -> None:
+    """
+    Close the shared async pools of the running event loop. Safe to call more than once.
+    """
+    loop_id = id(asyncio.get_running_loop())
+    with _async_pools_lock:
+        pools = [key for key in _async_pools if key[1] == loop_id]
+        pools = [_async_pools.pop(key) for key in pools]
+    for pool in pools:
+        await pool.close()
+
+class AsyncFinDB:
+    """
+    Create with `await AsyncFinDB.connect(...)`, and `await close()` when done (or use
+    `async with`).
+    """
+
+    def __init__(self, user: str, pw: str, pool: AsyncConnectionPool):
+        self.user = user
+        self.pw = pw
+        self._pool = pool
+
+    @classmethod
+    async def connect(cls, user: str, pw: str, db_name: str = "fin_db", pool_config: dict | None = None) -> "AsyncFinDB":
+        """
+        Parameters
+        ----------
+        user, pw : str
+            Credentials to connect to the db with
+        db_name : str
+            db to connect to
+        pool_config : dict or None
+            The "pool" section of config.yml (sizes etc.). AsyncFinDBs with the same
+            credentials in the same event loop share one pool.
+        """
+        conninfo = f"dbname={db_name} user={user} password={pw} host='localhost'"
+        return cls(user=user, pw=pw, pool=await get_async_pool(conninfo, pool_config))
+
+    async def close(self) -> None:
+        # The pool is shared, so it's left open for other AsyncFinDBs; see close_async_pools
+        self._pool = None
+
+    async def __aenter__(self) -> "AsyncFinDB":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def execute_query(self, query: str, vals: tuple = (), operation: str = "query") -> List[tuple] | None:
+        """
+        As FinDB.execute_query: the result of a fetchall, or None if the query failed (the
+        error is logged) or returns no rows to fetch. Timings include any wait for the event loop.
+        """
+        response = None
+
+        async with self._pool.connection() as conn, conn.cursor() as curs:
+            log_statement(logger, query, vals)
+            try:
+                with instrument(operation) as m:
+                    await curs.execute(query, vals)
+                    m.rows = max(curs.rowcount, 0)
+                response = await curs.fetchall()
+            except Exception as e:
+                logger.debug(f"Query did not complete with exception: {e}")
+
+        return response
+
+    async def _fetch_batch(self, query: str, vals: tuple = (), operation: str = "date_range_fetch") -> TransactionBatch:
+        """
+        As FinDB._fetch_batch: (date, money) rows into a TransactionBatch, with money fetched as int cents.
+        """
+        async with self._pool.connection() as conn, conn.cursor(binary=True) as curs:
+            curs.adapters.register_loader(MONEY_OID, MoneyCentsBinaryLoader)
+            log_statement(logger, query, vals)
+            try:
+                with instrument(operation) as m:
+                    await curs.execute(query, vals)
+                    batch = TransactionBatch.from_rows(await curs.fetchall())
+                    m.rows = len(batch)
+                return batch
+            except Exception as e:
+                logger.debug(f"Query did not complete with exception: {e}")
+                raise ValueError(f"Query did not complete with exception: {e}")
+
+    async def add_data_source(self, source_name: str) -> int:
+        """
+        As FinDB.add_data_source: id of the data source named source_name, added if it doesn't exist.
+        """
+        source_name_tuple = await self.execute_query(
+            "INSERT INTO data_sources (name) VALUES (%s) ON CONFLICT (name) DO NOTHING RETURNING id;", (source_name,)
+        )
+        if source_name_tuple:
+            logger.info(f"Account name {source_name} didn't exist; added to table data_sources")
+            return source_name_tuple[0][0]
+
+        source_name_tuple = await self.execute_query("SELECT id FROM data_sources WHERE name=%s;", (source_name,))
+        if not source_name_tuple:
+            logger.error(f"Could not insert new data source in data_sources table; query returned {source_name_tuple}")
+            raise ValueError("Could not insert new data source in data_sources table")
+        return source_name_tuple[0][0]
+
+    async def add_balance(self, accnt: str, bal_date: date, bal_amt: str) -> int:
+        """
+        As FinDB.add_balance: log a balance in the db, returning 1 if it was added or 0 if
+        it was already there.
+        """
+        bal_amt = str(Decimal(bal_amt).quantize(Decimal('0.01')))
+
+        accnt_id = await self.add_data_source(source_name=accnt)
+
+        rows_added = await self.execute_query(
+            "INSERT INTO balances (accnt_id, date, amount) VALUES (%s, %s, %s) ON CONFLICT DO NOTHING RETURNING id;",
+            (accnt_id, bal_date, bal_amt), operation="add_balance"
+        )
+        if rows_added is None:
+            raise ValueError(f"Insertion into balances table failed for account {accnt_id}")
+        if len(rows_added) == 0:
+            logger.info(f"No rows added to balances table; balance of {bal_amt} on date {bal_date} for account {accnt_id} already exists")
+        return len(rows_added)
+
+    async def add_transactions(self, path_to_source_file: str, source_info: str) -> int:
+        """
+        As FinDB.add_transactions: load new transactions from a csv, skipping any already in
+        the db. The file is read and validated in a thread, so the event loop isn't blocked,
+        and staged in a temporary table private to this call.
+
+        Returns
+        -------
+        int
+            Number of transactions added (0 if this file was loaded before, or if it's
+            missing, not a csv or malformed; the problem is logged).
+        """
+        try:
+            num_rows, block = await asyncio.to_thread(read_transactions_file, path_to_source_file)
+        except ValueError as e:
+            logger.error(f"Failed to read {path_to_source_file}: {e}")
+            return 0
+        if num_rows == 0:
+            logger.info("No transactions in source file; no transactions will be added")
+            return 0
+
+        content_hash = await asyncio.to_thread(file_content_hash, path_to_source_file)
+        loaded_as = await self.execute_query("SELECT source FROM data_load_metadata WHERE content_hash=%s;", (content_hash,),
+                                             operation="content_hash_check")
+        if loaded_as:
+            logger.info(f"{path_to_source_file} has the same contents as {loaded_as[0][0]}, which was already loaded; skipping")
+            return 0
+
+        source_info_id = await self.add_data_source(source_info)
+
+        staging = f"staging_{uuid.uuid4().hex}"
+        async with self._pool.connection() as conn:
+            # Temporary tables belong to a session, so staging, COPY and insert share this connection
+            await conn.execute(f"CREATE TEMPORARY TABLE {staging}(file_id integer, posted_date date, amount money, description text);")
+            try:
+                with instrument("stage") as m:
+                    async with conn.cursor().copy(f"COPY {staging} FROM STDIN WITH (FORMAT csv);") as copy:
+                        await copy.write(block)
+                    m.rows = num_rows
+                    m.nbytes = len(block)
+
+                with instrument("ensure_partitions") as m:
+                    curs = await conn.execute(f"SELECT ensure_transaction_partitions(min(posted_date), max(posted_date)) FROM {staging};")
+                    num_created = (await curs.fetchone())[0]
+                    m.rows = max(curs.rowcount, 0)
+                if num_created > 0:
+                    logger.info(f"Created {num_created} new partitions of transactions")
+
+                logger.info(f"Adding transactions from {path_to_source_file}")
+                try:
+                    with instrument("dedup_insert") as m:
+                        curs = await conn.execute(
+                            ADD_TRANSACTIONS_QUERY.format(staging=staging),
+                            (date.today(), self.user, path_to_source_file, content_hash, source_info_id, source_info_id)
+                        )
+                        num_new_transactions = m.rows = len(await curs.fetchall())
+                except psycopg.errors.UniqueViolation:
+                    logger.error(f"{path_to_source_file} has already been loaded")
+                    return 0
+            finally:
+                await conn.execute(f"DROP TABLE IF EXISTS {staging};")
+
+        return num_new_transactions
+
+    async def data_from_date_range(self, data_source: str, date_range: List[date]) -> dict[str, TransactionBatch]:
+        """
+        As FinDB.data_from_date_range; the transactions and balances queries run concurrently.
+
+        Return
+        ------
+        dict[str, TransactionBatch]
+            key = "transactions": All transactions (date, amount) for data_source in date_range
+            key = "balances": any account balances for this data_source in date_range, oldest first
+            None if date_range is malformed
+        """
+        if not FinDB._valid_date_range(date_range):
+            return None
+
+        vals = (date_range[0], date_range[1], data_source)
+        transactions, balances = await asyncio.gather(
+            self._fetch_batch(DATE_RANGE_TRANSACTIONS_QUERY, vals),
+            self._fetch_batch(DATE_RANGE_BALANCES_QUERY, vals),
+        )
+
+        return {"transactions": transactions, "balances": balances}
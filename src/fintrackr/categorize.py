@@ -0,0 +1,284 @@
+"""
+Rule-based categorization of transactions (see FinDB.categorize_transactions).
+
+A rule gives a category label to transactions whose description contains any of some
+substrings and/or matches a regex, and whose amount is within a range. Rules are tried in
+order, and a transaction gets the label of the first one that matches.
+
+Rules with the same amount range are searched for together, as one alternation of their
+patterns (see _RuleGroup): a single left-to-right search finds the leftmost position where
+any of them matches, and only the rules before the one found there are searched for again,
+further right. So a description is usually scanned once per range rather than once per
+rule. This isn't a single automaton: Python's re skips positions whose character can't
+start any of the patterns, but tries the alternatives one after another at the others.
+Descriptions repeat a lot (the same merchants every month), so only distinct descriptions
+are matched, and amounts are checked separately: with array comparisons in match, or in the
+db by FinDB.categorize_transactions, which only sends the db the rules each description
+could get (candidates).
+
+Nothing here touches the db.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import re
+import numpy as np
+import pandas as pd
+import yaml
+
+from dataclasses import dataclass, field
+from typing import IO, Iterator, List, Tuple
+
+from fintrackr.balances import to_cents
+
+logger = logging.getLogger(__name__)
+
+FREQUENCIES = ("irregular", "monthly", "annual") # the recurrance type in schema.sql
+
+# Parts of a regex that depend on its groups' numbers or names: \1 (not an escaped backslash
+# followed by 1), (?P=name), (?(1)...) and named groups
+GROUP_REFERENCE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]|\(\?P=|\(\?\(|\(\?P?<(?![=!])")
+
+
+@dataclass
+class CategoryRule:
+    """
+    Matches transactions whose description contains any of contains (case-insensitive), or
+    matches pattern (a regex, searched case-insensitively), and whose amount is between
+    min_amount and max_amount inclusive (dollars; expenses are negative). Conditions left
+    out always match, so a rule with only an amount range matches every description.
+    frequency and other are stored on the category when it's created.
+
+    pattern is combined with other rules' patterns, so it can't use backreferences,
+    conditionals on groups or named groups (its groups are renumbered).
+    """
+    label: str
+    contains: List[str] = field(default_factory=list)
+    pattern: str | None = None
+    min_amount: float | None = None
+    max_amount: float | None = None
+    frequency: str = "irregular"
+    other: str | None = None
+
+    def text_pattern(self) -> str:
+        """
+        Regex for the description conditions ("" matches any description).
+        """
+        alternatives = [re.escape(s) for s in self.contains]
+        if self.pattern is not None:
+            alternatives.append(f"(?:{self.pattern})")
+        return "|".join(alternatives)
+
+
+def load_rules(path_to_rules: str) -> List[CategoryRule]:
+    """
+    Read rules from a yaml file with a list of rules under "rules", each with the fields
+    of CategoryRule, e.g.
+
+        rules:
+          - label: groceries
+            contains: [safeway, trader joe]
+          - label: subscriptions
+            pattern: "patreon|netflix"
+            frequency: monthly
+          - label: income
+            min_amount: 0
+
+    Raises
+    ------
+    ValueError
+        If a rule has unknown fields, no label, a bad regex (or one that refers to its
+        groups), an unknown frequency, or min_amount above max_amount.
+    """
+    with open(path_to_rules, "r") as rules_file:
+        config = yaml.safe_load(rules_file) or {}
+
+    rules = []
+    for i, spec in enumerate(config.get("rules") or []):
+        if isinstance(spec.get("contains"), str):
+            spec["contains"] = [spec["contains"]]
+        try:
+            rules.append(CategoryRule(**spec))
+        except TypeError as e:
+            raise ValueError(f"Rule {i} in {path_to_rules} is malformed: {e}")
+    validate_rules(rules)
+    return rules
+
+def validate_rules(rules: List[CategoryRule]) -> None:
+    """
+    Raises ValueError for the first rule that can't be compiled.
+    """
+    for i, rule in enumerate(rules):
+        if not rule.label:
+            raise ValueError(f"Rule {i} has no label")
+        if rule.frequency not in FREQUENCIES:
+            raise ValueError(f"Rule {i} ({rule.label}) has frequency {rule.frequency}; must be one of {FREQUENCIES}")
+        if rule.min_amount is not None and rule.max_amount is not None and rule.min_amount > rule.max_amount:
+            raise ValueError(f"Rule {i} ({rule.label}) has min_amount above max_amount")
+        try:
+            re.compile(rule.text_pattern())
+        except re.error as e:
+            raise ValueError(f"Rule {i} ({rule.label}) has a bad pattern: {e}")
+        if rule.pattern is not None and GROUP_REFERENCE.search(rule.pattern):
+            raise ValueError(f"Rule {i} ({rule.label}) has a pattern with a backreference or named group, "
+                             f"which can't be combined with other rules' patterns")
+
+
+class CompiledRules:
+    """
+    Rules compiled for matching many transactions at once.
+    """
+    def __init__(self, rules: List[CategoryRule]):
+        validate_rules(rules)
+        self.rules = list(rules)
+        self.labels = [rule.label for rule in rules]
+
+        # Rules grouped by amount range (in cents; None for no bound), in order within each group
+        groups = {}
+        for i in range(len(rules)):
+            groups.setdefault(self.bounds(i), []).append(i)
+
+        self._groups = []
+        for bounds, indices in groups.items():
+            # Rules after one that matches any description can never be first
+            catch_all = [i for i in indices if rules[i].text_pattern() == ""]
+            if catch_all:
+                indices = [i for i in indices if i <= catch_all[0]]
+            if indices == catch_all[:1]:
+                self._groups.append((bounds, indices[0]))
+            else:
+                self._groups.append((bounds, _RuleGroup([rules[i].text_pattern() for i in indices], indices)))
+
+    def bounds(self, i: int) -> Tuple[int | None, int | None]:
+        """
+        Amount range of rule i in cents (None for no bound).
+        """
+        rule = self.rules[i]
+        return (None if rule.min_amount is None else int(to_cents(rule.min_amount)),
+                None if rule.max_amount is None else int(to_cents(rule.max_amount)))
+
+    def _first_by_group(self, descriptions: np.ndarray) -> Iterator[Tuple[Tuple[int | None, int | None], np.ndarray]]:
+        """
+        For each amount range, the index of the first rule of that range whose description
+        conditions each description matches (len(rules) if none).
+        """
+        no_match = len(self.rules)
+        for bounds, group in self._groups:
+            if isinstance(group, int):
+                # Only an amount range: no need to look at the descriptions
+                yield bounds, np.full(len(descriptions), group, dtype=np.int64)
+            else:
+                yield bounds, np.fromiter((group.first(d, no_match) for d in descriptions),
+                                          dtype=np.int64, count=len(descriptions))
+
+    def candidates(self, descriptions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (position in descriptions, rule index) of the rules each description could get: per
+        amount range, the first rule whose description conditions it matches. Which of them
+        applies depends on the amount; it's the lowest rule index whose range contains it.
+
+        Parameters
+        ----------
+        descriptions : np.ndarray
+            Distinct descriptions (str)
+        """
+        positions, indices = [np.array([], dtype=np.int64)], [np.array([], dtype=np.int64)]
+        for _, first in self._first_by_group(descriptions):
+            found = np.flatnonzero(first < len(self.rules))
+            positions.append(found)
+            indices.append(first[found])
+        return np.concatenate(positions), np.concatenate(indices)
+
+    def match(self, descriptions: np.ndarray, cents: np.ndarray) -> np.ndarray:
+        """
+        Index (into rules) of the first rule each transaction matches, or -1 if none does.
+
+        Parameters
+        ----------
+        descriptions : np.ndarray
+            Descriptions (objects; None counts as "")
+        cents : np.ndarray
+            Amounts as int64 cents
+        """
+        cents = np.asarray(cents, dtype=np.int64)
+        # Each distinct description is matched once
+        codes, uniques = pd.factorize(pd.Series(descriptions, dtype=object).fillna(""), sort=False)
+        no_match = len(self.rules)
+
+        first = np.full(len(cents), no_match, dtype=np.int64)
+        for (lo, hi), by_description in self._first_by_group(uniques):
+            in_range = np.ones(len(cents), dtype=bool)
+            if lo is not None:
+                in_range &= cents >= lo
+            if hi is not None:
+                in_range &= cents <= hi
+            first = np.where(in_range, np.minimum(first, by_description[codes]), first)
+
+        return np.where(first == no_match, -1, first)
+
+class _RuleGroup:
+    """
+    The description conditions of rules with the same amount range, in order, searched for
+    together.
+    """
+    def __init__(self, patterns: List[str], indices: List[int]):
+        self.indices = indices
+        self._patterns = patterns
+        self._searches = {} # k: alternations of the first k patterns, compiled when first needed
+
+    def _search(self, k: int) -> Tuple[re.Pattern, re.Pattern]:
+        """
+        The alternation of the first k patterns, to search for where any of them matches (re
+        can skip ahead to the characters they could start with only if there are no groups),
+        and the same with each in a group, to tell which matched.
+        """
+        if k not in self._searches:
+            anywhere = "|".join(f"(?:{pattern})" for pattern in self._patterns[:k])
+            which = "|".join(f"(?P<r{j}>{pattern})" for j, pattern in enumerate(self._patterns[:k]))
+            self._searches[k] = (re.compile(anywhere, re.IGNORECASE | re.DOTALL), re.compile(which, re.IGNORECASE | re.DOTALL))
+        return self._searches[k]
+
+    def first(self, description: str, no_match: int) -> int:
+        """
+        Index (into rules) of the first rule of the group whose description conditions
+        description matches, or no_match if none does.
+        """
+        # At the leftmost position where any of the first k rules matches, the alternation
+        # picks the first of them that matches there. Only rules before that one can do
+        # better, and only at a later position.
+        k, pos, found = len(self._patterns), 0, None
+        while k > 0:
+            anywhere, which = self._search(k)
+            m = anywhere.search(description, pos)
+            if m is None:
+                break
+            found = k = int(which.match(description, m.start()).lastgroup[1:])
+            pos = m.start() + 1
+        return no_match if found is None else self.indices[found]
+
+
+def iter_description_chunks(f: IO[bytes], chunk_rows: int = 100_000) -> Iterator[np.ndarray]:
+    """
+    Read a one-column csv of descriptions (as FinDB.categorize_transactions reads them with
+    COPY), chunk_rows at a time, as arrays of str ("" for an empty field).
+    """
+    try:
+        for chunk in pd.read_csv(f, header=None, dtype=str, keep_default_na=False, chunksize=chunk_rows):
+            yield chunk[0].to_numpy()
+    except pd.errors.EmptyDataError:
+        return
+
+def candidates_block(compiled: CompiledRules, descriptions: np.ndarray) -> Tuple[int, str]:
+    """
+    compiled.candidates(descriptions) as a csv block of (description, rule index) rows, for
+    COPY ... (FORMAT csv).
+
+    Returns
+    -------
+    Tuple[int, str]
+        Number of rows, and the csv block
+    """
+    positions, indices = compiled.candidates(descriptions)
+    block = pd.DataFrame({"description": descriptions[positions], "rule": indices}).to_csv(index=False, header=False)
+    return len(positions), block
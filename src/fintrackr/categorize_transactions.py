@@ -0,0 +1,65 @@
+"""
+Categorize uncategorized transactions from the command line, with rules from a yaml file
+(see fintrackr.categorize.load_rules and FinDB.categorize_transactions).
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+
+import fintrackr.fin_db
+from fintrackr.categorize import load_rules
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def categorize_transactions(path_to_rules: str, username: str, pw: str, categorization: str = "default") -> int:
+    """
+    Uses the db name in config.yml.
+
+    Parameters
+    ----------
+    path_to_rules : str
+        yaml file of rules, in order of priority
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    categorization : str
+        Name of the categorization to fill (added if it doesn't exist)
+
+    Returns
+    -------
+    int
+        Number of transactions categorized
+    """
+    rules = load_rules(path_to_rules)
+
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        return FinDB.categorize_transactions(rules=rules, categorization=categorization)
+    finally:
+        FinDB.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) not in (4, 5):
+        raise TypeError("categorize_transactions.py takes 3 or 4 input args: (1) rules yaml file; (2) db username; (3) db pw; (4, optional) categorization name (default: default)")
+
+    num_categorized = categorize_transactions(path_to_rules = sys.argv[1], username = sys.argv[2], pw = sys.argv[3],
+                                              categorization = sys.argv[4] if len(sys.argv) == 5 else "default")
+
+    print(f"Categorized {num_categorized} transactions")
@@ -0,0 +1,342 @@
+"""
+Naive Bayes categorization of transactions, learned from transactions that already have a
+category (see FinDB.classify_transactions and train_classifier.py).
+
+Each description is turned into counts of its character n-grams (of the lowercased text,
+padded with a space at each end, so words' starts and ends count too), hashed into a fixed
+number of features, plus one feature for the sign and order of magnitude of the amount. A
+multinomial naive Bayes model is fit to the counts of each label. The features of a whole
+batch of descriptions are hashed at once, with array arithmetic over all their bytes, and
+the scores of every label computed with one bincount per label, so no Python code runs per
+description or per n-gram. Descriptions repeat a lot, so only distinct (description, amount
+bucket) pairs are scored.
+
+The hash is fixed (not Python's hash, which changes between processes), so a saved model
+gives the same features in any process.
+
+Nothing here touches the db.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import time
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass
+from typing import IO, Dict, Iterator, Tuple
+
+from fintrackr.balances import to_cents
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 1 << 16
+NGRAM_RANGE = (2, 4)
+ALPHA = 0.1 # additive (Lidstone) smoothing of feature counts
+AMOUNT_BUCKETS = 16 # sign x order of magnitude of cents (0 to 7, i.e. up to $100,000)
+
+_HASH_MULTIPLIER = np.uint64(0x100000001B3) # FNV prime
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15) # 2**64 / golden ratio, for multiplicative hashing
+MODEL_VERSION = 1
+
+
+def amount_buckets(cents: np.ndarray) -> np.ndarray:
+    """
+    Bucket of each amount: 0-7 for expenses, by order of magnitude of the cents, and 8-15 for income.
+    """
+    cents = np.asarray(cents, dtype=np.int64)
+    magnitude = np.clip(np.floor(np.log10(np.abs(cents) + 1)).astype(np.int64), 0, AMOUNT_BUCKETS // 2 - 1)
+    return magnitude + (cents > 0) * (AMOUNT_BUCKETS // 2)
+
+def ngram_features(descriptions: np.ndarray, n_features: int = N_FEATURES,
+                   ngram_range: Tuple[int, int] = NGRAM_RANGE) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Hashed character n-grams of each description (None counts as ""), as (description index,
+    feature) pairs; one pair per occurrence, so repeated n-grams count more than once.
+
+    Every description's bytes (utf-8) are joined into one array, and the n-grams of each
+    length hashed together: a polynomial hash over n shifted views of the array, with
+    the n-grams that straddle two descriptions dropped.
+
+    Parameters
+    ----------
+    descriptions : np.ndarray
+        of str (object)
+    n_features : int
+        A power of 2
+    ngram_range : Tuple[int, int]
+        Shortest and longest n-grams, in bytes
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        int64 description indices and feature indices in [0, n_features)
+    """
+    bits = int(n_features).bit_length() - 1
+    if n_features < 2 or 1 << bits != n_features:
+        raise ValueError(f"n_features must be a power of 2, not {n_features}")
+
+    encoded = [f" {d.lower() if d else ''} ".encode() for d in descriptions]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    ends = np.cumsum(lengths)
+    owner = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)
+
+    doc_ids, feature_ids = [], []
+    for n in range(ngram_range[0], ngram_range[1] + 1):
+        num = len(data) - n + 1
+        if num <= 0:
+            continue
+        h = np.full(num, n, dtype=np.uint64) # so n-grams of different lengths hash differently
+        for j in range(n):
+            h = h * _HASH_MULTIPLIER + data[j:j + num] # wraps around mod 2**64
+        docs = owner[:num]
+        inside = np.arange(n, num + n, dtype=np.int64) <= ends[docs]
+        doc_ids.append(docs[inside])
+        feature_ids.append(((h[inside] * _HASH_MIX) >> np.uint64(64 - bits)).astype(np.int64))
+
+    if not doc_ids:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(doc_ids), np.concatenate(feature_ids)
+
+def _features(descriptions: np.ndarray, buckets: np.ndarray, n_features: int,
+              ngram_range: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ngram_features plus each description's amount bucket (see amount_buckets), as feature
+    n_features + bucket.
+    """
+    doc_ids, feature_ids = ngram_features(descriptions, n_features=n_features, ngram_range=ngram_range)
+    return (np.concatenate([doc_ids, np.arange(len(descriptions), dtype=np.int64)]),
+            np.concatenate([feature_ids, n_features + buckets]))
+
+
+@dataclass
+class NaiveBayesModel:
+    """
+    Multinomial naive Bayes over hashed n-gram and amount features. Create with fit or load.
+    """
+    labels: np.ndarray # str, one per class
+    class_log_prior: np.ndarray # (n_classes,)
+    feature_log_prob: np.ndarray # (n_classes, n_features + AMOUNT_BUCKETS), float32
+    n_features: int = N_FEATURES
+    ngram_range: Tuple[int, int] = NGRAM_RANGE
+
+    @classmethod
+    def fit(cls, descriptions: np.ndarray, cents: np.ndarray, labels: np.ndarray, alpha: float = ALPHA,
+            n_features: int = N_FEATURES, ngram_range: Tuple[int, int] = NGRAM_RANGE) -> "NaiveBayesModel":
+        """
+        Parameters
+        ----------
+        descriptions : np.ndarray
+            of str (object)
+        cents : np.ndarray
+            int64 amounts
+        labels : np.ndarray
+            Label of each transaction (str)
+        alpha : float
+            Added to every feature's count in every class
+        n_features, ngram_range
+            See ngram_features
+
+        Raises
+        ------
+        ValueError
+            If there are no transactions, or the arrays' lengths differ
+        """
+        if len(descriptions) == 0 or not len(descriptions) == len(cents) == len(labels):
+            raise ValueError(f"Need as many descriptions, amounts and labels, and at least one of each; got "
+                             f"{len(descriptions)}, {len(cents)} and {len(labels)}")
+        classes, y = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        n_total = n_features + AMOUNT_BUCKETS
+
+        doc_ids, feature_ids = _features(descriptions, amount_buckets(cents), n_features, ngram_range)
+        counts = np.bincount(y[doc_ids] * n_total + feature_ids, minlength=len(classes) * n_total)
+        counts = counts.reshape(len(classes), n_total) + alpha
+        feature_log_prob = np.log(counts) - np.log(counts.sum(axis=1, keepdims=True))
+
+        class_counts = np.bincount(y, minlength=len(classes))
+        return cls(labels=classes, class_log_prior=np.log(class_counts / class_counts.sum()),
+                   feature_log_prob=feature_log_prob.astype(np.float32), n_features=n_features,
+                   ngram_range=tuple(ngram_range))
+
+    def _log_posterior(self, descriptions: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+        """
+        (len(descriptions), n_classes) log posterior of each label.
+        """
+        doc_ids, feature_ids = _features(descriptions, buckets, self.n_features, self.ngram_range)
+        scores = np.empty((len(descriptions), len(self.labels)))
+        for c in range(len(self.labels)):
+            scores[:, c] = np.bincount(doc_ids, weights=self.feature_log_prob[c, feature_ids], minlength=len(descriptions))
+        scores += self.class_log_prior
+        scores -= scores.max(axis=1, keepdims=True)
+        return scores - np.log(np.exp(scores).sum(axis=1, keepdims=True))
+
+    def predict(self, descriptions: np.ndarray, cents: np.ndarray, batch_size: int = 100_000) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Most likely label of each transaction, scoring each distinct (description, amount
+        bucket) once, batch_size at a time.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Index into labels (int64) of each transaction's label, and its probability (float64)
+        """
+        if len(descriptions) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        descriptions = np.asarray(descriptions, dtype=object)
+        codes, uniques = pd.factorize(pd.MultiIndex.from_arrays([pd.Series(descriptions).fillna(""), amount_buckets(cents)]))
+        unique_descriptions = uniques.get_level_values(0).to_numpy(dtype=object)
+        unique_buckets = uniques.get_level_values(1).to_numpy(dtype=np.int64)
+
+        best = np.empty(len(uniques), dtype=np.int64)
+        confidence = np.empty(len(uniques))
+        for start in range(0, len(uniques), batch_size):
+            log_posterior = self._log_posterior(unique_descriptions[start:start + batch_size],
+                                                unique_buckets[start:start + batch_size])
+            best[start:start + batch_size] = log_posterior.argmax(axis=1)
+            confidence[start:start + batch_size] = np.exp(log_posterior.max(axis=1))
+        return best[codes], confidence[codes]
+
+    def save(self, path: str) -> None:
+        """
+        Write the model to path, as a .npz (see numpy.savez_compressed).
+        """
+        np.savez_compressed(path, version=MODEL_VERSION, labels=self.labels, class_log_prior=self.class_log_prior,
+                            feature_log_prob=self.feature_log_prob, n_features=self.n_features,
+                            ngram_range=np.array(self.ngram_range))
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesModel":
+        """
+        Read a model written by save.
+
+        Raises
+        ------
+        ValueError
+            If path isn't a model saved by this version of save
+        """
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                if int(f["version"]) != MODEL_VERSION:
+                    raise ValueError(f"{path} is a version {int(f['version'])} model; expected version {MODEL_VERSION}")
+                return cls(labels=f["labels"], class_log_prior=f["class_log_prior"], feature_log_prob=f["feature_log_prob"],
+                           n_features=int(f["n_features"]), ngram_range=tuple(int(n) for n in f["ngram_range"]))
+        except (OSError, KeyError) as e:
+            raise ValueError(f"Could not load a model from {path}: {e}")
+
+
+@dataclass
+class TrainingReport:
+    """
+    How fit_and_evaluate went: sizes, seconds to fit, held-out accuracy and how fast the
+    held-out transactions were labeled.
+    """
+    n_train: int
+    n_test: int
+    n_labels: int
+    train_seconds: float
+    accuracy: float | None # None if nothing was held out
+    predict_rows_per_second: float | None
+
+    def __str__(self) -> str:
+        text = f"Trained on {self.n_train} transactions ({self.n_labels} labels) in {self.train_seconds:.2f} s"
+        if self.accuracy is not None:
+            text += (f"; {self.accuracy:.1%} of {self.n_test} held-out transactions labeled correctly, "
+                     f"at {self.predict_rows_per_second:,.0f} transactions/s")
+        return text
+
+
+def read_labeled_csv(path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Read a csv of labeled transactions: a header, then columns Date, Amount, Label,
+    Recurrence, Description (as in tests/data/test_data_cc_labeled.csv). Rows with no label
+    are left out.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        Descriptions (str), amounts in cents (int64) and labels (str)
+
+    Raises
+    ------
+    ValueError
+        If the file can't be read, has fewer than 5 columns or an amount isn't a number
+    """
+    try:
+        df = pd.read_csv(path, header=0, usecols=[1, 2, 4], names=["amount", "label", "description"],
+                         dtype=str, keep_default_na=False)
+        cents = to_cents(df["amount"].to_numpy())
+    except (OSError, ValueError, pd.errors.ParserError) as e:
+        raise ValueError(f"Could not read labeled transactions from {path}: {e}")
+
+    labeled = (df["label"].str.strip() != "").to_numpy()
+    return (df["description"].str.strip().to_numpy(dtype=object)[labeled], cents[labeled],
+            df["label"].str.strip().to_numpy(dtype=object)[labeled])
+
+def fit_and_evaluate(descriptions: np.ndarray, cents: np.ndarray, labels: np.ndarray, test_fraction: float = 0.2,
+                     seed: int = 0, **fit_kwargs) -> Tuple[NaiveBayesModel, TrainingReport]:
+    """
+    Fit a model to a random (seeded) 1 - test_fraction of the transactions and label the rest
+    with it, then fit the model returned to all of them.
+
+    Returns
+    -------
+    Tuple[NaiveBayesModel, TrainingReport]
+    """
+    labels = np.asarray(labels, dtype=object)
+    order = np.random.default_rng(seed).permutation(len(labels))
+    n_test = int(len(labels) * test_fraction)
+    test, train = order[:n_test], order[n_test:]
+
+    start = time.perf_counter()
+    model = NaiveBayesModel.fit(descriptions[train], cents[train], labels[train], **fit_kwargs)
+    train_seconds = time.perf_counter() - start
+
+    accuracy = rate = None
+    if n_test > 0:
+        start = time.perf_counter()
+        predicted, _ = model.predict(descriptions[test], cents[test])
+        rate = n_test / max(time.perf_counter() - start, 1e-9)
+        accuracy = float(np.mean(model.labels[predicted] == labels[test].astype(str)))
+
+    if n_test > 0:
+        model = NaiveBayesModel.fit(descriptions, cents, labels, **fit_kwargs)
+    report = TrainingReport(n_train=len(train), n_test=n_test, n_labels=len(model.labels), train_seconds=train_seconds,
+                            accuracy=accuracy, predict_rows_per_second=rate)
+    logger.info(str(report))
+    return model, report
+
+def iter_copied_chunks(f: IO[bytes], columns: Dict[str, type], chunk_rows: int = 100_000) -> Iterator[pd.DataFrame]:
+    """
+    Read a csv written by COPY ... TO STDOUT WITH (FORMAT csv) (as FinDB.classify_transactions
+    and FinDB.labeled_transactions read them), chunk_rows at a time, with the columns named and
+    typed by columns (str columns have "" for an empty field).
+    """
+    try:
+        yield from pd.read_csv(f, header=None, names=list(columns), dtype=columns, keep_default_na=False, chunksize=chunk_rows)
+    except pd.errors.EmptyDataError:
+        return
+
+def labels_block(model: NaiveBayesModel, descriptions: np.ndarray, cents: np.ndarray, category_ids: np.ndarray,
+                 min_confidence: float = 0.0) -> Tuple[int, str]:
+    """
+    The category id of model's label for each transaction whose label has at least
+    min_confidence probability, as a csv block of (description, cents, category id) rows, for
+    COPY ... (FORMAT csv).
+
+    Parameters
+    ----------
+    category_ids : np.ndarray
+        id of the category of each of model.labels
+
+    Returns
+    -------
+    Tuple[int, str]
+        Number of rows, and the csv block
+    """
+    best, confidence = model.predict(descriptions, cents)
+    confident = confidence >= min_confidence
+    block = pd.DataFrame({"description": descriptions[confident], "cents": cents[confident],
+                          "category_id": category_ids[best[confident]]}).to_csv(index=False, header=False)
+    return int(confident.sum()), block
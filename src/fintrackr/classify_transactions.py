@@ -0,0 +1,70 @@
+"""
+Categorize uncategorized transactions from the command line with a classifier trained by
+train_classifier.py (see fintrackr.classify and FinDB.classify_transactions).
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import time
+import yaml
+import os, sys
+
+import fintrackr.fin_db
+from fintrackr.classify import NaiveBayesModel
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def classify_transactions(path_to_model: str, username: str, pw: str, categorization: str = "default") -> int:
+    """
+    Uses the db name and classifier.min_confidence in config.yml.
+
+    Parameters
+    ----------
+    path_to_model : str
+        Model saved by train_classifier.py
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    categorization : str
+        Name of the categorization to fill (added if it doesn't exist)
+
+    Returns
+    -------
+    int
+        Number of transactions categorized
+    """
+    model = NaiveBayesModel.load(path_to_model)
+
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+        min_confidence = (config.get("classifier") or {}).get("min_confidence", 0.0)
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        return FinDB.classify_transactions(model=model, categorization=categorization, min_confidence=min_confidence)
+    finally:
+        FinDB.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) not in (4, 5):
+        raise TypeError("classify_transactions.py takes 3 or 4 input args: (1) model file; (2) db username; (3) db pw; "
+                        "(4, optional) categorization name (default: default)")
+
+    start = time.perf_counter()
+    num_categorized = classify_transactions(path_to_model = sys.argv[1], username = sys.argv[2], pw = sys.argv[3],
+                                            categorization = sys.argv[4] if len(sys.argv) == 5 else "default")
+    seconds = time.perf_counter() - start
+
+    print(f"Categorized {num_categorized} transactions in {seconds:.2f} s")
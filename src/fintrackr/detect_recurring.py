@@ -0,0 +1,66 @@
+"""
+Find recurring charges from the command line (see fintrackr.recurring and
+FinDB.detect_recurring_charges), print them, and set the frequencies of a categorization's
+categories to match.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+import pandas as pd
+
+import fintrackr.fin_db
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def detect_recurring(username: str, pw: str, categorization: str = "default") -> pd.DataFrame:
+    """
+    Uses the db name in config.yml.
+
+    Parameters
+    ----------
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    categorization : str
+        Name of the categorization whose categories' frequencies are set
+
+    Returns
+    -------
+    pd.DataFrame
+        The monthly and annual charges (see FinDB.detect_recurring_charges), most confident first
+    """
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        groups = FinDB.detect_recurring_charges(categorization=categorization)
+    finally:
+        FinDB.close()
+
+    recurring = groups[groups["frequency"] != "irregular"]
+    return recurring.sort_values("confidence", ascending=False, kind="stable").reset_index(drop=True)
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) not in (3, 4):
+        raise TypeError("detect_recurring.py takes 2 or 3 input args: (1) db username; (2) db pw; "
+                        "(3, optional) categorization name (default: default)")
+
+    recurring = detect_recurring(username = sys.argv[1], pw = sys.argv[2],
+                                 categorization = sys.argv[3] if len(sys.argv) == 4 else "default")
+
+    print(recurring[["account", "merchant", "frequency", "confidence", "num_charges", "median_interval"]].to_string(index=False))
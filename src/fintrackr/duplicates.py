@@ -0,0 +1,163 @@
+"""
+Detection of duplicate transactions that exact dedup misses (see FinDB.find_duplicates): a
+bank's later export of a period may show a transaction posted a day or two later, or with a
+slightly different description (e.g. "Safeway" then "SAFEWAY #1234"), so it isn't recognized
+as the same transaction when it's loaded again.
+
+Transactions are blocked by (account, amount), and sorted by day within each block, so the
+candidates for each transaction are a contiguous run of the ones after it, up to window_days
+later, found with a binary search; only those pairs are compared, so the work grows with the
+number of transactions rather than pairs of them. Pairs from the same load are left out (a
+file doesn't list a transaction twice), as are pairs where either transaction's day is
+outside the other load's range of days: a re-export can only repeat the part of a period
+both files cover. The rest are scored by the similarity of their descriptions: the Jaccard
+similarity of the sets of character bigrams and trigrams of their merchant keys (see
+recurring.merchant_keys), computed for all pairs at once with array operations.
+
+Nothing here touches the db.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+
+from typing import Tuple
+
+from fintrackr.classify import ngram_features
+from fintrackr.recurring import merchant_keys
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS = 3
+MIN_SIMILARITY = 0.5
+SIMILARITY_NGRAMS = (2, 3)
+_SIMILARITY_FEATURES = 1 << 24 # few enough collisions not to matter for one pair's n-grams
+
+
+def description_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Jaccard similarity (0 to 1) of the character bigrams and trigrams of the merchant keys of
+    each pair of descriptions a[i], b[i]; 1 if the keys are the same.
+    """
+    if len(a) == 0:
+        return np.zeros(0)
+    keys = merchant_keys(np.concatenate([np.asarray(a, dtype=object), np.asarray(b, dtype=object)]))
+    codes, distinct = pd.factorize(pd.Series(keys, dtype=object))
+    a_codes, b_codes = codes[:len(a)], codes[len(a):]
+    # Each distinct pair of keys is scored once
+    pair_codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([a_codes, b_codes]))
+    pa, pb = pairs.get_level_values(0).to_numpy(), pairs.get_level_values(1).to_numpy()
+
+    # Distinct n-grams of each key, sorted by key: key k's are features[starts[k]:starts[k] + sizes[k]]
+    doc_ids, feature_ids = ngram_features(distinct.to_numpy(dtype=object), n_features=_SIMILARITY_FEATURES,
+                                          ngram_range=SIMILARITY_NGRAMS)
+    unique = np.unique(doc_ids * _SIMILARITY_FEATURES + feature_ids)
+    features = unique % _SIMILARITY_FEATURES
+    sizes = np.bincount(unique // _SIMILARITY_FEATURES, minlength=len(distinct))
+    starts = np.cumsum(sizes) - sizes
+
+    def expand(docs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # (pair, n-gram) for every n-gram of each pair's key docs[pair]
+        counts = sizes[docs]
+        pair = np.repeat(np.arange(len(docs)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return pair, features[np.repeat(starts[docs], counts) + offsets]
+
+    pair_a, features_a = expand(pa)
+    pair_b, features_b = expand(pb)
+    both = np.concatenate([pair_a, pair_b]) * _SIMILARITY_FEATURES + np.concatenate([features_a, features_b])
+    union = np.bincount(np.unique(both) // _SIMILARITY_FEATURES, minlength=len(pa))
+    intersection = sizes[pa] + sizes[pb] - union
+    similarity = np.where(pa == pb, 1.0, intersection / np.maximum(union, 1))
+    return similarity[pair_codes]
+
+def candidate_duplicates(days: np.ndarray, cents: np.ndarray, accounts: np.ndarray, loads: np.ndarray,
+                         window_days: int = WINDOW_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every pair of transactions in the same account with the same amount, at most window_days
+    apart, from different loads, each on a day the other's load covers.
+
+    Parameters
+    ----------
+    days : np.ndarray
+        Dates (datetime64[D]), or days since any fixed day (int)
+    cents : np.ndarray
+        int64 amounts
+    accounts : np.ndarray
+        Account (e.g. data_source_id) of each transaction
+    loads : np.ndarray
+        Load (e.g. metadatum_id, increasing with time) each transaction came from
+    window_days : int
+        Most days apart
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Indices of the transaction from the earlier load (the original) and of the one from
+        the later load (the duplicate) of each pair (int64)
+    """
+    days = np.asarray(days)
+    if np.issubdtype(days.dtype, np.datetime64):
+        days = days.astype("datetime64[D]").astype(np.int64)
+    days = days.astype(np.int64)
+    loads = np.asarray(loads)
+    if len(days) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Blocks of (account, amount), then days within each, as one sortable int64 key
+    blocks, _ = pd.factorize(pd.MultiIndex.from_arrays([np.asarray(accounts), np.asarray(cents, dtype=np.int64)]))
+    first_day = days.min()
+    span = int(days.max() - first_day) + window_days + 1
+    keys = blocks.astype(np.int64) * span + (days - first_day)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    # Each transaction's candidates: the ones after it in order, up to window_days later
+    hi = np.searchsorted(sorted_keys, sorted_keys + window_days, side="right")
+    counts = hi - np.arange(1, len(order) + 1)
+    first = np.repeat(np.arange(len(order)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    i, j = order[first], order[first + 1 + offsets]
+
+    # Days each load covers
+    load_codes, _ = pd.factorize(loads)
+    load_first = np.full(load_codes.max() + 1, np.iinfo(np.int64).max)
+    load_last = np.full(load_codes.max() + 1, np.iinfo(np.int64).min)
+    np.minimum.at(load_first, load_codes, days)
+    np.maximum.at(load_last, load_codes, days)
+
+    li, lj = load_codes[i], load_codes[j]
+    keep = (li != lj) & (days[i] >= load_first[lj]) & (days[i] <= load_last[lj]) & \
+        (days[j] >= load_first[li]) & (days[j] <= load_last[li])
+    i, j = i[keep], j[keep]
+    later = loads[i] > loads[j]
+    return np.where(later, j, i), np.where(later, i, j)
+
+def find_duplicates(descriptions: np.ndarray, days: np.ndarray, cents: np.ndarray, accounts: np.ndarray, loads: np.ndarray,
+                    window_days: int = WINDOW_DAYS, min_similarity: float = MIN_SIMILARITY) -> pd.DataFrame:
+    """
+    Likely duplicates (see candidate_duplicates for the arguments): candidate pairs whose
+    descriptions have at least min_similarity (see description_similarity). A transaction is
+    in at most one pair: the most similar first, then the fewest days apart, then the earliest
+    (by index).
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns original and duplicate (indices) and similarity, most similar first
+    """
+    original, duplicate = candidate_duplicates(days, cents, accounts, loads, window_days=window_days)
+    descriptions = np.asarray(descriptions, dtype=object)
+    similarity = description_similarity(descriptions[original], descriptions[duplicate])
+
+    days = np.asarray(days)
+    if np.issubdtype(days.dtype, np.datetime64):
+        days = days.astype("datetime64[D]").astype(np.int64)
+    pairs = pd.DataFrame({"original": original, "duplicate": duplicate, "similarity": similarity,
+                          "days_apart": np.abs(days[original] - days[duplicate])})
+    pairs = pairs[pairs["similarity"] >= min_similarity]
+    pairs = pairs.sort_values(["similarity", "days_apart", "original", "duplicate"], ascending=[False, True, True, True], kind="stable")
+    pairs = pairs.drop_duplicates("duplicate").drop_duplicates("original")
+    return pairs[["original", "duplicate", "similarity"]].reset_index(drop=True)
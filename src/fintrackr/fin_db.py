@@ -12,37 +12,297 @@ Copyright (c) 2025 Stephanie Johnson
 
 import psycopg
 import logging
+import numpy as np
+import pandas as pd
+import multiprocessing
 import os
-from typing import List
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
 
 from datetime import date
 from decimal import Decimal
 
-from fintrackr.utils import Transaction
+from fintrackr.categorize import CategoryRule, CompiledRules, candidates_block, iter_description_chunks
+from fintrackr.classify import NaiveBayesModel, iter_copied_chunks, labels_block
+from fintrackr.duplicates import MIN_SIMILARITY, WINDOW_DAYS as DUPLICATE_WINDOW_DAYS, find_duplicates
+from fintrackr.ingest import (FileIngestResult, IngestReport, file_content_hash, iter_transaction_chunks, read_transactions_file,
+                              transaction_fingerprints)
+from fintrackr.metrics import instrument, log_statement
+from fintrackr.recurring import MIN_CONFIDENCE, category_frequencies, detect_recurring, merchant_keys
+from fintrackr.transfers import WINDOW_DAYS, match_transfers
+from fintrackr.utils import TransactionBatch
+
+from psycopg.adapt import Loader
+from psycopg.pq import Format
+from psycopg_pool import ConnectionPool
 
 logger = logging.getLogger(__name__)
 DEFAULT_LOGGING_FORMAT = (
     "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
 )
 
+MONEY_OID = psycopg.postgres.types["money"].oid
+
+class MoneyBinaryLoader(Loader):
+    """
+    money in binary format is an int64 count of the smallest currency unit; with the usual
+    two-fractional-digit lc_monetary (including C) that's cents. Loaded as a Decimal in dollars.
+    """
+    format = Format.BINARY
+
+    def load(self, data) -> Decimal:
+        return Decimal(int.from_bytes(data, "big", signed=True)).scaleb(-2)
+
+class MoneyCentsBinaryLoader(Loader):
+    """
+    As MoneyBinaryLoader, but to int cents, for filling arrays (see _fetch_batch).
+    """
+    format = Format.BINARY
+
+    def load(self, data) -> int:
+        return int.from_bytes(data, "big", signed=True)
+
+class MoneyLoader(Loader):
+    """
+    money in text format (e.g. "$5,000.00" or "-$5.00"), to a Decimal; used by execute_query.
+    The text depends on the server's lc_monetary, so reads of many amounts use binary cursors,
+    which use MoneyBinaryLoader (or MoneyCentsBinaryLoader, see _fetch_batch).
+    """
+    def load(self, data) -> Decimal:
+        text = bytes(data).decode()
+        amount = Decimal(re.sub(r"[^0-9.]", "", text))
+        return -amount if text.startswith(("-", "(")) else amount
+
+def register_money_loaders(conn: psycopg.Connection) -> None:
+    """
+    Load money columns on conn as Decimal dollars instead of locale-formatted strings.
+    Also used as the pool's configure callback, so pooled connections get the same loaders.
+    """
+    conn.adapters.register_loader(MONEY_OID, MoneyLoader)
+    conn.adapters.register_loader(MONEY_OID, MoneyBinaryLoader)
+
+# Sizes of what _import_file sends per call to COPY: bytes of csv text, or rows parsed for binary
+IMPORT_BLOCK_SIZE = 1 << 20
+IMPORT_CHUNK_ROWS = 100_000
+
+# Transactions t not yet in a category of a categorization (format with categorization_id)
+UNCATEGORIZED_CONDITION = """
+    NOT EXISTS (
+        SELECT 1
+        FROM transactions_categories_xref AS x
+        JOIN categories AS c ON c.id = x.category_id
+        WHERE x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date
+        AND c.categorization_id = {categorization_id}
+    )
+"""
+
+# COPY ... (FORMAT binary) framing: signature, flags and header extension length; end of data
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + bytes(8)
+COPY_BINARY_TRAILER = b"\xff\xff"
+# Binary format of each amount column type _import_file can fill
+COPY_AMOUNT_TYPES = {"money": ">i8", "double precision": ">f8"}
+PG_EPOCH_DAYS = 10957 # 2000-01-01, day 0 of date in binary format, as days since 1970-01-01
+
+def encode_copy_binary_rows(dates: np.ndarray, cents: np.ndarray, descriptions: np.ndarray, amount_type: str = "money") -> bytes:
+    """
+    (date, amount, text) rows in COPY binary format (without the header and trailer). The
+    fixed-size part of every row is built as one NumPy array; only the descriptions, the one
+    variable-length field, are handled per row. An empty description is sent as NULL, as
+    COPY ... (FORMAT csv) reads an empty field.
+
+    Parameters
+    ----------
+    dates : np.ndarray
+        datetime64[D]
+    cents : np.ndarray
+        int64 amounts in cents
+    descriptions : np.ndarray
+        str
+    amount_type : str
+        Type of the amount column, a key of COPY_AMOUNT_TYPES
+    """
+    text = [d.encode() for d in descriptions.tolist()]
+    # Per row: number of fields, then each field as its length and value
+    row = np.empty(len(text), dtype=[
+        ("n_fields", ">i2"),
+        ("date_len", ">i4"), ("date", ">i4"),
+        ("amount_len", ">i4"), ("amount", COPY_AMOUNT_TYPES[amount_type]),
+        ("text_len", ">i4"),
+    ])
+    row["n_fields"] = 3
+    row["date_len"] = 4
+    row["date"] = dates.astype(np.int64) - PG_EPOCH_DAYS
+    row["amount_len"] = 8
+    row["amount"] = cents if amount_type == "money" else cents / 100
+    text_len = np.fromiter(map(len, text), dtype=np.int64, count=len(text))
+    row["text_len"] = np.where(text_len == 0, -1, text_len) # -1 is NULL, with no value following
+
+    fixed = row.view(f"V{row.dtype.itemsize}").tolist()
+    return b"".join(chain.from_iterable(zip(fixed, text)))
+
+# Queries shared by FinDB and AsyncFinDB
+
+# Duplicates are rejected by the unique index on transactions.fingerprint, so this only
+# touches the rows in {staging} (plus one index probe each, in the partition for its date),
+# not the whole table. Values: date_added, username, source, content_hash, data_source_id (twice)
+_ADD_TRANSACTIONS_SELECT = "WITH meta AS ( " \
+    "    INSERT INTO data_load_metadata " \
+    "        (date_added, username, source, content_hash, data_source_id) " \
+    "    VALUES (%s, %s, %s, %s, %s)" \
+    "    " \
+    "    RETURNING id " \
+    ") " \
+    "INSERT INTO transactions (posted_date, amount, description, metadatum_id, data_source_id, fingerprint) " \
+    "SELECT s.posted_date, s.amount, s.description, meta.id, %s, "
+_ADD_TRANSACTIONS_FROM = " " \
+    "FROM {staging} s, meta " \
+    "ON CONFLICT (fingerprint, posted_date) DO NOTHING " \
+    "RETURNING id;"
+
+ADD_TRANSACTIONS_QUERY = _ADD_TRANSACTIONS_SELECT + \
+    "    transaction_fingerprint(s.posted_date, s.amount, s.description, " \
+    "        row_number() OVER (PARTITION BY s.posted_date, s.amount, s.description))" + \
+    _ADD_TRANSACTIONS_FROM
+
+# For a staging table with the fingerprints already computed (see ingest.transaction_fingerprints)
+ADD_FINGERPRINTED_TRANSACTIONS_QUERY = _ADD_TRANSACTIONS_SELECT + "s.fingerprint" + _ADD_TRANSACTIONS_FROM
+
+# Values for both: start date, end date, account name
+DATE_RANGE_TRANSACTIONS_QUERY = """
+    SELECT t.posted_date, t.amount
+    FROM transactions AS t
+    JOIN data_sources AS s ON s.id = t.data_source_id
+    WHERE t.posted_date BETWEEN %s AND %s
+    AND s.name=%s;
+"""
+
+DATE_RANGE_BALANCES_QUERY = """
+    SELECT date, amount
+    FROM balances
+    WHERE date BETWEEN %s AND %s
+    AND accnt_id = (
+        SELECT id
+        FROM data_sources
+        WHERE name=%s
+        )
+    ORDER BY date;
+"""
+
+# One pool per set of credentials, shared by every FinDB in the process that asks for pooling
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(conninfo: str, pool_config: dict) -> ConnectionPool:
+    """
+    Return the shared pool for conninfo, creating (and opening) it on first use.
+
+    Parameters
+    ----------
+    conninfo : str
+        libpq connection string
+    pool_config : dict
+        The "pool" section of config.yml: min_size, max_size, max_idle (seconds an idle
+        connection is kept before being closed) and check (test connections before
+        handing them out). Only used when the pool is created.
+
+    Returns
+    -------
+    psycopg_pool.ConnectionPool
+    """
+    with _pools_lock:
+        if conninfo not in _pools:
+            _pools[conninfo] = ConnectionPool(
+                conninfo,
+                min_size=pool_config.get("min_size", 1),
+                max_size=pool_config.get("max_size", 4),
+                max_idle=pool_config.get("max_idle", 300),
+                check=ConnectionPool.check_connection if pool_config.get("check", True) else None,
+                kwargs={"autocommit": True},
+                configure=register_money_loaders,
+                open=True,
+            )
+        return _pools[conninfo]
+
+def close_pools() -> None:
+    """
+    Close all shared pools (and their connections). Safe to call more than once.
+    """
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
 class FinDB:
     logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
 
-    def __init__(self, user: str, pw: str, db_name: str = "fin_db"):
+    def __init__(self, user: str, pw: str, db_name: str = "fin_db", pool_config: dict | None = None):
+        """
+        Parameters
+        ----------
+        user, pw : str
+            Credentials to connect to the db with
+        db_name : str
+            db to connect to
+        pool_config : dict or None
+            The "pool" section of config.yml. If given with enabled: true, connections are
+            borrowed from a pool shared by all FinDBs with the same credentials, and returned
+            to it on close(). Otherwise (the default) this FinDB opens its own connection.
+        """
         self.user = user
         self.pw = pw
         self.db_name = db_name
-        self._conn = psycopg.connect(f"dbname={self.db_name} user={self.user} password={self.pw} host='localhost'")
-        self._conn.autocommit = True
+        self._conninfo = f"dbname={self.db_name} user={self.user} password={self.pw} host='localhost'"
+        self._pool = None
+        if pool_config is not None and pool_config.get("enabled", False):
+            self._pool = get_pool(self._conninfo, pool_config)
+            self._conn = self._pool.getconn()
+        else:
+            self._conn = self._connect()
+
+    def _connect(self) -> psycopg.Connection:
+        """
+        Open a new autocommit connection with this instance's credentials.
+        """
+        conn = psycopg.connect(self._conninfo)
+        conn.autocommit = True
+        register_money_loaders(conn)
+        return conn
+
+    @contextmanager
+    def _extra_connection(self) -> Iterator[psycopg.Connection]:
+        """
+        A connection other than this FinDB's own, for work done in parallel: borrowed from
+        the pool if there is one, otherwise opened (and closed afterwards).
+        """
+        if self._pool is not None:
+            with self._pool.connection() as conn:
+                yield conn
+        else:
+            conn = self._connect()
+            try:
+                yield conn
+            finally:
+                conn.close()
 
     def close(self):
         try:
-            self._conn.close()
+            if self._pool is not None:
+                self._pool.putconn(self._conn)
+            else:
+                self._conn.close()
         except Exception as e:
             # Ignore any erros during shutdown
             pass
     
-    def _execute_action(self, query: str) -> str:
+    def _execute_action(self, query: str, operation: str = "action") -> str:
         """
         Convenience function. Execute an action for which I want the response message, not a fetch.
 
@@ -50,6 +310,8 @@ class FinDB:
         ----------
         query : str
             SQL statement to execute
+        operation : str
+            Name the statement is timed under (see fintrackr.metrics)
 
         Returns
         -------
@@ -72,33 +334,56 @@ class FinDB:
         """
         # The with statement automatically closes cursor after execution
         with self._conn.cursor() as curs: 
-            logger.info(f"Executing query {query}")
+            log_statement(logger, query)
             response = None
             try:
-                curs.execute(query)
+                with instrument(operation) as m:
+                    curs.execute(query)
+                    m.rows = max(curs.rowcount, 0)
                 response = curs.statusmessage
-                logger.info(f"Completed with response {response}")
+                logger.debug("Completed with response %s", response)
             except Exception as e:
                 logger.exception(f"Query did not complete with exception: {e}")
             finally:
                 return response
             
-    def _import_file(self, dest_table: str, path_to_file: str) -> int:
+    def _table_column_types(self, table: str) -> List[str]:
+        """
+        Types of table's columns, in order, from the catalog (e.g. ["date", "money", "text"]).
+        """
+        types = self.execute_query(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped ORDER BY attnum;",
+            (table,), operation="catalog"
+        )
+        if not types:
+            raise ValueError(f"No columns found for table {table}")
+        return [t for (t,) in types]
+
+    def _import_file(self, dest_table: str, path_to_file: str, binary: bool = False) -> int:
         """
         To avoid granting permission to read server files, I use a client-side copy
         This function wraps that copy command.
+
+        By default the file is sent as it is, in IMPORT_BLOCK_SIZE blocks, and parsed by the
+        server (COPY ... FORMAT csv). With binary=True, rows are instead validated and
+        normalized here, IMPORT_CHUNK_ROWS at a time (see ingest.iter_transaction_chunks), and
+        sent already converted to the types of dest_table's columns (COPY ... FORMAT binary).
         
         Parameters
         ----------
         dest_table: str
-            Name of table to copy into (should already exist)
+            Name of table to copy into (should already exist). For binary=True, its columns
+            must be a date, an amount (money or double precision) and text, in that order.
         path_to_file: str
             Path to file whose contents are to be copied. Must be a csv.
+        binary: bool
+            Parse the file client-side and COPY in binary format
         
         Returns
         -------
         int:
-            1 if successful copy, 0 if an exception occurred
+            Number of rows copied; 0 if an exception occurred
 
         """
         response = 0 # assume failure :)
@@ -112,20 +397,45 @@ class FinDB:
 
         with self._conn.cursor() as curs: 
             logger.info(f"Importing from file {path_to_file}")
+            start = time.perf_counter()
             try:
-                with open(path_to_file, "r") as f:
-                    with curs.copy(f"COPY {dest_table} FROM STDIN WITH (FORMAT csv, HEADER false)") as copy:
-                        copy.set_types(["date", "float8", "text"]) # TODO should this not be hardcoded, if I'm not hard-coding dest_table?
-                        for line in f:
-                            copy.write(line) # TODO figure out the difference between write and write_row
-                response = 1
+                with instrument("stage") as m:
+                    if binary:
+                        m.nbytes = self._copy_file_binary(curs, dest_table, path_to_file)
+                    else:
+                        with open(path_to_file, "rb") as f, curs.copy(f"COPY {dest_table} FROM STDIN WITH (FORMAT csv, HEADER false)") as copy:
+                            while block := f.read(IMPORT_BLOCK_SIZE):
+                                copy.write(block)
+                                m.nbytes += len(block)
+                    # The COPY's status message ("COPY <n>")
+                    m.rows = response = max(curs.rowcount, 0)
+                seconds = time.perf_counter() - start
+                logger.info(f"Copied {response} rows from {path_to_file} in {seconds:.3f} s ({response / max(seconds, 1e-9):,.0f} rows/s)")
             except Exception as e:
                 logger.error(f"Failed to import from file {path_to_file} with exception: {e}")
             finally:
                 return response
 
-        
-    def execute_query(self, query: str, vals: tuple = ()) -> List[tuple] | None:
+    def _copy_file_binary(self, curs: psycopg.Cursor, dest_table: str, path_to_file: str) -> int:
+        """
+        Binary half of _import_file. Returns the number of bytes sent.
+        """
+        types = self._table_column_types(dest_table)
+        if len(types) != 3 or types[0] != "date" or types[1] not in COPY_AMOUNT_TYPES or types[2] != "text":
+            raise ValueError(f"Binary import needs columns (date, {' or '.join(COPY_AMOUNT_TYPES)}, text); {dest_table} has {types}")
+
+        nbytes = 0
+        with curs.copy(f"COPY {dest_table} FROM STDIN WITH (FORMAT binary)") as copy:
+            copy.write(COPY_BINARY_HEADER)
+            for dates, cents, descriptions in iter_transaction_chunks(path_to_file, chunk_rows=IMPORT_CHUNK_ROWS):
+                data = encode_copy_binary_rows(dates, cents, descriptions, amount_type=types[1])
+                copy.write(data)
+                nbytes += len(data)
+            copy.write(COPY_BINARY_TRAILER)
+
+        return nbytes
+
+    def execute_query(self, query: str, vals: tuple = (), operation: str = "query") -> List[tuple] | None:
         """
         Returns the result of a fetch to the database, after query execution.
 
@@ -138,6 +448,8 @@ class FinDB:
             Args need to be passed in separately using %s in the query string
         vals: Tuple
             Values, in order, for all %s's in the query string
+        operation : str
+            Name the statement is timed under (see fintrackr.metrics)
 
         Returns
         -------
@@ -146,15 +458,19 @@ class FinDB:
             or None if the query is malformed/table doesn't exist/no RETURNING
             Note to self: RETURNING in SQL returns a table; psycopg fetchall
             turns this into a tuple of rows
+            money values are Decimals (see MoneyLoader; the date-range reads that fetch a lot
+            of money use binary cursors instead, see _fetch_batch)
 
         """
 
         response = None
 
         with self._conn.cursor() as curs: 
-            logger.info(f"Executing query: {query}, with vals: {vals}")
+            log_statement(logger, query, vals)
             try:
-                curs.execute(query, vals)
+                with instrument(operation) as m:
+                    curs.execute(query, vals)
+                    m.rows = max(curs.rowcount, 0)
                 response = curs.fetchall() # Returns a list of tuples (each row a tuple)
             except Exception as e:
                 logger.debug(f"Query did not complete with exception: {e}")
@@ -186,6 +502,15 @@ class FinDB:
         return source_name_tuple[0][0]
 
 
+    def data_source_names(self) -> List[str]:
+        """
+        Names of all data sources (accounts) in the db, alphabetically.
+        """
+        names = self.execute_query("SELECT name FROM data_sources ORDER BY name;")
+        if names is None:
+            raise ValueError("Failed to get data source names")
+        return [name for (name,) in names]
+
     def add_balance(self, accnt: str, bal_date: date, bal_amt: str) -> int:
         """
         Log a balance in the db. Will not allow exact duplicates to be added.
@@ -210,7 +535,8 @@ class FinDB:
         accnt_id = self.add_data_source(source_name=accnt)
 
         try:
-            rows_added = self.execute_query("INSERT INTO balances (accnt_id, date, amount) VALUES (%s, %s, %s) RETURNING *;", (accnt_id, bal_date, bal_amt))
+            rows_added = self.execute_query("INSERT INTO balances (accnt_id, date, amount) VALUES (%s, %s, %s) RETURNING *;", (accnt_id, bal_date, bal_amt),
+                                            operation="add_balance")
         except Exception as e:
             logger.exception(f"Insertion into balances table failed with exception: {e}; return from query: {rows_added}")
             raise ValueError(f"Insertion into balances table failed with exception: {e}")
@@ -226,21 +552,25 @@ class FinDB:
             return 0
 
     
-    def stage_transactions(self, path_to_transactions: str) -> int:
+    def stage_transactions(self, path_to_transactions: str, binary: bool = False) -> int:
         """ 
         FinTracker currently accepts csv inputs.
         Load csv from disk into a temporary staging table, which will then go into
         the transactions table in the db (executed in a separate function).
+        The table, named staging, is private to this FinDB's connection, so imports on
+        different connections can run at the same time.
 
         Parameters
         ----------
         path_to_transactions: str
             path to csv of transactions
+        binary: bool
+            Parse the csv client-side and COPY it in binary format (see _import_file)
 
         Returns
         -------
         int
-            Length of a query of how many rows were added to the staging table
+            Number of rows added to the staging table
 
         """
 
@@ -252,48 +582,40 @@ class FinDB:
         # assert input_types[1] == float, "Second column must be a float (amount)"
         # TODO how to check the other columns?
         
-        # Drop staging table if it already exists
-        # This set of logic feels goofy ... 
-        rows_before = 0
-        try:
-            rows_before = self.execute_query("SELECT posted_date, amount, description FROM staging;")
-        except Exception as e:
-            logger.debug(f"Query of staging table did not execute with exception: {e}")
-        if rows_before is None:
-            rows_before = 0
-        if rows_before != 0:
-            logger.info("Staging table still exists with content before loading new file")
-            r = self._execute_action("DROP TABLE staging;")
-            if r != "DROP TABLE":
-                logger.error("Unable to drop staging table")
-                raise ValueError("Unable to drop staging table before loading new file")
-        
-        create_staging = " CREATE TABLE staging( " \
+        # A temporary table belongs to this session (connection): other FinDBs staging at the same
+        # time each have their own, it's never written to the WAL, and it goes away when the
+        # connection closes. Leftovers from an earlier call on this connection are replaced.
+        self._execute_action("DROP TABLE IF EXISTS pg_temp.staging;")
+        create_staging = " CREATE TEMPORARY TABLE staging( " \
             " posted_date date, amount money, description text); "
         r1 = self._execute_action(create_staging)
         if r1 != "CREATE TABLE":
             logger.error("Failed to create staging table")
             raise ValueError("Failed to create staging table before loading new file")
 
-        r2 = self._import_file(dest_table="staging", path_to_file=path_to_transactions)
-        if r2==0: # This will happen if copy fails; eg if try to insert too many columns
+        # Row count from the COPY's status, rather than by reading the table back
+        num_rows = self._import_file(dest_table="staging", path_to_file=path_to_transactions, binary=binary)
+        if num_rows==0: # This will happen if copy fails; eg if try to insert too many columns
             logger.info("No rows added to staging table")
             return 0
 
-        # Query how many rows are now in staging table
-        rows_after = self.execute_query("SELECT posted_date, amount, description FROM staging;")
-        logger.info(f"After loading new transactions, staging has {len(rows_after)} rows")
+        logger.info(f"After loading new transactions, staging has {num_rows} rows")
 
-        return len(rows_after)
+        return num_rows
 
-    def add_transactions(self, path_to_source_file: str, source_info: str) -> None:
+    def add_transactions(self, path_to_source_file: str, source_info: str, binary: bool = False, skip_known_rows: bool = False) -> None:
         """
         Load transactions from a file and log the addition of these transactions
         in the data_load_metadata table.
 
         Only new transactions are added; duplicates (which have identity across the 3
         input columns of Date, Amount, and Description with an existing transaction row)
-        are ignored.
+        are ignored. If the same Date, Amount and Description appear n times in the file,
+        they are matched against the first n such transactions in the db, so repeated
+        identical charges are kept.
+
+        A file with the same contents as one loaded before (under any name) is skipped
+        without being staged.
 
         Parameters
         ----------
@@ -303,6 +625,12 @@ class FinDB:
             Are these transactions from credit card, checking account, etc
             This is the "name" field in the data_sources table.
             It will be added if it doesn't already exist.
+        binary: bool
+            Stage with a binary COPY (see stage_transactions)
+        skip_known_rows: bool
+            Fingerprint the file's transactions here and look them up in the db first, so
+            only the new ones are staged: faster for files that mostly overlap what's loaded
+            (e.g. statement exports covering overlapping periods). Ignores binary.
 
         Returns
         -------
@@ -311,68 +639,341 @@ class FinDB:
         """
         num_new_transactions = 0
 
-        num_staged_transactions = self.stage_transactions(path_to_transactions = path_to_source_file)
+        content_hash = None
+        if os.path.isfile(path_to_source_file): # otherwise staging reports the problem
+            content_hash = file_content_hash(path_to_source_file)
+            loaded_as = self.execute_query("SELECT source FROM data_load_metadata WHERE content_hash=%s;", (content_hash,),
+                                           operation="content_hash_check")
+            if loaded_as:
+                logger.info(f"{path_to_source_file} has the same contents as {loaded_as[0][0]}, which was already loaded; skipping")
+                return 0
 
-        if num_staged_transactions == 0:
-            logger.info("No transactions loaded from source file to staging table; no transactions will be added")
-            return num_new_transactions
+        if skip_known_rows:
+            return self._add_new_transactions(path_to_source_file, source_info, content_hash)
+
+        num_staged_transactions = self.stage_transactions(path_to_transactions = path_to_source_file, binary = binary)
+
+        try:
+            if num_staged_transactions == 0:
+                logger.info("No transactions loaded from source file to staging table; no transactions will be added")
+                return num_new_transactions
         
-        # Get id for this source_info or add if it doesn't exist
-        source_info_id = self.add_data_source(source_info)
+            # Get id for this source_info or add if it doesn't exist
+            source_info_id = self.add_data_source(source_info)
+
+            self._ensure_partitions("staging")
 
-        today_date = date.today()
+            today_date = date.today()
         
-        transactions_query = "WITH joined AS ( " \
-            "    SELECT s.* " \
-            "    FROM staging s " \
-            "    LEFT JOIN transactions t ON " \
-            "        t.posted_date = s.posted_date AND " \
-            "        t.amount = s.amount AND " \
-            "        t.description = s.description " \
-            "    WHERE t.id IS NULL " \
-            "), " \
-            "meta AS ( " \
-            "    INSERT INTO data_load_metadata " \
-            "        (date_added, username, source, data_source_id) " \
-            "    VALUES (%s, %s, %s, %s)" \
-            "    " \
-            "    RETURNING id " \
-            ") " \
-            "INSERT INTO transactions (posted_date, amount, description, metadatum_id) " \
-            "SELECT posted_date, amount, description, meta.id " \
-            "FROM joined, meta " \
-            "RETURNING *;"
+            transactions_query = ADD_TRANSACTIONS_QUERY.format(staging="staging")
             
-        try:
-            all_new_transactions = self.execute_query(transactions_query, (today_date, self.user, path_to_source_file, source_info_id))
-        except Exception as e:
-            logger.exception(f"Insertion into transactions table failed with exception: {e}; return from query: {num_new_transactions}")
-            raise ValueError(f"Insertion into transactions table failed with exception: {e}")
+            try:
+                all_new_transactions = self.execute_query(transactions_query,
+                                                          (today_date, self.user, path_to_source_file, content_hash, source_info_id, source_info_id),
+                                                          operation="dedup_insert")
+            except Exception as e:
+                logger.exception(f"Insertion into transactions table failed with exception: {e}; return from query: {num_new_transactions}")
+                raise ValueError(f"Insertion into transactions table failed with exception: {e}")
+        
+            if all_new_transactions is None:
+                logger.error("No transactions inserted")
+                # Duplicate transactions no longer make the insert fail, so check if it's because this file was loaded before:
+                if len(self.execute_query("SELECT id FROM data_load_metadata WHERE source=%s;", (path_to_source_file,))) > 0:
+                    logger.error(f"{path_to_source_file} has already been loaded")
+                    return 0
+                else:
+                    raise ValueError("No transactions inserted, but not because this file was loaded already")
         
-        if all_new_transactions is None:
-            logger.error("No transactions inserted")
-            # Check if all new transactions to load are already in db and that's why it failed:
-            check_dups = "SELECT s.* " \
-                "    FROM staging s " \
-                "    LEFT JOIN transactions t ON " \
-                "        t.posted_date = s.posted_date AND " \
-                "        t.amount = s.amount AND " \
-                "        t.description = s.description " \
-                "    WHERE t.id IS NULL;"
-            if len(self.execute_query(check_dups)) == 0:
-                logger.error("All staged transactions are already in transactions table")
+            num_new_transactions = len(all_new_transactions)
+        finally:
+            # Drop staging table (also dropped with the connection, but a pooled connection lives on)
+            self._execute_action("DROP TABLE IF EXISTS pg_temp.staging;")
+
+        return num_new_transactions
+
+    def _add_new_transactions(self, path_to_source_file: str, source_info: str, content_hash: bytes | None) -> int:
+        """
+        add_transactions with skip_known_rows: parse the file and fingerprint its rows here,
+        and stage only those whose fingerprints aren't in transactions yet. The file is still
+        recorded in data_load_metadata if none are new, so its hash is known next time.
+        """
+        try:
+            chunks = list(iter_transaction_chunks(path_to_source_file, chunk_rows=IMPORT_CHUNK_ROWS))
+        except ValueError as e:
+            logger.error(f"Failed to read {path_to_source_file}: {e}")
+            return 0
+        if len(chunks) == 0:
+            logger.info("No transactions in source file; no transactions will be added")
+            return 0
+        dates, cents, descriptions = (np.concatenate(cols) for cols in zip(*chunks))
+
+        with instrument("fingerprint") as m:
+            fingerprints = transaction_fingerprints(dates, cents, descriptions)
+            # The date range limits the lookup to the partitions the file covers
+            known = self.execute_query(
+                "SELECT fingerprint FROM transactions WHERE posted_date BETWEEN %s AND %s AND fingerprint = ANY(%s);",
+                (dates.min().item(), dates.max().item(), fingerprints), operation="fingerprint_check"
+            )
+            known = {f for (f,) in known}
+            new = np.fromiter((f not in known for f in fingerprints), dtype=bool, count=len(fingerprints))
+            m.rows = len(fingerprints)
+        logger.info(f"{int(new.sum())} of {len(new)} transactions in {path_to_source_file} are new")
+
+        source_info_id = self.add_data_source(source_info)
+
+        self._execute_action("DROP TABLE IF EXISTS pg_temp.staging;")
+        r = self._execute_action("CREATE TEMPORARY TABLE staging(posted_date date, amount money, description text, fingerprint uuid);")
+        if r != "CREATE TABLE":
+            raise ValueError("Failed to create staging table before loading new file")
+        try:
+            if new.any():
+                with self._conn.cursor() as curs, instrument("stage") as m:
+                    with curs.copy("COPY staging FROM STDIN") as copy:
+                        for i in np.flatnonzero(new):
+                            copy.write_row((dates[i].item(), Decimal(int(cents[i])) / 100, descriptions[i] or None, fingerprints[i]))
+                    m.rows = max(curs.rowcount, 0)
+                self._ensure_partitions("staging")
+
+            try:
+                all_new_transactions = self.execute_query(
+                    ADD_FINGERPRINTED_TRANSACTIONS_QUERY.format(staging="staging"),
+                    (date.today(), self.user, path_to_source_file, content_hash, source_info_id, source_info_id),
+                    operation="dedup_insert"
+                )
+            except Exception as e:
+                logger.exception(f"Insertion into transactions table failed with exception: {e}")
+                raise ValueError(f"Insertion into transactions table failed with exception: {e}")
+            if all_new_transactions is None:
+                # The data_load_metadata insert failed: this path was already loaded
+                logger.error(f"{path_to_source_file} has already been loaded")
                 return 0
-            else:
-                raise ValueError("No transactions inserted, but not because all new transactions were in db already")
+        finally:
+            self._execute_action("DROP TABLE IF EXISTS pg_temp.staging;")
+
+        return len(all_new_transactions)
+
+    def _ensure_partitions(self, staging: str) -> None:
+        """
+        Create the partitions of transactions that the rows in staging will go into, if they
+        don't exist yet (an insert into a period with no partition fails).
+
+        Parameters
+        ----------
+        staging: str
+            Name of the table of transactions about to be inserted
+        """
+        created = self.execute_query(f"SELECT ensure_transaction_partitions(min(posted_date), max(posted_date)) FROM {staging};",
+                                     operation="ensure_partitions")
+        if created is None:
+            raise ValueError(f"Failed to create partitions of transactions for the dates in {staging}")
+        if created[0][0] > 0:
+            logger.info(f"Created {created[0][0]} new partitions of transactions")
+
+    def _copy_blocks(self, dest_table: str, blocks: List[str], n_connections: int) -> None:
+        """
+        COPY csv blocks into dest_table, spread over n_connections connections working in parallel.
+        Each connection is autocommit, so every block is visible as soon as its COPY finishes.
+
+        Parameters
+        ----------
+        dest_table: str
+            Name of table to copy into (should already exist)
+        blocks: List[str]
+            csv-formatted text, one block per COPY
+        n_connections: int
+            Number of connections (and threads) to use
+        """
+        def copy_chunk_on(conn: psycopg.Connection, chunk: List[str]) -> None:
+            with conn.cursor() as curs:
+                for block in chunk:
+                    with instrument("stage") as m:
+                        with curs.copy(f"COPY {dest_table} FROM STDIN WITH (FORMAT csv, HEADER false)") as copy:
+                            copy.write(block)
+                        m.rows = max(curs.rowcount, 0)
+                        m.nbytes = len(block)
+
+        def copy_chunk(chunk: List[str]) -> None:
+            with self._extra_connection() as conn:
+                copy_chunk_on(conn, chunk)
+
+        if self._pool is not None:
+            # This FinDB already holds one of the pool's connections
+            n_connections = min(n_connections, self._pool.max_size - 1)
+            if n_connections < 1:
+                copy_chunk_on(self._conn, blocks)
+                return
+        n_connections = max(1, min(n_connections, len(blocks)))
+
+        chunks = [blocks[i::n_connections] for i in range(n_connections)]
+        with ThreadPoolExecutor(max_workers=n_connections) as pool:
+            # list() so that an exception in any thread is raised here
+            list(pool.map(copy_chunk, chunks))
+
+    def add_transactions_many(self, paths: List[str], source_info: str, max_workers: int = 4) -> IngestReport:
+        """
+        Bulk version of add_transactions, for loading many files at once.
+
+        Files are validated in a process pool, copied into one shared staging table over
+        several connections at once, then merged into the transactions table in a single
+        transaction. Files that fail validation, or whose path or contents were already loaded
+        (or appear earlier in paths), are reported and skipped; the rest are still loaded.
+
+        A row is skipped if it is already in the transactions table, or if it also appears
+        in a file earlier in paths - the same result as calling add_transactions on each
+        file in order (including the treatment of repeated rows).
+
+        Parameters
+        ----------
+        paths: List[str]
+            Paths to csvs where every row is a transaction.
+        source_info: str
+            This is the "name" field in the data_sources table; same as in add_transactions.
+        max_workers: int
+            Number of processes used to parse files, and of connections used to copy them.
+
+        Returns
+        -------
+        IngestReport
+            Per-file rows staged, inserted and skipped, plus total wall time.
+        """
+        start = time.perf_counter()
+
+        results = {p: FileIngestResult(path=p) for p in dict.fromkeys(paths)} # drops repeated paths, keeps order
+        report = IngestReport(files=list(results.values()))
+
+        already_loaded = self.execute_query("SELECT source FROM data_load_metadata WHERE source = ANY(%s);", (list(results),))
+        for (source,) in already_loaded or []:
+            logger.error(f"{source} was already loaded; skipping")
+            results[source].error = "already loaded"
+
+        hashes = {p: file_content_hash(p) for p in results if results[p].error is None and os.path.isfile(p)}
+        known = self.execute_query("SELECT content_hash FROM data_load_metadata WHERE content_hash = ANY(%s);", (list(hashes.values()),),
+                                   operation="content_hash_check")
+        seen = {bytes(h) for (h,) in known or []}
+        for p, h in hashes.items():
+            if h in seen:
+                logger.error(f"{p} has the same contents as a file already loaded; skipping")
+                results[p].error = "already loaded"
+            seen.add(h)
+
+        to_load = [p for p in results if results[p].error is None]
+        blocks = {}
+        if len(to_load) > 0:
+            # Not fork: this process may have pool threads running, and forking those isn't safe
+            with instrument("parse") as m, ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("forkserver")) as pool:
+                futures = {p: pool.submit(read_transactions_file, p, file_id) for file_id, p in enumerate(to_load)}
+                for p, future in futures.items():
+                    try:
+                        num_rows, block = future.result()
+                    except ValueError as e:
+                        logger.error(f"Failed to read {p}: {e}")
+                        results[p].error = str(e)
+                        continue
+                    results[p].staged = num_rows
+                    if num_rows > 0:
+                        blocks[p] = block
+                        m.rows += num_rows
+                        m.nbytes += len(block)
+
+        if len(blocks) == 0:
+            logger.info("No transactions read from source files; no transactions will be added")
+            report.wall_time = time.perf_counter() - start
+            return report
+
+        source_info_id = self.add_data_source(source_info)
+
+        # Filled over several connections, so it can't be a temporary table; unlogged skips the WAL,
+        # which is all a temporary table would have saved for throwaway rows
+        staging = f"staging_{uuid.uuid4().hex}"
+        r = self._execute_action(f"CREATE UNLOGGED TABLE {staging}(file_id integer, posted_date date, amount money, description text);")
+        if r != "CREATE TABLE":
+            raise ValueError("Failed to create staging table before loading new files")
+
+        try:
+            self._copy_blocks(dest_table=staging, blocks=list(blocks.values()), n_connections=max_workers)
+            self._ensure_partitions(staging)
+
+            file_ids = [to_load.index(p) for p in blocks]
+            with self._conn.transaction(), self._conn.cursor() as curs, instrument("dedup_insert") as m:
+                curs.execute(
+                    "INSERT INTO data_load_metadata (date_added, username, source, content_hash, data_source_id) "
+                    "SELECT %s, %s, f.source, f.content_hash, %s "
+                    "FROM unnest(%s::text[], %s::bytea[]) AS f(source, content_hash) "
+                    "RETURNING id, source;",
+                    (date.today(), self.user, source_info_id, list(blocks), [hashes.get(p) for p in blocks])
+                )
+                metadatum_ids = {source: id for id, source in curs.fetchall()}
+
+                # Rows already in transactions, or in a file earlier in this batch, are rejected by the
+                # unique fingerprint index; the ORDER BY makes the earlier file win
+                curs.execute(
+                    f"WITH files AS ( "
+                    f"    SELECT * FROM unnest(%s::integer[], %s::integer[]) AS f(file_id, metadatum_id) "
+                    f") "
+                    f"INSERT INTO transactions (posted_date, amount, description, metadatum_id, data_source_id, fingerprint) "
+                    f"SELECT s.posted_date, s.amount, s.description, f.metadatum_id, %s, "
+                    f"    transaction_fingerprint(s.posted_date, s.amount, s.description, "
+                    f"        row_number() OVER (PARTITION BY s.file_id, s.posted_date, s.amount, s.description)) "
+                    f"FROM {staging} s JOIN files f ON f.file_id = s.file_id "
+                    f"ORDER BY s.file_id "
+                    f"ON CONFLICT (fingerprint, posted_date) DO NOTHING "
+                    f"RETURNING metadatum_id;",
+                    (file_ids, [metadatum_ids[p] for p in blocks], source_info_id)
+                )
+                inserted = Counter(id for (id,) in curs.fetchall())
+                m.rows = inserted.total()
+        except Exception as e:
+            logger.exception(f"Bulk insertion into transactions table failed with exception: {e}")
+            raise ValueError(f"Bulk insertion into transactions table failed with exception: {e}")
+        finally:
+            self._execute_action(f"DROP TABLE IF EXISTS {staging};")
+
+        for p in blocks:
+            results[p].inserted = inserted[metadatum_ids[p]]
+
+        report.wall_time = time.perf_counter() - start
+        logger.info(f"Bulk load finished: {report.inserted} of {report.staged} staged transactions inserted in {report.wall_time:.2f} s")
+
+        return report
+
+    @staticmethod
+    def _valid_date_range(date_range: List[date]) -> bool:
+        """
+        Check that date_range is two datetime.dates, and sort it (in place) if so.
+        Logs the problem and returns False otherwise.
+        """
+        if len(date_range) != 2:
+            logger.error(f"Date range must be list of length 2; got instead {date_range}")
+            return False
         
-        num_new_transactions = len(all_new_transactions)
+        if (type(date_range[0]) != date) or (type(date_range[1]) != date):
+            # date_range.sort() will do the wrong thing if this isn't date format
+            logger.error(f"Date range must be in datetime.date format; got instead {date_range}")
+            return False
+        date_range.sort()
 
-        # Drop staging table
-        self._execute_action("DROP TABLE staging;")
+        return True
 
-        return num_new_transactions
-    
-    def data_from_date_range(self, data_source: str, date_range: List[date]) -> dict[List[Transaction]]:
+    def _fetch_batch(self, query: str, vals: tuple = (), operation: str = "date_range_fetch") -> TransactionBatch:
+        """
+        Like execute_query, for a query returning (date, money) rows, but the rows go straight
+        from the cursor into a TransactionBatch's arrays. money is fetched in binary, which is
+        already an integer number of cents, so there's no parsing or numeric conversion.
+        """
+        with self._conn.cursor(binary=True) as curs:
+            curs.adapters.register_loader(MONEY_OID, MoneyCentsBinaryLoader)
+            log_statement(logger, query, vals)
+            try:
+                with instrument(operation) as m:
+                    curs.execute(query, vals)
+                    batch = TransactionBatch.from_rows(curs)
+                    m.rows = len(batch)
+                return batch
+            except Exception as e:
+                logger.debug(f"Query did not complete with exception: {e}")
+                raise ValueError(f"Query did not complete with exception: {e}")
+
+    def data_from_date_range(self, data_source: str, date_range: List[date]) -> dict[str, TransactionBatch]:
         """
         Return result of SELECT statement to the db as specified below.
         
@@ -386,52 +987,919 @@ class FinDB:
 
         Return
         ------
-        dict[List[Transaction]]
+        dict[str, TransactionBatch]
             key = "transactions": All transactions (date, amount) with data_source_id = data_source and posted_dates
             in range(date_range)
-            key = "balances": any account balances for this data_source in date_range
+            key = "balances": any account balances for this data_source in date_range, oldest first
         """
 
-        if len(date_range) != 2:
-            logger.error(f"Date range must be list of length 2; got instead {date_range}")
+        if not self._valid_date_range(date_range):
             return None
-        
-        if (type(date_range[0]) != date) or (type(date_range[1]) != date):
-            # date_range.sort() will do the wrong thing if this isn't date format
-            logger.error(f"Date range must be in datetime.date format; got instead {date_range}")
+
+        transactions = self._fetch_batch(DATE_RANGE_TRANSACTIONS_QUERY, (date_range[0],date_range[1],data_source))
+
+        balances = self._fetch_batch(DATE_RANGE_BALANCES_QUERY, (date_range[0],date_range[1],data_source))
+
+        return {"transactions": transactions, "balances": balances}
+
+    def _fetch_batches_by_source(self, query: str, names: List[str], vals: tuple = ()) -> dict[str, TransactionBatch]:
+        """
+        Like _fetch_batch, for a query returning (position of the account in names, starting
+        at 1; date; money) rows ordered by that position. The rows are read into arrays once
+        and then split into one TransactionBatch per name (empty if it had no rows).
+        """
+        with self._conn.cursor(binary=True) as curs:
+            curs.adapters.register_loader(MONEY_OID, MoneyCentsBinaryLoader)
+            log_statement(logger, query, vals)
+            try:
+                with instrument("date_range_fetch_many") as m:
+                    curs.execute(query, vals)
+                    rows = np.fromiter(curs, dtype=[("pos", np.int64), ("date", "datetime64[D]"), ("cents", np.int64)])
+                    m.rows = len(rows)
+            except Exception as e:
+                logger.debug(f"Query did not complete with exception: {e}")
+                raise ValueError(f"Query did not complete with exception: {e}")
+
+        bounds = np.searchsorted(rows["pos"], np.arange(1, len(names) + 2))
+        return {
+            name: TransactionBatch(rows["date"][bounds[i]:bounds[i + 1]], rows["cents"][bounds[i]:bounds[i + 1]])
+            for i, name in enumerate(names)
+        }
+
+    def data_from_date_range_many(self, data_sources: List[str], date_range: List[date]) -> dict[str, dict[str, TransactionBatch]]:
+        """
+        data_from_date_range for many accounts at once, in two queries (one for transactions,
+        one for balances) however many accounts there are.
+
+        Parameters
+        ----------
+        data_sources : List[str]
+            Names in the data_sources table. Names that don't exist get empty results.
+        date_range : List[date]
+            List of length 2: beginning and end dates (inclusive), in datetime.date format
+
+        Return
+        ------
+        dict[str, dict[str, TransactionBatch]]
+            For each name in data_sources (in the same order, without repeats), what
+            data_from_date_range returns for it. Transactions are in order of posted_date
+            (ties in the order they were loaded); balances are oldest first.
+            None if date_range is malformed.
+        """
+        if not self._valid_date_range(date_range):
             return None
-        date_range.sort()
+
+        names = list(dict.fromkeys(data_sources))
+
+        # Each account's name is resolved once, in accnts, rather than once per query per account
+        accnts = """
+            WITH accnts AS (
+                SELECT id, array_position(%s::text[], name) AS pos
+                FROM data_sources
+                WHERE name = ANY(%s::text[])
+            )
+        """
+
+        trans_query = accnts + """
+            SELECT a.pos, t.posted_date, t.amount
+            FROM transactions AS t
+            JOIN accnts AS a ON a.id = t.data_source_id
+            WHERE t.posted_date BETWEEN %s AND %s
+            ORDER BY a.pos, t.posted_date, t.id;
+        """
+
+        bal_query = accnts + """
+            SELECT a.pos, b.date, b.amount
+            FROM balances AS b
+            JOIN accnts AS a ON a.id = b.accnt_id
+            WHERE b.date BETWEEN %s AND %s
+            ORDER BY a.pos, b.date;
+        """
+
+        vals = (names, names, date_range[0], date_range[1])
+        transactions = self._fetch_batches_by_source(trans_query, names, vals)
+        balances = self._fetch_batches_by_source(bal_query, names, vals)
+
+        return {name: {"transactions": transactions[name], "balances": balances[name]} for name in names}
+
+    def iter_date_range(self, data_source: str, date_range: List[date], batch_size: int = 10000) -> Iterator[TransactionBatch]:
+        """
+        Streaming version of the transactions half of data_from_date_range: reads through a
+        server-side cursor, so only batch_size rows are held in memory at a time however
+        wide date_range is.
+
+        The cursor lives in a transaction on this FinDB's connection, which stays open until
+        the iterator is exhausted or closed.
+
+        Parameters
+        ----------
+        data_source : str
+            Must exist in data_sources table as a name.
+        date_range : List[date]
+            List of length 2: beginning and end dates (inclusive), in datetime.date format
+        batch_size : int
+            Number of transactions per batch (and per round trip to the db)
+
+        Yields
+        ------
+        TransactionBatch
+            Transactions in order of posted_date (ties in the order they were loaded).
+            Every batch but the last has batch_size transactions.
+        """
+        if not self._valid_date_range(date_range):
+            return
 
         trans_query = """
             SELECT t.posted_date, t.amount
             FROM transactions AS t
-            JOIN data_load_metadata AS m ON m.id = t.metadatum_id
-            JOIN data_sources AS s ON s.id = m.data_source_id
+            JOIN data_sources AS s ON s.id = t.data_source_id
             WHERE t.posted_date BETWEEN %s AND %s
-            AND s.name=%s;
+            AND s.name=%s
+            ORDER BY t.posted_date, t.id;
         """
 
-        trans = self.execute_query(trans_query, (date_range[0],date_range[1],data_source))
-        transactions = [Transaction(date=d, amount=a) for d, a in trans]
+        # Named (server-side) cursors only exist inside a transaction
+        with self._conn.transaction():
+            with self._conn.cursor(name=f"date_range_{uuid.uuid4().hex}", binary=True) as curs:
+                curs.adapters.register_loader(MONEY_OID, MoneyCentsBinaryLoader)
+                logger.info(f"Streaming transactions for {data_source} in {date_range} in batches of {batch_size}")
+                log_statement(logger, trans_query, (date_range[0], date_range[1], data_source))
+                curs.execute(trans_query, (date_range[0], date_range[1], data_source))
+                while True:
+                    # Timed per round trip, not including the time the caller spends on each batch
+                    with instrument("date_range_stream") as m:
+                        rows = curs.fetchmany(batch_size)
+                        m.rows = len(rows)
+                    if len(rows) == 0:
+                        break
+                    yield TransactionBatch.from_rows(rows)
+
+    def balances_in_date_range(self, data_source: str, date_range: List[date]) -> TransactionBatch | None:
+        """
+        The balances half of data_from_date_range, oldest first.
+
+        Parameters
+        ----------
+        data_source : str
+            Must exist in data_sources table as a name.
+        date_range : List[date]
+            List of length 2: beginning and end dates (inclusive), in datetime.date format
+
+        Return
+        ------
+        TransactionBatch, or None if date_range is malformed
+        """
+        if not self._valid_date_range(date_range):
+            return None
 
-        # All balances in date range
         bal_query = """
-            SELECT date, amount
-            FROM balances
-            WHERE date BETWEEN %s AND %s
-            AND accnt_id = (
-                SELECT id
-                FROM data_sources
-                WHERE name=%s
-                )
-            ;
+            SELECT b.date, b.amount
+            FROM balances AS b
+            JOIN data_sources AS s ON s.id = b.accnt_id
+            WHERE b.date BETWEEN %s AND %s
+            AND s.name=%s
+            ORDER BY b.date;
         """
 
-        bals = self.execute_query(bal_query, (date_range[0],date_range[1],data_source))
-        balances = [Transaction(date=d, amount=a) for d, a in bals]
+        return self._fetch_batch(bal_query, (date_range[0], date_range[1], data_source), operation="balances_fetch")
 
-        return {"transactions": transactions, "balances": balances}
+    def sum_in_date_range(self, data_source: str, date_range: List[date]) -> int | None:
+        """
+        Total of the amounts of all transactions in date_range (inclusive), in cents, computed
+        in the db. Used to anchor streamed running balances to a known balance without fetching
+        the transactions in between.
+
+        Parameters
+        ----------
+        data_source : str
+            Must exist in data_sources table as a name.
+        date_range : List[date]
+            List of length 2: beginning and end dates (inclusive), in datetime.date format
+
+        Return
+        ------
+        int cents (0 if there are no transactions), or None if date_range is malformed
+        """
+        if not self._valid_date_range(date_range):
+            return None
+
+        sum_query = """
+            SELECT (coalesce(sum(t.amount::numeric), 0) * 100)::bigint
+            FROM transactions AS t
+            JOIN data_sources AS s ON s.id = t.data_source_id
+            WHERE t.posted_date BETWEEN %s AND %s
+            AND s.name=%s;
+        """
+
+        return self.execute_query(sum_query, (date_range[0], date_range[1], data_source), operation="date_range_sum")[0][0]
     
+    def daily_balances_in_date_range(self, data_source: str, date_range: List[date]) -> TransactionBatch | None:
+        """
+        End-of-day balances from the daily_balances table: one per day in date_range (inclusive)
+        on which the account has transactions or a stored balance, oldest first. These are kept
+        up to date by triggers as transactions and balances are added, so nothing is recomputed here.
+
+        Parameters
+        ----------
+        data_source : str
+            Must exist in data_sources table as a name.
+        date_range : List[date]
+            List of length 2: beginning and end dates (inclusive), in datetime.date format
+
+        Return
+        ------
+        TransactionBatch, or None if date_range is malformed
+        """
+        if not self._valid_date_range(date_range):
+            return None
+
+        daily_query = """
+            SELECT d.day, d.amount
+            FROM daily_balances AS d
+            JOIN data_sources AS s ON s.id = d.accnt_id
+            WHERE d.day BETWEEN %s AND %s
+            AND s.name=%s
+            ORDER BY d.day;
+        """
+
+        return self._fetch_batch(daily_query, (date_range[0], date_range[1], data_source), operation="daily_balances_fetch")
+
+    def rebuild_daily_balances(self, accnt: str | None = None) -> int:
+        """
+        Recompute daily_balances from scratch, for one account or all of them. Normally not
+        needed (it's maintained as data is inserted); this is for repair, e.g. after rows in
+        transactions or balances were changed or deleted by hand.
+
+        Parameters
+        ----------
+        accnt : str or None
+            Name in data_sources of the account to rebuild; None (default) for all accounts.
+
+        Return
+        ------
+        int
+            Number of daily balances written.
+        """
+        if accnt is None:
+            days = self.execute_query("SELECT refresh_daily_balances(id, NULL) FROM data_sources;", operation="rebuild_daily_balances")
+        else:
+            days = self.execute_query(
+                "SELECT refresh_daily_balances(id, NULL) FROM data_sources WHERE name=%s;", (accnt,), operation="rebuild_daily_balances"
+            )
+
+        if days is None:
+            raise ValueError(f"Failed to rebuild daily balances for {'all accounts' if accnt is None else accnt}")
+        if len(days) == 0:
+            logger.error(f"No account named {accnt}")
+
+        num_days = sum(n for (n,) in days)
+        logger.info(f"Rebuilt {num_days} daily balances")
+        return num_days
+
+    def refresh_monthly_totals(self) -> int:
+        """
+        Bring monthly_category_totals up to date: recompute the months whose transactions,
+        categories or transfers changed since the last refresh (marked by triggers, see
+        schema.sql), and only those. monthly_category_totals calls this first, so it's only
+        needed to do the work ahead of time, e.g. after a load.
+
+        Return
+        ------
+        int
+            Number of months recomputed
+        """
+        months = self.execute_query("SELECT refresh_monthly_category_totals();", operation="refresh_monthly_totals")
+        if months is None:
+            raise ValueError("Failed to refresh monthly category totals")
+
+        logger.info(f"Refreshed monthly category totals for {months[0][0]} months")
+        return months[0][0]
+
+    def monthly_category_totals(self, categorization: str = "default", date_range: List[date] | None = None,
+                                data_sources: List[str] | None = None) -> pd.DataFrame:
+        """
+        Net amount and number of spending transactions (transfers are left out, see
+        match_transfers) of each account in each month, per category of a categorization, read
+        from the monthly_category_totals rollup after refreshing the months that changed (see
+        refresh_monthly_totals), so it's a few rows per month rather than the ledger.
+
+        Parameters
+        ----------
+        categorization : str
+            Name of this user's categorization; if it doesn't exist, everything is uncategorized
+        date_range : List[date] or None
+            List of length 2 (datetime.date): months overlapping this range; all months if None
+        data_sources : List[str] or None
+            Names in data_sources of the accounts; all accounts if None
+
+        Return
+        ------
+        pd.DataFrame
+            Columns account, month (date, its first day), category (label; None for
+            transactions in no category), amount (float) and num_transactions, by month, then
+            account, then category
+        """
+        if date_range is None:
+            date_range = [date.min, date.max]
+        elif not self._valid_date_range(date_range):
+            raise ValueError(f"Invalid date range {date_range}")
+        first_month = date_range[0].replace(day=1)
+
+        self.refresh_monthly_totals()
+        categorization_ids = self.execute_query("SELECT id FROM categorizations WHERE username=%s AND name=%s ORDER BY id LIMIT 1;",
+                                                (self.user, categorization))
+        if not categorization_ids:
+            logger.info(f"Categorization {categorization} doesn't exist; all transactions are uncategorized")
+        categorization_id = categorization_ids[0][0] if categorization_ids else -1
+
+        rows = self.execute_query("""
+            SELECT s.name, r.month, c.label, r.amount::numeric::float8, r.num_transactions
+            FROM monthly_category_totals AS r
+            JOIN data_sources AS s ON s.id = r.accnt_id
+            JOIN categories AS c ON c.id = r.category_id AND c.categorization_id = %s
+            WHERE r.month BETWEEN %s AND %s AND (%s::text[] IS NULL OR s.name = ANY(%s))
+            UNION ALL
+            SELECT s.name, r.month, NULL, (r.amount - coalesce(sum(k.amount), 0::money))::numeric::float8,
+                r.num_transactions - coalesce(sum(k.num_transactions), 0)
+            FROM monthly_category_totals AS r
+            JOIN data_sources AS s ON s.id = r.accnt_id
+            LEFT JOIN (
+                monthly_category_totals AS k JOIN categories AS c ON c.id = k.category_id AND c.categorization_id = %s
+            ) ON k.accnt_id = r.accnt_id AND k.month = r.month
+            WHERE r.category_id IS NULL AND r.month BETWEEN %s AND %s AND (%s::text[] IS NULL OR s.name = ANY(%s))
+            GROUP BY s.name, r.month, r.amount, r.num_transactions
+            HAVING r.num_transactions > coalesce(sum(k.num_transactions), 0)
+            ORDER BY 2, 1, 3 NULLS LAST;
+        """, (categorization_id, first_month, date_range[1], data_sources, data_sources) * 2, operation="monthly_totals_fetch")
+        if rows is None:
+            raise ValueError("Failed to read monthly category totals")
+
+        totals = pd.DataFrame(rows, columns=["account", "month", "category", "amount", "num_transactions"])
+        totals["category"] = pd.Series([row[2] for row in rows], dtype=object) # None rather than NaN
+        return totals
+
+    def categorization_id(self, categorization: str) -> int:
+        """
+        id of this user's categorization with this name, added if it doesn't exist.
+        """
+        rows = self.execute_query("SELECT id FROM categorizations WHERE username=%s AND name=%s ORDER BY id LIMIT 1;",
+                                  (self.user, categorization))
+        if len(rows) == 0:
+            logger.info(f"Categorization {categorization} doesn't exist; adding to table categorizations")
+            rows = self.execute_query("INSERT INTO categorizations (username, name) VALUES (%s, %s) RETURNING id;",
+                                      (self.user, categorization))
+            if rows is None:
+                raise ValueError("Could not insert new categorization in categorizations table")
+        return rows[0][0]
+
+    def category_ids(self, categorization_id: int, rules: List[CategoryRule]) -> List[int]:
+        """
+        id of the category of each rule's label in a categorization, adding the categories
+        that don't exist yet (with the frequency and other of the first rule with that label).
+        """
+        existing = self.execute_query("SELECT label, min(id) FROM categories WHERE categorization_id=%s GROUP BY label;",
+                                      (categorization_id,))
+        ids = dict(existing)
+        new = {rule.label: rule for rule in reversed(rules) if rule.label not in ids}
+        if new:
+            added = self.execute_query(
+                "INSERT INTO categories (label, frequency, categorization_id, other) "
+                "SELECT l.label, l.frequency::recurrance, %s, l.other "
+                "FROM unnest(%s::text[], %s::text[], %s::text[]) AS l(label, frequency, other) "
+                "RETURNING label, id;",
+                (categorization_id, list(new), [r.frequency for r in new.values()], [r.other for r in new.values()])
+            )
+            if added is None:
+                raise ValueError("Could not insert new categories in categories table")
+            ids.update(added)
+        return [ids[rule.label] for rule in rules]
+
+    @staticmethod
+    def _insert_new_xref(curs: psycopg.Cursor, num_rows: int) -> None:
+        """
+        Add the num_rows rows of the temporary table new_xref (transaction_id,
+        transaction_posted_date, category_id) to transactions_categories_xref, with one INSERT
+        (its foreign keys are checked per row, with an index lookup each).
+        """
+        with instrument("categorize_insert") as m:
+            curs.execute("INSERT INTO transactions_categories_xref (transaction_id, transaction_posted_date, category_id) "
+                         "SELECT transaction_id, transaction_posted_date, category_id FROM new_xref;")
+            m.rows = num_rows
+
+    def categorize_transactions(self, rules: List[CategoryRule], categorization: str = "default", batch_size: int = IMPORT_CHUNK_ROWS) -> int:
+        """
+        Label every transaction not yet in a category of categorization with the first of
+        rules it matches (see fintrackr.categorize), and record the labels in
+        transactions_categories_xref. Transactions that match no rule are left uncategorized,
+        so running this again after adding rules only looks at those.
+
+        Only the distinct descriptions of the uncategorized transactions are read, and matched
+        batch_size at a time; the rules each could get are sent back with COPY, and the labels
+        picked with one query that checks the amounts and written with one INSERT, all in one
+        transaction.
+
+        Parameters
+        ----------
+        rules : List[CategoryRule]
+            In order of priority
+        categorization : str
+            Name of this user's categorization (added, with any missing categories, if needed)
+        batch_size : int
+            Distinct descriptions matched per batch
+
+        Returns
+        -------
+        int
+            Number of transactions categorized
+        """
+        compiled = CompiledRules(rules)
+        categorization_id = self.categorization_id(categorization)
+        category_ids = np.array(self.category_ids(categorization_id, rules), dtype=np.int64)
+
+        uncategorized = UNCATEGORIZED_CONDITION.format(categorization_id=int(categorization_id))
+        bounds = [compiled.bounds(i) for i in range(len(rules))]
+        no_bound = 2**63 - 1
+
+        num_categorized = 0
+        num_read = 0
+        with self._conn.transaction(), self._conn.cursor() as curs:
+            curs.execute("CREATE TEMPORARY TABLE category_rules(rule_idx integer, min_cents bigint, max_cents bigint, category_id integer) ON COMMIT DROP;")
+            curs.execute("INSERT INTO category_rules SELECT * FROM unnest(%s::integer[], %s::bigint[], %s::bigint[], %s::integer[]);",
+                         (list(range(len(rules))), [-no_bound if lo is None else lo for lo, _ in bounds],
+                          [no_bound if hi is None else hi for _, hi in bounds], category_ids.tolist()))
+            curs.execute("CREATE TEMPORARY TABLE description_rules(description text, rule_idx integer) ON COMMIT DROP;")
+
+            # Only the distinct descriptions are sent here and matched; spooled to disk if there
+            # are a lot, since the connection can't COPY in until the COPY out is done
+            with tempfile.SpooledTemporaryFile(max_size=64 << 20) as descriptions:
+                query = f"COPY (SELECT DISTINCT coalesce(t.description, '') FROM transactions AS t WHERE {uncategorized}) TO STDOUT WITH (FORMAT csv)"
+                log_statement(logger, query, ())
+                with instrument("uncategorized_fetch") as m:
+                    with curs.copy(query) as copy:
+                        for block in copy:
+                            descriptions.write(block)
+                    m.nbytes = descriptions.tell()
+                descriptions.seek(0)
+
+                for chunk in iter_description_chunks(descriptions, chunk_rows=batch_size):
+                    num_read += len(chunk)
+                    with instrument("categorize") as m:
+                        m.rows, block = candidates_block(compiled, chunk)
+                    with instrument("stage") as m:
+                        with curs.copy("COPY description_rules FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (description))") as copy:
+                            copy.write(block)
+                        m.rows, m.nbytes = max(curs.rowcount, 0), len(block)
+            curs.execute("ANALYZE description_rules;")
+
+            # Of the rules a transaction's description could get, the first whose range has its amount
+            query = f"""
+                CREATE TEMPORARY TABLE new_xref ON COMMIT DROP AS
+                SELECT DISTINCT ON (t.id, t.posted_date) t.id AS transaction_id, t.posted_date AS transaction_posted_date, r.category_id
+                FROM transactions AS t
+                JOIN description_rules AS d ON d.description = coalesce(t.description, '')
+                JOIN category_rules AS r ON r.rule_idx = d.rule_idx
+                    AND (t.amount::numeric * 100)::bigint BETWEEN r.min_cents AND r.max_cents
+                WHERE {uncategorized}
+                ORDER BY t.id, t.posted_date, r.rule_idx;
+            """
+            log_statement(logger, query, ())
+            with instrument("categorize_match") as m:
+                curs.execute(query)
+                num_categorized = m.rows = curs.rowcount
+
+            self._insert_new_xref(curs, num_categorized)
+
+        logger.info(f"Categorized {num_categorized} uncategorized transactions ({num_read} distinct descriptions) in {categorization}")
+        return num_categorized
+
+    def _copy_to_frame(self, query: str, columns: dict[str, type], operation: str = "copy_fetch") -> pd.DataFrame:
+        """
+        Rows of a COPY (...) TO STDOUT WITH (FORMAT csv) query, in a DataFrame with the columns
+        named and typed by columns (see fintrackr.classify.iter_copied_chunks). Spooled to disk
+        if there are a lot.
+        """
+        with tempfile.SpooledTemporaryFile(max_size=64 << 20) as rows, self._conn.cursor() as curs:
+            log_statement(logger, query, ())
+            with instrument(operation) as m:
+                with curs.copy(query) as copy:
+                    for block in copy:
+                        rows.write(block)
+                m.nbytes = rows.tell()
+                rows.seek(0)
+                chunks = list(iter_copied_chunks(rows, columns))
+                m.rows = sum(len(chunk) for chunk in chunks)
+
+        if not chunks:
+            return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in columns.items()})
+        return pd.concat(chunks, ignore_index=True)
+
+    def labeled_transactions(self, categorization: str = "default") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Every transaction in a category of this user's categorization, for training a
+        classifier (see fintrackr.classify): read with one COPY.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            Descriptions (str, "" if there's none), amounts in cents (int64) and the label of
+            each transaction's category (str); empty if the categorization doesn't exist
+        """
+        ids = self.execute_query("SELECT id FROM categorizations WHERE username=%s AND name=%s;", (self.user, categorization))
+        if not ids:
+            logger.info(f"Categorization {categorization} doesn't exist; no labeled transactions")
+            return np.zeros(0, dtype=object), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=object)
+
+        query = """
+            COPY (
+                SELECT coalesce(t.description, ''), (t.amount::numeric * 100)::bigint, c.label
+                FROM transactions AS t
+                JOIN transactions_categories_xref AS x ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date
+                JOIN categories AS c ON c.id = x.category_id
+                WHERE c.categorization_id IN ({categorization_ids})
+            ) TO STDOUT WITH (FORMAT csv)
+        """.format(categorization_ids=", ".join(str(int(i)) for (i,) in ids))
+        df = self._copy_to_frame(query, {"description": str, "cents": np.int64, "label": str}, operation="labeled_fetch")
+        return df["description"].to_numpy(dtype=object), df["cents"].to_numpy(), df["label"].to_numpy(dtype=object)
+
+    def classify_transactions(self, model: NaiveBayesModel, categorization: str = "default", min_confidence: float = 0.0,
+                              batch_size: int = IMPORT_CHUNK_ROWS) -> int:
+        """
+        Label every transaction not yet in a category of categorization with model's most
+        likely label for it (see fintrackr.classify), and record the labels in
+        transactions_categories_xref. Transactions whose label has less than min_confidence
+        probability are left uncategorized.
+
+        As categorize_transactions: only the distinct (description, amount) pairs of the
+        uncategorized transactions are read, and labeled batch_size at a time; the labels are
+        sent back with COPY and written with one query, all in one transaction.
+
+        Parameters
+        ----------
+        model : NaiveBayesModel
+            e.g. from NaiveBayesModel.load
+        categorization : str
+            Name of this user's categorization (added, with any of model's labels that aren't
+            categories of it yet, if needed)
+        min_confidence : float
+            Least probability (0 to 1) of a label for it to be used
+        batch_size : int
+            Distinct (description, amount) pairs labeled per batch
+
+        Returns
+        -------
+        int
+            Number of transactions categorized
+        """
+        categorization_id = self.categorization_id(categorization)
+        category_ids = np.array(self.category_ids(categorization_id, [CategoryRule(label=str(label)) for label in model.labels]),
+                                dtype=np.int64)
+        uncategorized = UNCATEGORIZED_CONDITION.format(categorization_id=int(categorization_id))
+
+        num_categorized = 0
+        num_read = 0
+        with self._conn.transaction(), self._conn.cursor() as curs:
+            curs.execute("CREATE TEMPORARY TABLE description_labels(description text, cents bigint, category_id integer) ON COMMIT DROP;")
+
+            with tempfile.SpooledTemporaryFile(max_size=64 << 20) as rows:
+                query = f"COPY (SELECT DISTINCT coalesce(t.description, ''), (t.amount::numeric * 100)::bigint " \
+                        f"FROM transactions AS t WHERE {uncategorized}) TO STDOUT WITH (FORMAT csv)"
+                log_statement(logger, query, ())
+                with instrument("uncategorized_fetch") as m:
+                    with curs.copy(query) as copy:
+                        for block in copy:
+                            rows.write(block)
+                    m.nbytes = rows.tell()
+                rows.seek(0)
+
+                for chunk in iter_copied_chunks(rows, {"description": str, "cents": np.int64}, chunk_rows=batch_size):
+                    num_read += len(chunk)
+                    with instrument("classify") as m:
+                        m.rows, block = labels_block(model, chunk["description"].to_numpy(dtype=object), chunk["cents"].to_numpy(),
+                                                     category_ids, min_confidence=min_confidence)
+                    with instrument("stage") as m:
+                        with curs.copy("COPY description_labels FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (description))") as copy:
+                            copy.write(block)
+                        m.rows, m.nbytes = max(curs.rowcount, 0), len(block)
+            curs.execute("ANALYZE description_labels;")
+
+            query = f"""
+                CREATE TEMPORARY TABLE new_xref ON COMMIT DROP AS
+                SELECT t.id AS transaction_id, t.posted_date AS transaction_posted_date, d.category_id
+                FROM transactions AS t
+                JOIN description_labels AS d ON d.description = coalesce(t.description, '')
+                    AND d.cents = (t.amount::numeric * 100)::bigint
+                WHERE {uncategorized};
+            """
+            log_statement(logger, query, ())
+            with instrument("categorize_match") as m:
+                curs.execute(query)
+                num_categorized = m.rows = curs.rowcount
+
+            self._insert_new_xref(curs, num_categorized)
+
+        logger.info(f"Classified {num_categorized} uncategorized transactions ({num_read} distinct descriptions and amounts) in {categorization}")
+        return num_categorized
+
+    def detect_recurring_charges(self, categorization: str | None = "default", min_confidence: float = MIN_CONFIDENCE) -> pd.DataFrame:
+        """
+        Find recurring charges in the whole ledger (see fintrackr.recurring): every
+        transaction is read with one COPY, grouped by account and merchant, and each group
+        tagged monthly, annual or irregular. If categorization is given, the frequency of each
+        of its categories with transactions is set from its transactions' groups (see
+        recurring.category_frequencies), with the confidence in categories.frequency_confidence.
+
+        Parameters
+        ----------
+        categorization : str or None
+            Name of this user's categorization whose categories' frequencies are set (nothing
+            is written if None, or if it doesn't exist)
+        min_confidence : float
+            Least confidence (0 to 1) for a merchant or category to be monthly or annual
+
+        Returns
+        -------
+        pd.DataFrame
+            One row per (account, merchant, income) group, as from recurring.detect_recurring,
+            with account names in the account column
+        """
+        categorization_ids = []
+        if categorization is not None:
+            categorization_ids = self.execute_query("SELECT id FROM categorizations WHERE username=%s AND name=%s ORDER BY id LIMIT 1;",
+                                                    (self.user, categorization))
+            if not categorization_ids:
+                logger.info(f"Categorization {categorization} doesn't exist; category frequencies won't be set")
+
+        query = """
+            COPY (
+                SELECT t.data_source_id, t.posted_date - DATE '1970-01-01', (t.amount::numeric * 100)::bigint,
+                    coalesce(c.id, -1), coalesce(t.description, '')
+                FROM transactions AS t
+                LEFT JOIN (
+                    transactions_categories_xref AS x JOIN categories AS c ON c.id = x.category_id AND c.categorization_id = {categorization_id}
+                ) ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date
+            ) TO STDOUT WITH (FORMAT csv)
+        """.format(categorization_id=int(categorization_ids[0][0]) if categorization_ids else -1)
+        df = self._copy_to_frame(query, {"accnt_id": np.int64, "day": np.int64, "cents": np.int64, "category_id": np.int64,
+                                         "description": str}, operation="recurring_fetch")
+
+        with instrument("detect_recurring") as m:
+            groups, group = detect_recurring(merchant_keys(df["description"].to_numpy(dtype=object)), df["day"].to_numpy(),
+                                             df["cents"].to_numpy(), accounts=df["accnt_id"].to_numpy(), min_confidence=min_confidence)
+            m.rows = len(df)
+        accnt_names = dict(self.execute_query("SELECT id, name FROM data_sources;") or [])
+        groups["account"] = groups["account"].map(accnt_names)
+        logger.info(f"Found {(groups['frequency'] != 'irregular').sum()} recurring charges among {len(groups)} merchants in {len(df)} transactions")
+
+        if categorization_ids:
+            frequencies = category_frequencies(groups, group, df["category_id"].to_numpy(), min_confidence=min_confidence)
+            updated = self.execute_query(
+                "UPDATE categories SET frequency = u.frequency::recurrance, frequency_confidence = u.confidence "
+                "FROM unnest(%s::integer[], %s::text[], %s::real[]) AS u(id, frequency, confidence) "
+                "WHERE categories.id = u.id RETURNING categories.id;",
+                (frequencies["category_id"].tolist(), frequencies["frequency"].tolist(), frequencies["confidence"].tolist()),
+                operation="set_frequencies"
+            )
+            if updated is None:
+                raise ValueError("Could not set frequencies in categories table")
+            logger.info(f"Set the frequency of {len(updated)} categories in {categorization}")
+
+        return groups
+
+    def match_transfers(self, window_days: int = WINDOW_DAYS) -> int:
+        """
+        Find transfers between accounts among the transactions of loads not matched yet (see
+        fintrackr.transfers), and record them in transfers, so they're left out of spending
+        (the spending_transactions view).
+
+        A new transaction is paired with one from any load, new or not, that isn't in a transfer
+        yet, has the opposite amount, is in another account and is at most window_days away.
+        Only those with the amount of a new transaction and near its dates are read, with one
+        COPY; they're paired in memory, and the transfers written with one statement. Matches
+        run one at a time (others wait), and loads are only marked as matched once their
+        transfers are written.
+
+        Parameters
+        ----------
+        window_days : int
+            Most days between the two sides of a transfer
+
+        Returns
+        -------
+        int
+            Number of transfers found
+        """
+        with self._conn.transaction(), self._conn.cursor() as curs:
+            curs.execute("SELECT pg_advisory_xact_lock('transfers'::regclass::oid::integer, 0);")
+            curs.execute("CREATE TEMPORARY TABLE new_loads ON COMMIT DROP AS SELECT id FROM data_load_metadata WHERE NOT transfers_matched;")
+            if curs.rowcount == 0:
+                logger.info("No new loads to match transfers in")
+                return 0
+
+            query = """
+                COPY (
+                    WITH new AS (
+                        SELECT t.posted_date, abs((t.amount::numeric * 100)::bigint) AS cents
+                        FROM transactions AS t WHERE t.metadatum_id IN (SELECT id FROM new_loads)
+                    )
+                    SELECT t.id, t.posted_date - DATE '1970-01-01', (t.amount::numeric * 100)::bigint, t.data_source_id,
+                        t.metadatum_id IN (SELECT id FROM new_loads)
+                    FROM spending_transactions AS t
+                    WHERE t.posted_date BETWEEN (SELECT min(posted_date) FROM new) - {window_days} AND (SELECT max(posted_date) FROM new) + {window_days}
+                    AND abs((t.amount::numeric * 100)::bigint) IN (SELECT cents FROM new)
+                ) TO STDOUT WITH (FORMAT csv)
+            """.format(window_days=int(window_days))
+            df = self._copy_to_frame(query, {"id": np.int64, "day": np.int64, "cents": np.int64, "accnt_id": np.int64, "new": str},
+                                     operation="transfer_candidates_fetch")
+
+            with instrument("match_transfers") as m:
+                out_idx, in_idx = match_transfers(df["day"].to_numpy(), df["cents"].to_numpy(), df["accnt_id"].to_numpy(),
+                                                  new=(df["new"] == "t").to_numpy(), window_days=window_days)
+                m.rows = len(df)
+
+            ids, dates = df["id"].to_numpy(), df["day"].to_numpy().astype("datetime64[D]")
+            with instrument("transfers_insert") as m:
+                curs.execute("INSERT INTO transfers (out_transaction_id, out_posted_date, in_transaction_id, in_posted_date) "
+                             "SELECT * FROM unnest(%s::integer[], %s::date[], %s::integer[], %s::date[]);",
+                             (ids[out_idx].tolist(), dates[out_idx].tolist(), ids[in_idx].tolist(), dates[in_idx].tolist()))
+                m.rows = len(out_idx)
+            curs.execute("UPDATE data_load_metadata SET transfers_matched = true WHERE id IN (SELECT id FROM new_loads);")
+            num_loads = curs.rowcount
+
+        logger.info(f"Found {len(out_idx)} transfers among {len(df)} candidate transactions from {num_loads} new loads")
+        return len(out_idx)
+
+    def find_duplicates(self, window_days: int = DUPLICATE_WINDOW_DAYS, min_similarity: float = MIN_SIMILARITY,
+                        merge_similarity: float | None = None) -> Tuple[int, int]:
+        """
+        Find transactions that are likely re-exports of one from an earlier load, with a shifted
+        posted_date or a different description (see fintrackr.duplicates), and add them to the
+        possible_duplicates review queue. Pairs already queued or dismissed aren't added again.
+
+        The whole ledger is read with one COPY and the pairs found in memory; only transactions
+        with the same account and amount, at most window_days apart, are compared. Runs one at
+        a time (others wait).
+
+        Parameters
+        ----------
+        window_days : int
+            Most days between a transaction and its duplicate
+        min_similarity : float
+            Least similarity (0 to 1) of their descriptions to queue a pair
+        merge_similarity : float or None
+            If set, every pending pair in the queue with at least this similarity is merged
+            (see resolve_duplicates) rather than left for review
+
+        Returns
+        -------
+        Tuple[int, int]
+            Number of pairs queued, and number of duplicates merged
+        """
+        with self._conn.transaction(), self._conn.cursor() as curs:
+            curs.execute("SELECT pg_advisory_xact_lock('possible_duplicates'::regclass::oid::integer, 0);")
+            query = """
+                COPY (
+                    SELECT t.id, t.posted_date - DATE '1970-01-01', (t.amount::numeric * 100)::bigint, t.data_source_id,
+                        t.metadatum_id, coalesce(t.description, '')
+                    FROM transactions AS t
+                ) TO STDOUT WITH (FORMAT csv)
+            """
+            df = self._copy_to_frame(query, {"id": np.int64, "day": np.int64, "cents": np.int64, "accnt_id": np.int64,
+                                             "metadatum_id": np.int64, "description": str}, operation="duplicates_fetch")
+
+            with instrument("find_duplicates") as m:
+                pairs = find_duplicates(df["description"].to_numpy(dtype=object), df["day"].to_numpy(), df["cents"].to_numpy(),
+                                        df["accnt_id"].to_numpy(), df["metadatum_id"].to_numpy(), window_days=window_days,
+                                        min_similarity=min_similarity)
+                m.rows = len(df)
+
+            ids, dates = df["id"].to_numpy(), df["day"].to_numpy().astype("datetime64[D]")
+            original, duplicate = pairs["original"].to_numpy(), pairs["duplicate"].to_numpy()
+            with instrument("possible_duplicates_insert") as m:
+                curs.execute("INSERT INTO possible_duplicates (transaction_id, transaction_posted_date, original_id, original_posted_date, similarity) "
+                             "SELECT * FROM unnest(%s::integer[], %s::date[], %s::integer[], %s::date[], %s::real[]) ON CONFLICT DO NOTHING;",
+                             (ids[duplicate].tolist(), dates[duplicate].tolist(), ids[original].tolist(), dates[original].tolist(),
+                              pairs["similarity"].tolist()))
+                num_queued = m.rows = curs.rowcount
+
+            num_merged = 0
+            if merge_similarity is not None:
+                curs.execute("SELECT id FROM possible_duplicates WHERE NOT dismissed AND similarity >= %s;", (merge_similarity,))
+                num_merged = self._merge_duplicates(curs, [i for (i,) in curs.fetchall()])
+
+        logger.info(f"Queued {num_queued} possible duplicates (of {len(pairs)} found among {len(df)} transactions), merged {num_merged}")
+        return num_queued, num_merged
+
+    @staticmethod
+    def _merge_duplicates(curs: psycopg.Cursor, queue_ids: List[int]) -> int:
+        """
+        Delete the duplicates of the pending possible_duplicates rows queue_ids, in the caller's
+        transaction. A duplicate's categories (for categorizations its original isn't in) and
+        its side of a transfer (if its original isn't in one) move to the original first. A
+        duplicate whose original is also being merged is left for later. Returns the number of
+        transactions deleted.
+        """
+        curs.execute("""
+            CREATE TEMPORARY TABLE merging ON COMMIT DROP AS
+            SELECT DISTINCT ON (transaction_id, transaction_posted_date) transaction_id, transaction_posted_date, original_id, original_posted_date
+            FROM possible_duplicates
+            WHERE id = ANY(%s) AND NOT dismissed
+            ORDER BY transaction_id, transaction_posted_date, similarity DESC, id;
+        """, (queue_ids,))
+        curs.execute("DELETE FROM merging AS m USING merging AS o "
+                     "WHERE m.original_id = o.transaction_id AND m.original_posted_date = o.transaction_posted_date;")
+
+        with instrument("merge_duplicates") as m:
+            curs.execute("""
+                UPDATE transactions_categories_xref AS x
+                SET transaction_id = m.original_id, transaction_posted_date = m.original_posted_date
+                FROM merging AS m, categories AS c
+                WHERE x.transaction_id = m.transaction_id AND x.transaction_posted_date = m.transaction_posted_date AND c.id = x.category_id
+                AND NOT EXISTS (
+                    SELECT 1 FROM transactions_categories_xref AS y JOIN categories AS d ON d.id = y.category_id
+                    WHERE y.transaction_id = m.original_id AND y.transaction_posted_date = m.original_posted_date
+                    AND d.categorization_id = c.categorization_id
+                );
+            """)
+            curs.execute("DELETE FROM transactions_categories_xref AS x USING merging AS m "
+                         "WHERE x.transaction_id = m.transaction_id AND x.transaction_posted_date = m.transaction_posted_date;")
+
+            for side in ("out", "in"):
+                curs.execute("""
+                    UPDATE transfers AS f SET {side}_transaction_id = m.original_id, {side}_posted_date = m.original_posted_date
+                    FROM merging AS m
+                    WHERE f.{side}_transaction_id = m.transaction_id AND f.{side}_posted_date = m.transaction_posted_date
+                    AND NOT EXISTS (
+                        SELECT 1 FROM transfers AS g
+                        WHERE (g.out_transaction_id = m.original_id AND g.out_posted_date = m.original_posted_date)
+                        OR (g.in_transaction_id = m.original_id AND g.in_posted_date = m.original_posted_date)
+                    );
+                """.format(side=side))
+            curs.execute("DELETE FROM transfers AS f USING merging AS m "
+                         "WHERE (f.out_transaction_id = m.transaction_id AND f.out_posted_date = m.transaction_posted_date) "
+                         "OR (f.in_transaction_id = m.transaction_id AND f.in_posted_date = m.transaction_posted_date);")
+
+            # The delete trigger refreshes the daily balances of the duplicates' accounts
+            curs.execute("DELETE FROM transactions AS t USING merging AS m "
+                         "WHERE t.id = m.transaction_id AND t.posted_date = m.transaction_posted_date;")
+            num_deleted = curs.rowcount
+            m.rows = num_deleted
+
+        curs.execute("DROP TABLE merging;")
+        return num_deleted
+
+    def resolve_duplicates(self, queue_ids: List[int], merge: bool = True) -> int:
+        """
+        Act on reviewed rows of the possible_duplicates queue (see find_duplicates): merge each
+        pair, deleting the duplicate (its categories and transfer move to the original, where
+        that doesn't conflict), or dismiss it as not a duplicate.
+
+        Parameters
+        ----------
+        queue_ids : List[int]
+            ids in possible_duplicates
+        merge : bool
+            Merge (True) or dismiss (False)
+
+        Returns
+        -------
+        int
+            Number of duplicates deleted, or of pairs dismissed
+        """
+        with self._conn.transaction(), self._conn.cursor() as curs:
+            curs.execute("SELECT pg_advisory_xact_lock('possible_duplicates'::regclass::oid::integer, 0);")
+            if merge:
+                num = self._merge_duplicates(curs, list(queue_ids))
+            else:
+                curs.execute("UPDATE possible_duplicates SET dismissed = true WHERE id = ANY(%s) AND NOT dismissed;", (list(queue_ids),))
+                num = curs.rowcount
+
+        logger.info(f"{'Merged' if merge else 'Dismissed'} {num} of {len(queue_ids)} possible duplicates")
+        return num
+
+    def possible_duplicates(self) -> pd.DataFrame:
+        """
+        The pairs in the possible_duplicates queue waiting for review, most similar first.
+
+        Returns
+        -------
+        pd.DataFrame
+            Columns id (in possible_duplicates), account, amount (float), similarity, and
+            posted_date and description of the original and of the duplicate
+        """
+        rows = self.execute_query("""
+            SELECT p.id, s.name, t.amount::numeric::float8, p.similarity, o.posted_date, o.description, t.posted_date, t.description
+            FROM possible_duplicates AS p
+            JOIN transactions AS t ON t.id = p.transaction_id AND t.posted_date = p.transaction_posted_date
+            JOIN transactions AS o ON o.id = p.original_id AND o.posted_date = p.original_posted_date
+            JOIN data_sources AS s ON s.id = t.data_source_id
+            WHERE NOT p.dismissed
+            ORDER BY p.similarity DESC, p.id;
+        """, operation="possible_duplicates_fetch")
+        if rows is None:
+            raise ValueError("Failed to read possible_duplicates")
+        return pd.DataFrame(rows, columns=["id", "account", "amount", "similarity", "original_date", "original_description",
+                                           "duplicate_date", "duplicate_description"])
+
     # def get_uncategorized(self):
     #     """
     #     Return a csv of all transactions with no categorizations. 
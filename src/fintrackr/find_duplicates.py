@@ -0,0 +1,65 @@
+"""
+Find likely duplicate transactions that exact dedup missed (e.g. a bank's re-export of a
+transaction with a shifted posted_date or a different description) from the command line,
+add them to the possible_duplicates review queue, and print the queue (see
+fintrackr.duplicates and FinDB.find_duplicates). Reviewed pairs are merged or dismissed with
+resolve_duplicates.py.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+import pandas as pd
+
+import fintrackr.fin_db
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def find_duplicates(username: str, pw: str) -> pd.DataFrame:
+    """
+    Uses the db name and the duplicates section of config.yml.
+
+    Parameters
+    ----------
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+
+    Returns
+    -------
+    pd.DataFrame
+        The pairs waiting for review (see FinDB.possible_duplicates)
+    """
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+        duplicates_config = config.get("duplicates") or {}
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        FinDB.find_duplicates(window_days=duplicates_config.get("window_days", 3),
+                              min_similarity=duplicates_config.get("min_similarity", 0.5),
+                              merge_similarity=duplicates_config.get("merge_similarity"))
+        return FinDB.possible_duplicates()
+    finally:
+        FinDB.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) != 3:
+        raise TypeError("find_duplicates.py takes 2 input args: (1) db username; (2) db pw")
+
+    queue = find_duplicates(username = sys.argv[1], pw = sys.argv[2])
+
+    print(queue.to_string(index=False))
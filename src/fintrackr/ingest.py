@@ -0,0 +1,231 @@
+"""
+Reading and validating transaction files before they are loaded into the db.
+
+Functions here run in worker processes (see FinDB.add_transactions_many), so
+they must not touch the db and must be importable at module level.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import hashlib
+import os
+import logging
+import uuid
+import numpy as np
+import pandas as pd
+
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+
+from fintrackr.balances import to_cents
+
+logger = logging.getLogger(__name__)
+
+# Formatting in exported amounts: currency symbols, thousands separators and spaces; and a
+# negative amount in parentheses
+_AMOUNT_FORMATTING = r"[$\u00a3\u20ac\u00a5,\s]"
+_PARENTHESIZED = r"^\((.*)\)$"
+
+@dataclass
+class FileIngestResult:
+    """
+    Outcome of loading one file. staged counts the rows that passed validation and were
+    copied to staging; skipped are staged rows that were already in the db.
+    """
+    path: str
+    staged: int = 0
+    inserted: int = 0
+    error: str | None = None
+
+    @property
+    def skipped(self) -> int:
+        return self.staged - self.inserted
+
+
+@dataclass
+class IngestReport:
+    files: List[FileIngestResult] = field(default_factory=list)
+    wall_time: float = 0.0
+
+    @property
+    def staged(self) -> int:
+        return sum(f.staged for f in self.files)
+
+    @property
+    def inserted(self) -> int:
+        return sum(f.inserted for f in self.files)
+
+    @property
+    def skipped(self) -> int:
+        return sum(f.skipped for f in self.files)
+
+    def summary(self) -> str:
+        """
+        Human-readable, one line per file plus a totals line.
+        """
+        lines = []
+        for f in self.files:
+            if f.error is not None:
+                lines.append(f"{f.path}: not loaded ({f.error})")
+            else:
+                lines.append(f"{f.path}: {f.staged} staged, {f.inserted} inserted, {f.skipped} skipped")
+        lines.append(f"Total: {self.staged} staged, {self.inserted} inserted, {self.skipped} skipped "
+                     f"from {len(self.files)} files in {self.wall_time:.2f} s")
+        return "\n".join(lines)
+
+
+def read_transactions_file(path_to_file: str, file_id: int = 0) -> Tuple[int, str]:
+    """
+    Validate a csv of transactions (Date, Amount, Description; no header) and normalize it
+    into a block that can be sent as-is to COPY ... (FORMAT csv).
+
+    Parameters
+    ----------
+    path_to_file : str
+        Path to a csv where every row is a transaction.
+    file_id : int
+        Written as the first column of every output row, so rows from several files can
+        share one staging table.
+
+    Returns
+    -------
+    Tuple[int, str]
+        Number of rows, and the csv block (file_id, ISO date, amount, description).
+
+    Raises
+    ------
+    ValueError
+        If the file doesn't exist, isn't a csv, or any row is malformed.
+    """
+    _check_csv_path(path_to_file)
+
+    try:
+        df = pd.read_csv(path_to_file, header=None, dtype=str, keep_default_na=False)
+    except pd.errors.EmptyDataError:
+        return 0, ""
+
+    dates, amounts, _ = _parse_rows(df, path_to_file)
+
+    normalized = pd.DataFrame({
+        "file_id": file_id,
+        "posted_date": dates.dt.strftime("%Y-%m-%d"),
+        "amount": amounts,
+        "description": df[2],
+    })
+
+    return len(normalized), normalized.to_csv(index=False, header=False)
+
+
+def iter_transaction_chunks(path_to_file: str, chunk_rows: int = 100_000) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Validate and normalize a csv of transactions (as read_transactions_file) a chunk of rows
+    at a time, with each chunk converted in whole-column operations.
+
+    Parameters
+    ----------
+    path_to_file : str
+        Path to a csv where every row is a transaction.
+    chunk_rows : int
+        Rows per chunk
+
+    Yields
+    ------
+    Tuple[np.ndarray, np.ndarray, np.ndarray]
+        Dates (datetime64[D]), amounts (int64 cents) and descriptions (str objects; "" for an
+        empty field, which is stored as NULL) of a chunk.
+
+    Raises
+    ------
+    ValueError
+        If the file doesn't exist, isn't a csv, or any row is malformed. Chunks before the
+        malformed row have already been yielded.
+    """
+    _check_csv_path(path_to_file)
+
+    try:
+        reader = pd.read_csv(path_to_file, header=None, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+        for df in reader:
+            dates, _, values = _parse_rows(df, path_to_file)
+            yield dates.to_numpy(dtype="datetime64[D]"), to_cents(values), df[2].to_numpy(dtype=object)
+    except pd.errors.EmptyDataError:
+        return
+
+def _check_csv_path(path_to_file: str) -> None:
+    if not os.path.isfile(path_to_file):
+        raise ValueError(f"{path_to_file} not a path to a file that exists")
+    if not os.path.splitext(path_to_file)[1] == ".csv":
+        raise ValueError(f"{path_to_file} not a csv")
+
+def _normalize_amounts(amounts: pd.Series) -> pd.Series:
+    """
+    Amounts as money input accepts them in exports ("$1,234.56", "(12.00)", "-$5.00") as plain
+    numbers ("1234.56", "-12.00", "-5.00"): currency symbols, thousands separators and spaces
+    removed, and parentheses turned into a minus sign. Anything else is left for the numeric
+    parse to reject.
+    """
+    amounts = amounts.str.replace(_AMOUNT_FORMATTING, "", regex=True)
+    return amounts.str.replace(_PARENTHESIZED, r"-\1", regex=True)
+
+def _parse_rows(df: pd.DataFrame, path_to_file: str) -> Tuple[pd.Series, pd.Series, np.ndarray]:
+    """
+    Parsed dates, stripped amount strings and amounts as float64 dollars of rows read as str,
+    or ValueError naming the first malformed row (numbered from the start of the file).
+    """
+    if df.shape[1] != 3:
+        raise ValueError(f"{path_to_file} has {df.shape[1]} columns; expected 3 (Date, Amount, Description)")
+
+    # Same interpretation of dates that Postgres would make with its default DateStyle (MDY).
+    # Bank exports nearly always use MM/DD/YYYY, which parses much faster with an explicit format
+    raw_dates = df[0].str.strip()
+    dates = pd.to_datetime(raw_dates, format="%m/%d/%Y", errors="coerce")
+    other = dates.isna()
+    if other.any():
+        dates[other] = pd.to_datetime(raw_dates[other], format="mixed", dayfirst=False, errors="coerce")
+    amounts = df[1].str.strip()
+    try:
+        # Much faster than pd.to_numeric, which is only needed for formatted or bad amounts
+        values = amounts.to_numpy().astype(np.float64)
+        bad_amounts = ~np.isfinite(values)
+    except ValueError:
+        amounts = _normalize_amounts(amounts)
+        values = pd.to_numeric(amounts, errors="coerce").to_numpy(dtype=np.float64)
+        bad_amounts = np.isnan(values)
+    bad_rows = dates.isna().to_numpy() | bad_amounts
+    if bad_rows.any():
+        first_bad = df.index[bad_rows.argmax()]
+        raise ValueError(f"{path_to_file} row {first_bad + 1} is malformed: {list(df.loc[first_bad])}")
+
+    return dates, amounts, values
+
+def file_content_hash(path_to_file: str) -> bytes:
+    """
+    sha256 of a file's contents (stored as data_load_metadata.content_hash).
+    """
+    digest = hashlib.sha256()
+    with open(path_to_file, "rb") as f:
+        while block := f.read(1 << 20):
+            digest.update(block)
+    return digest.digest()
+
+def transaction_fingerprints(dates: np.ndarray, cents: np.ndarray, descriptions: np.ndarray) -> List[uuid.UUID]:
+    """
+    Fingerprints of a file's transactions, in file order, as the db's transaction_fingerprint
+    computes them (see schema.sql): md5 of the date, amount, description and which occurrence
+    of that triple in the file the row is.
+
+    Parameters
+    ----------
+    dates : np.ndarray
+        datetime64[D]
+    cents : np.ndarray
+        int64 amounts in cents
+    descriptions : np.ndarray
+        str
+    """
+    occurrences = pd.DataFrame({"d": dates, "c": cents, "m": descriptions}).groupby(["d", "c", "m"], sort=False).cumcount() + 1
+    # Same text as the db's amount::numeric::text for money, e.g. -0.07 or 1234.50
+    amounts = [f"{'-' if c < 0 else ''}{abs(c) // 100}.{abs(c) % 100:02d}" for c in cents.tolist()]
+    return [
+        uuid.UUID(hex=hashlib.md5(f"{d}|{a}|{m}|{n}".encode()).hexdigest())
+        for d, a, m, n in zip(np.datetime_as_string(dates, unit="D").tolist(), amounts, descriptions.tolist(), occurrences.tolist())
+    ]
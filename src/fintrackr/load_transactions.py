@@ -0,0 +1,88 @@
+"""
+Load one or more csvs of transactions into the db from the command line.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+
+from typing import List
+
+import fintrackr.fin_db
+from fintrackr.ingest import IngestReport
+from fintrackr.metrics import Metrics, add_hook, remove_hook, set_statement_log_sample_rate
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def load_transactions(paths: List[str], accnt_name: str, username: str, pw: str, max_workers: int = 4) -> IngestReport:
+    """
+    Load transactions from many files at once (see FinDB.add_transactions_many).
+
+    Uses the db name in config.yml. If its metrics section has an export_path, timings of
+    the db operations of this load are written there (see fintrackr.metrics). Unless
+    transfers.match_after_load is false, transfers between accounts among the new
+    transactions are found afterwards (see FinDB.match_transfers).
+
+    Parameters
+    ----------
+    paths : List[str]
+        csvs of transactions to load
+    accnt_name : str
+        Account the transactions belong to (name field in data_sources; added if it doesn't exist)
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    max_workers : int
+        Number of processes/connections to load with
+
+    Returns
+    -------
+    IngestReport
+    """
+
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+        pool_config = config.get("pool")
+        metrics_config = config.get("metrics") or {}
+        transfers_config = config.get("transfers") or {}
+
+    set_statement_log_sample_rate(metrics_config.get("log_sample_rate", 1.0))
+    export_path = metrics_config.get("export_path")
+    metrics = Metrics()
+    if export_path:
+        add_hook(metrics)
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name, pool_config=pool_config)
+
+    try:
+        report = FinDB.add_transactions_many(paths=paths, source_info=accnt_name, max_workers=max_workers)
+        if transfers_config.get("match_after_load", True):
+            FinDB.match_transfers(window_days=transfers_config.get("window_days", 3))
+    finally:
+        FinDB.close()
+        if export_path:
+            remove_hook(metrics)
+            metrics.write(export_path)
+            logger.info(f"Wrote db metrics to {export_path}")
+
+    return report
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) < 5:
+        raise TypeError("load_transactions.py takes at least 4 input args: (1) account name; (2) db username; (3) db pw; (4...) one or more csvs of transactions")
+
+    report = load_transactions(paths = sys.argv[4:], accnt_name = sys.argv[1], username = sys.argv[2], pw = sys.argv[3])
+
+    print(report.summary())
@@ -0,0 +1,60 @@
+"""
+Find transfers between accounts (e.g. credit card payments from checking) among transactions
+loaded since the last match, from the command line (see fintrackr.transfers and
+FinDB.match_transfers). load_transactions.py does this after every load unless
+transfers.match_after_load is false in config.yml.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+
+import fintrackr.fin_db
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def match_transfers(username: str, pw: str) -> int:
+    """
+    Uses the db name and transfers.window_days in config.yml.
+
+    Parameters
+    ----------
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+
+    Returns
+    -------
+    int
+        Number of transfers found
+    """
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+        window_days = (config.get("transfers") or {}).get("window_days", 3)
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        return FinDB.match_transfers(window_days=window_days)
+    finally:
+        FinDB.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) != 3:
+        raise TypeError("match_transfers.py takes 2 input args: (1) db username; (2) db pw")
+
+    num_transfers = match_transfers(username = sys.argv[1], pw = sys.argv[2])
+
+    print(f"Found {num_transfers} transfers")
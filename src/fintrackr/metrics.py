@@ -0,0 +1,178 @@
+"""
+Instrumentation for db operations: FinDB (and AsyncFinDB) time every statement and COPY
+with instrument(), under an operation name such as "stage", "dedup_insert" or
+"date_range_fetch", and pass the measurements to any registered hooks.
+
+A hook is any callable hook(operation, seconds, rows, nbytes, error). Metrics is one:
+it keeps latency histograms and row/byte totals per operation, and exports them as JSON
+or in the Prometheus text format. With no hooks registered, instrument() only costs a
+couple of clock reads.
+
+SQL statements are logged at DEBUG level, formatted only if that level is enabled, and
+only for a sample of them (set_statement_log_sample_rate).
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Callable, Iterator, List
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+Hook = Callable[[str, float, int, int, bool], None]
+
+_hooks: List[Hook] = []
+_statement_log_sample_rate = 1.0
+
+
+def add_hook(hook: Hook) -> None:
+    """
+    Call hook(operation, seconds, rows, nbytes, error) after every instrumented operation.
+    """
+    _hooks.append(hook)
+
+def remove_hook(hook: Hook) -> None:
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+def set_statement_log_sample_rate(rate: float) -> None:
+    """
+    Fraction (0 to 1) of SQL statements to log when DEBUG logging is on.
+    """
+    global _statement_log_sample_rate
+    if not 0 <= rate <= 1:
+        raise ValueError(f"Sample rate must be between 0 and 1; got {rate}")
+    _statement_log_sample_rate = rate
+
+def log_statement(logger: logging.Logger, query: str, vals: tuple = ()) -> None:
+    """
+    Log a statement about to be executed, lazily and sampled (see module docstring).
+    """
+    if logger.isEnabledFor(logging.DEBUG) and (_statement_log_sample_rate >= 1 or random.random() < _statement_log_sample_rate):
+        logger.debug("Executing query: %s, with vals: %s", query, vals)
+
+class Measurement:
+    """
+    Filled in by the instrumented code: rows returned or written, and bytes sent (COPY data).
+    """
+    __slots__ = ("rows", "nbytes")
+
+    def __init__(self):
+        self.rows = 0
+        self.nbytes = 0
+
+@contextmanager
+def instrument(operation: str) -> Iterator[Measurement]:
+    """
+    Time the body of the with statement as one instance of operation, and report it to
+    the hooks (with error=True if the body raised).
+    """
+    measurement = Measurement()
+    error = False
+    start = time.perf_counter()
+    try:
+        yield measurement
+    except BaseException:
+        error = True
+        raise
+    finally:
+        if _hooks:
+            seconds = time.perf_counter() - start
+            for hook in list(_hooks):
+                hook(operation, seconds, measurement.rows, measurement.nbytes, error)
+
+class Metrics:
+    """
+    A hook that aggregates measurements per operation. Safe to share between threads.
+
+    Register with add_hook(metrics); read with to_dict(), or export with write().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations: dict[str, dict] = {}
+
+    def __call__(self, operation: str, seconds: float, rows: int, nbytes: int, error: bool) -> None:
+        with self._lock:
+            stats = self._operations.get(operation)
+            if stats is None:
+                stats = self._operations[operation] = {
+                    "count": 0, "errors": 0, "seconds": 0.0, "rows": 0, "bytes": 0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                }
+            stats["count"] += 1
+            stats["errors"] += int(error)
+            stats["seconds"] += seconds
+            stats["rows"] += rows
+            stats["bytes"] += nbytes
+            i = 0
+            while i < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[i]:
+                i += 1
+            stats["buckets"][i] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations.clear()
+
+    def to_dict(self) -> dict:
+        """
+        {operation: {count, errors, seconds, rows, bytes, buckets}}, where buckets maps each
+        bucket's upper bound (as a string, "+Inf" for the last) to the number of operations
+        that took at most that long but longer than the previous bound.
+        """
+        bounds = [str(b) for b in LATENCY_BUCKETS] + ["+Inf"]
+        with self._lock:
+            return {
+                operation: dict(stats, buckets=dict(zip(bounds, stats["buckets"])))
+                for operation, stats in sorted(self._operations.items())
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self, prefix: str = "fintrackr_db") -> str:
+        """
+        Prometheus text exposition format: a latency histogram and row, byte and error
+        counters, each labelled by operation.
+        """
+        lines = [
+            f"# HELP {prefix}_operation_seconds Time taken by db operations.",
+            f"# TYPE {prefix}_operation_seconds histogram",
+        ]
+        operations = self.to_dict()
+        for operation, stats in operations.items():
+            cumulative = 0
+            for bound, n in stats["buckets"].items():
+                cumulative += n
+                lines.append(f'{prefix}_operation_seconds_bucket{{operation="{operation}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_operation_seconds_sum{{operation="{operation}"}} {stats["seconds"]}')
+            lines.append(f'{prefix}_operation_seconds_count{{operation="{operation}"}} {stats["count"]}')
+
+        for name, key, description in [("rows", "rows", "Rows returned or written"),
+                                       ("bytes", "bytes", "Bytes of COPY data sent"),
+                                       ("errors", "errors", "Operations that raised")]:
+            lines.append(f"# HELP {prefix}_operation_{name}_total {description} by db operations.")
+            lines.append(f"# TYPE {prefix}_operation_{name}_total counter")
+            for operation, stats in operations.items():
+                lines.append(f'{prefix}_operation_{name}_total{{operation="{operation}"}} {stats[key]}')
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """
+        Write to path, as Prometheus text if it ends in .prom and JSON otherwise. The file is
+        replaced in one step, so a collector never reads a partly written file.
+        """
+        text = self.to_prometheus() if path.endswith(".prom") else self.to_json()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
@@ -0,0 +1,79 @@
+# migrate.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+"""
+Bring an existing database up to date with schema.sql by running a migration
+script from src/fintrackr/migrations.
+
+New databases made with init_db already have the current schema and don't need this.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import os, sys
+import logging
+import psycopg
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+MIGRATIONS_DIR = os.path.join(os.getcwd(),"src","fintrackr","migrations")
+
+def migrate(
+        path_to_migration: str,
+        admin_pw: str,
+        path_to_config: str
+) -> None:
+    """
+    Run one migration script as the db owner, in a single transaction: either the
+    whole script is applied or none of it is.
+
+    Parameters
+    ----------
+    path_to_migration : str
+        Path to a .sql file in the migrations directory.
+    admin_pw : str
+        The password for the db owner, set when init_db was run. (Altering tables
+        requires owning them.)
+    path_to_config : str
+        Path to the config file to use, to get db_name, db_admin.
+
+    Returns
+    -------
+    None
+    """
+
+    if not os.path.isfile(path_to_migration):
+        raise ValueError(f"{path_to_migration} not a path to a file that exists")
+
+    with open(path_to_config, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+        db_admin = config["db"]["admin_name"]
+
+    with open(path_to_migration, "r") as f:
+        migration = f.read()
+
+    conn = psycopg.connect(f"dbname={db_name} user={db_admin} password={admin_pw} host='localhost'")
+    try:
+        with conn.transaction():
+            conn.execute(migration)
+    finally:
+        conn.close()
+
+    logger.info(f"Applied migration {path_to_migration} to {db_name}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+    if len(sys.argv) != 3:
+        raise TypeError("migrate.py accepts exactly 2 args: (1) migration file name or path; (2) db owner pw")
+    path_to_migration = sys.argv[1]
+    if not os.path.isfile(path_to_migration):
+        path_to_migration = os.path.join(MIGRATIONS_DIR, path_to_migration)
+    path_to_config = os.path.join(os.getcwd(), "src", "fintrackr", "config.yml")
+    migrate(path_to_migration=path_to_migration, admin_pw=sys.argv[2], path_to_config=path_to_config)
@@ -0,0 +1,32 @@
+/* Migration 001: content fingerprints on transactions
+
+Adds transactions.fingerprint with a unique index, so duplicate transactions are rejected
+by INSERT ... ON CONFLICT DO NOTHING instead of an anti-join against the whole table.
+Existing rows are numbered by id within each (posted_date, amount, description) so rows
+that were loaded as repeats of each other keep distinct fingerprints.
+
+Run with migrate.py (as the db owner).
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+CREATE OR REPLACE FUNCTION transaction_fingerprint(posted_date date, amount money, description text, occurrence bigint)
+RETURNS uuid AS $$
+    SELECT md5(to_char(posted_date, 'YYYY-MM-DD') || '|' || amount::numeric::text || '|' ||
+        coalesce(description, '') || '|' || occurrence::text)::uuid
+$$ LANGUAGE sql STABLE;
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS fingerprint uuid;
+
+UPDATE transactions AS t
+SET fingerprint = transaction_fingerprint(t.posted_date, t.amount, t.description, o.occurrence)
+FROM (
+    SELECT id, row_number() OVER (PARTITION BY posted_date, amount, description ORDER BY id) AS occurrence
+    FROM transactions
+) AS o
+WHERE o.id = t.id AND t.fingerprint IS NULL;
+
+ALTER TABLE transactions ALTER COLUMN fingerprint SET NOT NULL;
+
+ALTER TABLE transactions ADD CONSTRAINT transactions_fingerprint_key UNIQUE (fingerprint);
@@ -0,0 +1,130 @@
+/* Migration 002: daily balance snapshots
+
+Adds daily_balances (end-of-day balance per account per day), the refresh_daily_balances
+function and the triggers that keep it up to date as transactions and balances are inserted,
+then fills it for every existing account. Users added with add_user before this migration are
+granted the same access to the new table as they have to transactions.
+
+Run with migrate.py (as the db owner).
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+/* End-of-day balance of each account on each day it has transactions (or a stored balance),
+relative to the account's most recent row in balances; with no balances, relative to zero
+before its first transaction. Maintained by the triggers below; see refresh_daily_balances. */
+CREATE TABLE IF NOT EXISTS daily_balances(
+    id SERIAL PRIMARY KEY,
+    accnt_id integer NOT NULL REFERENCES data_sources(id),
+    day date NOT NULL,
+    amount money NOT NULL,
+    UNIQUE (accnt_id, day)
+);
+
+/* Recompute daily_balances for one account, for days on or after from_day (all days if NULL).
+Starts from the stored balance of the last day before from_day when that's still valid (the
+reference balance is before from_day), so only the affected days are read. Otherwise the
+whole account is recomputed. Returns the number of days written. */
+CREATE OR REPLACE FUNCTION refresh_daily_balances(p_accnt_id integer, from_day date)
+RETURNS integer AS $$
+DECLARE
+    ref_date date;
+    ref_amount money;
+    opening money; /* balance at the end of the day before the first day recomputed */
+    num_days integer;
+BEGIN
+    SELECT b.date, b.amount INTO ref_date, ref_amount
+    FROM balances b
+    WHERE b.accnt_id = p_accnt_id
+    ORDER BY b.date DESC, b.id DESC
+    LIMIT 1;
+
+    IF from_day IS NOT NULL AND (ref_date IS NULL OR ref_date < from_day) THEN
+        SELECT d.amount INTO opening
+        FROM daily_balances d
+        WHERE d.accnt_id = p_accnt_id AND d.day < from_day
+        ORDER BY d.day DESC
+        LIMIT 1;
+    END IF;
+
+    IF opening IS NULL THEN
+        from_day := NULL;
+        SELECT coalesce(ref_amount, 0::money) - coalesce(sum(t.amount), 0::money) INTO opening
+        FROM transactions t
+        JOIN data_load_metadata m ON m.id = t.metadatum_id
+        WHERE m.data_source_id = p_accnt_id AND t.posted_date <= ref_date;
+    END IF;
+
+    DELETE FROM daily_balances d
+    WHERE d.accnt_id = p_accnt_id AND (from_day IS NULL OR d.day >= from_day);
+
+    INSERT INTO daily_balances (accnt_id, day, amount)
+    SELECT p_accnt_id, n.day, opening + sum(n.net) OVER (ORDER BY n.day)
+    FROM (
+        SELECT u.day, sum(u.net) AS net
+        FROM (
+            SELECT t.posted_date AS day, t.amount AS net
+            FROM transactions t
+            JOIN data_load_metadata m ON m.id = t.metadatum_id
+            WHERE m.data_source_id = p_accnt_id AND (from_day IS NULL OR t.posted_date >= from_day)
+            UNION ALL /* the reference day always gets a row */
+            SELECT ref_date, 0::money
+            WHERE ref_date IS NOT NULL AND (from_day IS NULL OR ref_date >= from_day)
+        ) AS u
+        GROUP BY u.day
+    ) AS n;
+
+    GET DIAGNOSTICS num_days = ROW_COUNT;
+    RETURN num_days;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_daily_balances_after_transactions()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_daily_balances(m.data_source_id, min(i.posted_date))
+    FROM inserted i
+    JOIN data_load_metadata m ON m.id = i.metadatum_id
+    WHERE m.data_source_id IS NOT NULL
+    GROUP BY m.data_source_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_daily_balances_after_balances()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_daily_balances(i.accnt_id, min(i.date))
+    FROM inserted i
+    GROUP BY i.accnt_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+/* Once per INSERT statement (not per row), so a bulk load refreshes each account once */
+CREATE OR REPLACE TRIGGER transactions_refresh_daily_balances
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS inserted
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_transactions();
+
+CREATE OR REPLACE TRIGGER balances_refresh_daily_balances
+AFTER INSERT ON balances
+REFERENCING NEW TABLE AS inserted
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_balances();
+
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT DISTINCT grantee FROM information_schema.role_table_grants
+        WHERE table_name = 'transactions' AND grantee <> current_user
+    LOOP
+        EXECUTE format('GRANT ALL PRIVILEGES ON daily_balances TO %I', r.grantee);
+        EXECUTE format('GRANT USAGE, SELECT ON SEQUENCE daily_balances_id_seq TO %I', r.grantee);
+    END LOOP;
+END;
+$$;
+
+SELECT refresh_daily_balances(id, NULL) FROM data_sources;
@@ -0,0 +1,89 @@
+/* Migration 003: data_source_id on transactions, and indexes for date-range queries
+
+Copies each transaction's account from its data_load_metadata row onto the transaction, so
+queries by account and date can use an index on (data_source_id, posted_date) instead of
+joining through data_load_metadata. Also indexes the foreign keys used in joins, and points
+the daily_balances functions at the new column.
+
+Run with migrate.py (as the db owner), after 002.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+ALTER TABLE transactions ADD COLUMN IF NOT EXISTS data_source_id integer REFERENCES data_sources(id);
+
+UPDATE transactions AS t
+SET data_source_id = m.data_source_id
+FROM data_load_metadata AS m
+WHERE m.id = t.metadatum_id AND t.data_source_id IS NULL;
+
+ALTER TABLE transactions ALTER COLUMN data_source_id SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS transactions_data_source_id_posted_date_idx ON transactions (data_source_id, posted_date);
+CREATE INDEX IF NOT EXISTS transactions_metadatum_id_idx ON transactions (metadatum_id);
+CREATE INDEX IF NOT EXISTS data_load_metadata_data_source_id_idx ON data_load_metadata (data_source_id);
+
+CREATE OR REPLACE FUNCTION refresh_daily_balances(p_accnt_id integer, from_day date)
+RETURNS integer AS $$
+DECLARE
+    ref_date date;
+    ref_amount money;
+    opening money; /* balance at the end of the day before the first day recomputed */
+    num_days integer;
+BEGIN
+    SELECT b.date, b.amount INTO ref_date, ref_amount
+    FROM balances b
+    WHERE b.accnt_id = p_accnt_id
+    ORDER BY b.date DESC, b.id DESC
+    LIMIT 1;
+
+    IF from_day IS NOT NULL AND (ref_date IS NULL OR ref_date < from_day) THEN
+        SELECT d.amount INTO opening
+        FROM daily_balances d
+        WHERE d.accnt_id = p_accnt_id AND d.day < from_day
+        ORDER BY d.day DESC
+        LIMIT 1;
+    END IF;
+
+    IF opening IS NULL THEN
+        from_day := NULL;
+        SELECT coalesce(ref_amount, 0::money) - coalesce(sum(t.amount), 0::money) INTO opening
+        FROM transactions t
+        WHERE t.data_source_id = p_accnt_id AND t.posted_date <= ref_date;
+    END IF;
+
+    DELETE FROM daily_balances d
+    WHERE d.accnt_id = p_accnt_id AND (from_day IS NULL OR d.day >= from_day);
+
+    INSERT INTO daily_balances (accnt_id, day, amount)
+    SELECT p_accnt_id, n.day, opening + sum(n.net) OVER (ORDER BY n.day)
+    FROM (
+        SELECT u.day, sum(u.net) AS net
+        FROM (
+            SELECT t.posted_date AS day, t.amount AS net
+            FROM transactions t
+            WHERE t.data_source_id = p_accnt_id AND (from_day IS NULL OR t.posted_date >= from_day)
+            UNION ALL /* the reference day always gets a row */
+            SELECT ref_date, 0::money
+            WHERE ref_date IS NOT NULL AND (from_day IS NULL OR ref_date >= from_day)
+        ) AS u
+        GROUP BY u.day
+    ) AS n;
+
+    GET DIAGNOSTICS num_days = ROW_COUNT;
+    RETURN num_days;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_daily_balances_after_transactions()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_daily_balances(i.data_source_id, min(i.posted_date))
+    FROM inserted i
+    GROUP BY i.data_source_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+ANALYZE transactions;
@@ -0,0 +1,121 @@
+/* Migration 004: partition transactions by posted_date
+
+Replaces transactions with a table range-partitioned by posted_date (yearly; see
+transaction_partition_unit), keeping every row and id. Unique keys on a partitioned table
+must include the partition key, so the primary key becomes (id, posted_date), the fingerprint
+index becomes (fingerprint, posted_date), and transactions_categories_xref gains
+transaction_posted_date to reference transactions by.
+
+Run with migrate.py (as the db owner), after 003. The table is copied in one transaction, so
+this needs time and disk space for a second copy of transactions, and blocks loads meanwhile.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+/* Length of the periods transactions are partitioned into: 'year' (default), 'quarter' or 'month'.
+Only affects partitions created after it's changed, so set it before loading any data. */
+CREATE OR REPLACE FUNCTION transaction_partition_unit()
+RETURNS text AS $$
+    SELECT 'year'::text
+$$ LANGUAGE sql IMMUTABLE;
+
+/* Create any missing partitions of transactions for the periods from from_day to to_day, e.g.
+transactions_2025 (year), transactions_2025q1 (quarter) or transactions_2025_01 (month).
+Called before every insert into transactions. Runs as the db owner (who owns transactions) so
+that users can call it. Returns the number of partitions created. */
+CREATE OR REPLACE FUNCTION ensure_transaction_partitions(from_day date, to_day date)
+RETURNS integer AS $$
+DECLARE
+    unit text := transaction_partition_unit();
+    step interval := ('1 ' || transaction_partition_unit())::interval;
+    period_start date;
+    partition_name text;
+    num_created integer := 0;
+BEGIN
+    IF from_day IS NULL OR to_day IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    /* Concurrent loads would otherwise race to create the same partition */
+    PERFORM pg_advisory_xact_lock('transactions'::regclass::oid::bigint);
+
+    period_start := date_trunc(unit, from_day)::date;
+    WHILE period_start <= to_day LOOP
+        partition_name := 'transactions_' || to_char(period_start,
+            CASE unit WHEN 'year' THEN 'YYYY' WHEN 'quarter' THEN 'YYYY"q"Q' ELSE 'YYYY_MM' END);
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                partition_name, period_start, (period_start + step)::date);
+            num_created := num_created + 1;
+        END IF;
+        period_start := (period_start + step)::date;
+    END LOOP;
+
+    RETURN num_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+ALTER TABLE transactions_categories_xref DROP CONSTRAINT IF EXISTS transactions_categories_xref_transaction_id_fkey;
+ALTER TABLE transactions_categories_xref ADD COLUMN IF NOT EXISTS transaction_posted_date date;
+UPDATE transactions_categories_xref AS x
+SET transaction_posted_date = t.posted_date
+FROM transactions AS t
+WHERE t.id = x.transaction_id;
+ALTER TABLE transactions_categories_xref ALTER COLUMN transaction_posted_date SET NOT NULL;
+
+/* Keep the id sequence when the old table is dropped */
+ALTER SEQUENCE transactions_id_seq OWNED BY NONE;
+ALTER TABLE transactions RENAME TO transactions_unpartitioned;
+
+CREATE TABLE transactions(
+    id integer NOT NULL DEFAULT nextval('transactions_id_seq'),
+    posted_date date NOT NULL,
+    amount money NOT NULL,
+    description text,
+    metadatum_id integer NOT NULL,
+    data_source_id integer NOT NULL,
+    fingerprint uuid NOT NULL
+) PARTITION BY RANGE (posted_date);
+
+ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id;
+
+SELECT ensure_transaction_partitions(min(posted_date), max(posted_date)) FROM transactions_unpartitioned;
+
+INSERT INTO transactions (id, posted_date, amount, description, metadatum_id, data_source_id, fingerprint)
+SELECT id, posted_date, amount, description, metadatum_id, data_source_id, fingerprint
+FROM transactions_unpartitioned;
+
+/* Users added with add_user keep the access they had to the old table */
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT DISTINCT grantee FROM information_schema.role_table_grants
+        WHERE table_name = 'transactions_unpartitioned' AND grantee <> current_user
+    LOOP
+        EXECUTE format('GRANT ALL PRIVILEGES ON transactions TO %I', r.grantee);
+    END LOOP;
+END;
+$$;
+
+DROP TABLE transactions_unpartitioned;
+
+/* Constraints and indexes are added after the copy, which is faster than maintaining them during it */
+ALTER TABLE transactions ADD CONSTRAINT transactions_pkey PRIMARY KEY (id, posted_date);
+ALTER TABLE transactions ADD CONSTRAINT transactions_fingerprint_posted_date_key UNIQUE (fingerprint, posted_date);
+ALTER TABLE transactions ADD CONSTRAINT transactions_metadatum_id_fkey FOREIGN KEY (metadatum_id) REFERENCES data_load_metadata(id);
+ALTER TABLE transactions ADD CONSTRAINT transactions_data_source_id_fkey FOREIGN KEY (data_source_id) REFERENCES data_sources(id);
+CREATE INDEX transactions_data_source_id_posted_date_idx ON transactions (data_source_id, posted_date);
+CREATE INDEX transactions_metadatum_id_idx ON transactions (metadatum_id);
+
+ALTER TABLE transactions_categories_xref ADD CONSTRAINT transactions_categories_xref_transaction_id_transaction_po_fkey
+    FOREIGN KEY (transaction_id, transaction_posted_date) REFERENCES transactions(id, posted_date);
+
+CREATE TRIGGER transactions_refresh_daily_balances
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS inserted
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_transactions();
+
+ANALYZE transactions;
@@ -0,0 +1,14 @@
+/* Migration 005: content hashes of loaded files
+
+Adds data_load_metadata.content_hash, the sha256 of each file loaded from now on, so a file
+whose contents were already loaded (e.g. the same export downloaded twice under different
+names) is recognized and skipped before anything is staged. Files loaded before this have
+no hash; copies of those are still caught by the per-transaction dedup.
+
+Run with migrate.py (as the db owner), after 004.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+ALTER TABLE data_load_metadata ADD COLUMN IF NOT EXISTS content_hash bytea UNIQUE;
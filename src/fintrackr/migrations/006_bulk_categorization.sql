@@ -0,0 +1,51 @@
+/* Migration 006: bulk categorization
+
+Indexes transactions_categories_xref by transaction and by category, so finding the
+transactions a categorization hasn't labeled yet (see FinDB.categorize_transactions)
+doesn't scan the whole xref table for each one. Adds bulk_insert_xref, which labels many
+transactions at once and checks the foreign keys of transactions_categories_xref once for
+the whole table instead of once per row (see schema.sql).
+
+Run with migrate.py (as the db owner), after 005.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+CREATE INDEX IF NOT EXISTS transactions_categories_xref_transaction_idx ON transactions_categories_xref (transaction_id, transaction_posted_date);
+CREATE INDEX IF NOT EXISTS transactions_categories_xref_category_id_idx ON transactions_categories_xref (category_id);
+CREATE INDEX IF NOT EXISTS categories_categorization_id_idx ON categories (categorization_id);
+
+/* Add many rows to transactions_categories_xref at once (see FinDB.categorize_transactions).
+The foreign keys are checked one inserted row at a time, which for a partitioned table like
+transactions costs far more than the insert itself; here they're dropped, the rows inserted,
+and the foreign keys added back and validated against the whole table in one pass each. A row
+that fails the check raises foreign_key_violation and the whole call is rolled back.
+The drop locks transactions and transactions_categories_xref (ACCESS EXCLUSIVE) until the
+caller's transaction ends, so this is only worth it for large batches. Runs as the db owner
+(who owns the tables) so that users can call it. Returns the number of rows inserted. */
+CREATE OR REPLACE FUNCTION bulk_insert_xref(transaction_ids integer[], transaction_posted_dates date[], category_ids integer[])
+RETURNS bigint AS $$
+DECLARE
+    num_rows bigint;
+BEGIN
+    ALTER TABLE transactions_categories_xref
+        DROP CONSTRAINT transactions_categories_xref_transaction_id_transaction_po_fkey,
+        DROP CONSTRAINT transactions_categories_xref_category_id_fkey;
+
+    INSERT INTO transactions_categories_xref (transaction_id, transaction_posted_date, category_id)
+    SELECT * FROM unnest(transaction_ids, transaction_posted_dates, category_ids);
+    GET DIAGNOSTICS num_rows = ROW_COUNT;
+
+    /* Same definitions (and names) as in CREATE TABLE above */
+    ALTER TABLE transactions_categories_xref
+        ADD CONSTRAINT transactions_categories_xref_transaction_id_transaction_po_fkey
+            FOREIGN KEY (transaction_id, transaction_posted_date) REFERENCES transactions(id, posted_date) NOT VALID,
+        ADD CONSTRAINT transactions_categories_xref_category_id_fkey
+            FOREIGN KEY (category_id) REFERENCES categories(id) NOT VALID;
+    ALTER TABLE transactions_categories_xref VALIDATE CONSTRAINT transactions_categories_xref_transaction_id_transaction_po_fkey;
+    ALTER TABLE transactions_categories_xref VALIDATE CONSTRAINT transactions_categories_xref_category_id_fkey;
+
+    RETURN num_rows;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
@@ -0,0 +1,95 @@
+/* Migration 007: serialize daily_balances refreshes per account
+
+refresh_daily_balances deletes and re-inserts an account's days; two loads into the same
+account at once (e.g. AsyncFinDB.add_transactions calls gathered together) would both do
+that, and the second insert would fail on UNIQUE (accnt_id, day). It now takes a
+transaction-level advisory lock on the account first, and the triggers take the locks of a
+multi-account insert in order of account id.
+
+Run with migrate.py (as the db owner), after 006.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+/* Recompute daily_balances for one account, for days on or after from_day (all days if NULL).
+Starts from the stored balance of the last day before from_day when that's still valid (the
+reference balance is before from_day), so only the affected days are read. Otherwise the
+whole account is recomputed. Returns the number of days written. */
+CREATE OR REPLACE FUNCTION refresh_daily_balances(p_accnt_id integer, from_day date)
+RETURNS integer AS $$
+DECLARE
+    ref_date date;
+    ref_amount money;
+    opening money; /* balance at the end of the day before the first day recomputed */
+    num_days integer;
+BEGIN
+    /* Refreshes of the same account are serialized: otherwise two loads into it at once would
+    both delete its days and re-insert them, and the second insert would fail on UNIQUE (accnt_id, day) */
+    PERFORM pg_advisory_xact_lock('daily_balances'::regclass::oid::integer, p_accnt_id);
+
+    SELECT b.date, b.amount INTO ref_date, ref_amount
+    FROM balances b
+    WHERE b.accnt_id = p_accnt_id
+    ORDER BY b.date DESC, b.id DESC
+    LIMIT 1;
+
+    IF from_day IS NOT NULL AND (ref_date IS NULL OR ref_date < from_day) THEN
+        SELECT d.amount INTO opening
+        FROM daily_balances d
+        WHERE d.accnt_id = p_accnt_id AND d.day < from_day
+        ORDER BY d.day DESC
+        LIMIT 1;
+    END IF;
+
+    IF opening IS NULL THEN
+        from_day := NULL;
+        SELECT coalesce(ref_amount, 0::money) - coalesce(sum(t.amount), 0::money) INTO opening
+        FROM transactions t
+        WHERE t.data_source_id = p_accnt_id AND t.posted_date <= ref_date;
+    END IF;
+
+    DELETE FROM daily_balances d
+    WHERE d.accnt_id = p_accnt_id AND (from_day IS NULL OR d.day >= from_day);
+
+    INSERT INTO daily_balances (accnt_id, day, amount)
+    SELECT p_accnt_id, n.day, opening + sum(n.net) OVER (ORDER BY n.day)
+    FROM (
+        SELECT u.day, sum(u.net) AS net
+        FROM (
+            SELECT t.posted_date AS day, t.amount AS net
+            FROM transactions t
+            WHERE t.data_source_id = p_accnt_id AND (from_day IS NULL OR t.posted_date >= from_day)
+            UNION ALL /* the reference day always gets a row */
+            SELECT ref_date, 0::money
+            WHERE ref_date IS NOT NULL AND (from_day IS NULL OR ref_date >= from_day)
+        ) AS u
+        GROUP BY u.day
+    ) AS n;
+
+    GET DIAGNOSTICS num_days = ROW_COUNT;
+    RETURN num_days;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_daily_balances_after_transactions()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_daily_balances(i.data_source_id, min(i.posted_date))
+    FROM inserted i
+    GROUP BY i.data_source_id
+    ORDER BY i.data_source_id; /* locks taken in a fixed order, so concurrent loads can't deadlock */
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION refresh_daily_balances_after_balances()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_daily_balances(i.accnt_id, min(i.date))
+    FROM inserted i
+    GROUP BY i.accnt_id
+    ORDER BY i.accnt_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
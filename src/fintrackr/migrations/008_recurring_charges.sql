@@ -0,0 +1,13 @@
+/* Migration 008: inferred category frequencies
+
+Adds categories.frequency_confidence, set with frequency by FinDB.detect_recurring_charges
+from how regularly the category's merchants charge (NULL where frequency was set by a rule
+or by hand).
+
+Run with migrate.py (as the db owner), after 007.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+ALTER TABLE categories ADD COLUMN IF NOT EXISTS frequency_confidence real;
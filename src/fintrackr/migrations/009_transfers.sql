@@ -0,0 +1,48 @@
+/* Migration 009: transfers between accounts
+
+Adds the transfers table, which FinDB.match_transfers fills with pairs of transactions that
+are one transfer between two accounts, the spending_transactions view, which leaves them out,
+and data_load_metadata.transfers_matched, so only transactions from loads not matched yet
+are looked at. Files loaded before this are matched on the first run.
+
+Run with migrate.py (as the db owner), after 008.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+ALTER TABLE data_load_metadata ADD COLUMN IF NOT EXISTS transfers_matched boolean NOT NULL DEFAULT false;
+
+CREATE TABLE IF NOT EXISTS transfers(
+    id SERIAL PRIMARY KEY,
+    out_transaction_id integer NOT NULL,
+    out_posted_date date NOT NULL,
+    in_transaction_id integer NOT NULL,
+    in_posted_date date NOT NULL,
+    FOREIGN KEY (out_transaction_id, out_posted_date) REFERENCES transactions(id, posted_date),
+    FOREIGN KEY (in_transaction_id, in_posted_date) REFERENCES transactions(id, posted_date),
+    UNIQUE (out_transaction_id, out_posted_date),
+    UNIQUE (in_transaction_id, in_posted_date)
+);
+
+CREATE INDEX IF NOT EXISTS data_load_metadata_transfers_unmatched_idx ON data_load_metadata (id) WHERE NOT transfers_matched;
+
+CREATE OR REPLACE VIEW spending_transactions AS
+SELECT t.*
+FROM transactions AS t
+WHERE NOT EXISTS (SELECT 1 FROM transfers AS f WHERE f.out_transaction_id = t.id AND f.out_posted_date = t.posted_date)
+AND NOT EXISTS (SELECT 1 FROM transfers AS f WHERE f.in_transaction_id = t.id AND f.in_posted_date = t.posted_date);
+
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT DISTINCT grantee FROM information_schema.role_table_grants
+        WHERE table_name = 'transactions' AND grantee <> current_user
+    LOOP
+        EXECUTE format('GRANT ALL PRIVILEGES ON transfers, spending_transactions TO %I', r.grantee);
+        EXECUTE format('GRANT USAGE, SELECT ON SEQUENCE transfers_id_seq TO %I', r.grantee);
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,38 @@
+/* Migration 010: review queue of likely duplicate transactions
+
+Adds the possible_duplicates table, which FinDB.find_duplicates fills with pairs of
+transactions from different loads that look like one transaction exported twice (same account
+and amount, a few days apart, similar descriptions).
+
+Run with migrate.py (as the db owner), after 009.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+CREATE TABLE IF NOT EXISTS possible_duplicates(
+    id SERIAL PRIMARY KEY,
+    transaction_id integer NOT NULL,
+    transaction_posted_date date NOT NULL,
+    original_id integer NOT NULL,
+    original_posted_date date NOT NULL,
+    similarity real NOT NULL,
+    dismissed boolean NOT NULL DEFAULT false,
+    FOREIGN KEY (transaction_id, transaction_posted_date) REFERENCES transactions(id, posted_date) ON DELETE CASCADE,
+    FOREIGN KEY (original_id, original_posted_date) REFERENCES transactions(id, posted_date) ON DELETE CASCADE,
+    UNIQUE (transaction_id, transaction_posted_date, original_id, original_posted_date)
+);
+
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT DISTINCT grantee FROM information_schema.role_table_grants
+        WHERE table_name = 'transactions' AND grantee <> current_user
+    LOOP
+        EXECUTE format('GRANT ALL PRIVILEGES ON possible_duplicates TO %I', r.grantee);
+        EXECUTE format('GRANT USAGE, SELECT ON SEQUENCE possible_duplicates_id_seq TO %I', r.grantee);
+    END LOOP;
+END;
+$$;
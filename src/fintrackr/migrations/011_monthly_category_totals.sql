@@ -0,0 +1,174 @@
+/* Migration 011: monthly category rollups
+
+Adds monthly_category_totals, the net amount and number of spending transactions of each
+account in each month, per category and in total, and the triggers that mark the months a load,
+recategorization, transfer or merged duplicate changes as stale, so refresh_monthly_category_totals
+(called by FinDB.monthly_category_totals) only recomputes those. Every month with transactions
+starts out stale, so the first refresh fills the table.
+
+Run with migrate.py (as the db owner), after 010.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+/* Net amount and number of spending transactions (see spending_transactions) of each account in
+each month, per category, and in total (category_id NULL, so uncategorized spending is the total
+less the categories of a categorization); what budgeting reports read instead of the ledger (see
+FinDB.monthly_category_totals). Kept up to date by refresh_monthly_category_totals, which only
+recomputes the months in monthly_totals_stale. */
+CREATE TABLE IF NOT EXISTS monthly_category_totals(
+    id SERIAL PRIMARY KEY,
+    accnt_id integer NOT NULL REFERENCES data_sources(id),
+    month date NOT NULL, /* first day of the month */
+    category_id integer REFERENCES categories(id), /* NULL: all of the account's spending transactions that month */
+    amount money NOT NULL,
+    num_transactions integer NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS monthly_category_totals_key_idx ON monthly_category_totals (month, accnt_id, coalesce(category_id, 0));
+
+/* Months whose rows in monthly_category_totals are out of date, because transactions, their
+categories or transfers in them changed since the last refresh. Filled by the triggers below.
+Not unique, so that loads at the same time don't wait on each other's uncommitted rows; a month
+already marked isn't added again. */
+CREATE TABLE IF NOT EXISTS monthly_totals_stale(
+    month date NOT NULL
+);
+CREATE INDEX IF NOT EXISTS monthly_totals_stale_month_idx ON monthly_totals_stale (month);
+
+/* Recompute monthly_category_totals for the stale months, and mark them up to date. Refreshes
+run one at a time (others wait). Returns the number of months recomputed. */
+CREATE OR REPLACE FUNCTION refresh_monthly_category_totals()
+RETURNS integer AS $$
+DECLARE
+    months date[];
+    first_day date;
+    end_day date;
+BEGIN
+    PERFORM pg_advisory_xact_lock('monthly_category_totals'::regclass::oid::integer, 0);
+
+    WITH refreshed AS (DELETE FROM monthly_totals_stale RETURNING month)
+    SELECT coalesce(array_agg(DISTINCT month), '{}') INTO months FROM refreshed;
+    IF cardinality(months) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM monthly_category_totals r WHERE r.month = ANY(months);
+
+    /* One scan of the range the months span (pruned to its partitions), keeping the stale months */
+    SELECT min(m), (max(m) + interval '1 month')::date INTO first_day, end_day FROM unnest(months) AS m;
+
+    INSERT INTO monthly_category_totals (accnt_id, month, category_id, amount, num_transactions)
+    SELECT t.data_source_id, date_trunc('month', t.posted_date)::date, NULL, sum(t.amount), count(*)
+    FROM spending_transactions t
+    WHERE t.posted_date >= first_day AND t.posted_date < end_day AND date_trunc('month', t.posted_date)::date = ANY(months)
+    GROUP BY 1, 2;
+
+    INSERT INTO monthly_category_totals (accnt_id, month, category_id, amount, num_transactions)
+    SELECT t.data_source_id, date_trunc('month', t.posted_date)::date, x.category_id, sum(t.amount), count(*)
+    FROM spending_transactions t
+    JOIN transactions_categories_xref x ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date
+    WHERE t.posted_date >= first_day AND t.posted_date < end_day AND date_trunc('month', t.posted_date)::date = ANY(months)
+    GROUP BY 1, 2, 3;
+
+    RETURN cardinality(months);
+END;
+$$ LANGUAGE plpgsql;
+
+/* Mark months stale, unless they already are */
+CREATE OR REPLACE FUNCTION mark_months_stale(days date[])
+RETURNS void AS $$
+    INSERT INTO monthly_totals_stale (month)
+    SELECT DISTINCT date_trunc('month', d.day)::date FROM unnest(days) AS d(day)
+    WHERE NOT EXISTS (SELECT 1 FROM monthly_totals_stale s WHERE s.month = date_trunc('month', d.day)::date);
+$$ LANGUAGE sql;
+
+/* Once per statement, like the daily_balances triggers: each changed row's month is stale. The
+transition table is called changed in every trigger (and changed_new for the new rows of an UPDATE). */
+CREATE OR REPLACE FUNCTION mark_months_stale_after_transactions()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM mark_months_stale(array_agg(DISTINCT c.posted_date)) FROM changed c;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_months_stale_after_xref()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM mark_months_stale(array_agg(DISTINCT c.transaction_posted_date)) FROM changed c;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM mark_months_stale(array_agg(DISTINCT c.transaction_posted_date)) FROM changed_new c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION mark_months_stale_after_transfers()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM mark_months_stale(array_agg(DISTINCT c.out_posted_date) || array_agg(DISTINCT c.in_posted_date)) FROM changed c;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM mark_months_stale(array_agg(DISTINCT c.out_posted_date) || array_agg(DISTINCT c.in_posted_date)) FROM changed_new c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER transactions_insert_mark_months_stale
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transactions();
+
+CREATE OR REPLACE TRIGGER transactions_delete_mark_months_stale
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transactions();
+
+CREATE OR REPLACE TRIGGER xref_insert_mark_months_stale
+AFTER INSERT ON transactions_categories_xref
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_xref();
+
+CREATE OR REPLACE TRIGGER xref_update_mark_months_stale
+AFTER UPDATE ON transactions_categories_xref
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_xref();
+
+CREATE OR REPLACE TRIGGER xref_delete_mark_months_stale
+AFTER DELETE ON transactions_categories_xref
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_xref();
+
+CREATE OR REPLACE TRIGGER transfers_insert_mark_months_stale
+AFTER INSERT ON transfers
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transfers();
+
+CREATE OR REPLACE TRIGGER transfers_update_mark_months_stale
+AFTER UPDATE ON transfers
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transfers();
+
+CREATE OR REPLACE TRIGGER transfers_delete_mark_months_stale
+AFTER DELETE ON transfers
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transfers();
+
+INSERT INTO monthly_totals_stale (month)
+SELECT DISTINCT date_trunc('month', t.posted_date)::date FROM transactions t
+WHERE NOT EXISTS (SELECT 1 FROM monthly_totals_stale s WHERE s.month = date_trunc('month', t.posted_date)::date);
+
+DO $$
+DECLARE
+    r record;
+BEGIN
+    FOR r IN
+        SELECT DISTINCT grantee FROM information_schema.role_table_grants
+        WHERE table_name = 'transactions' AND grantee <> current_user
+    LOOP
+        EXECUTE format('GRANT ALL PRIVILEGES ON monthly_category_totals, monthly_totals_stale TO %I', r.grantee);
+        EXECUTE format('GRANT USAGE, SELECT ON SEQUENCE monthly_category_totals_id_seq TO %I', r.grantee);
+    END LOOP;
+END;
+$$;
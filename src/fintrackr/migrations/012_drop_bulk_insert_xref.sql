@@ -0,0 +1,15 @@
+/* Migration 012: drop bulk_insert_xref
+
+Removes bulk_insert_xref (added by 006), which dropped and re-added the foreign keys of
+transactions_categories_xref around a large insert: that locked transactions for every reader
+and loader until the caller committed, revalidated the whole xref table each time, and let any
+user make the db owner run ALTER TABLE. FinDB.categorize_transactions now always writes labels
+with a plain INSERT, whose foreign keys are checked per row.
+
+Run with migrate.py (as the db owner), after 011.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+DROP FUNCTION IF EXISTS bulk_insert_xref(integer[], date[], integer[]);
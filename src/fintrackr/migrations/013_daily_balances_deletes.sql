@@ -0,0 +1,77 @@
+/* Migration 013: refresh daily_balances after deletes and updates
+
+daily_balances was only refreshed after inserts into transactions and balances, so deleting
+or changing a row left the account's days stale until something else was loaded into it.
+Statement-level DELETE and UPDATE triggers now refresh each affected account from the earliest
+day a changed transaction was on (and in full after a change to its balances).
+
+Run with migrate.py (as the db owner), after 012.
+
+Copyright (c) 2026 Stephanie Johnson
+
+*/
+
+/* Deletes and updates refresh each account from the earliest day a changed row was on, before
+or after the change (an update that leaves the account, day and amount alone changes nothing).
+The transition table is called changed (and changed_new for the new rows of an UPDATE). */
+CREATE OR REPLACE FUNCTION refresh_daily_balances_after_transactions_change()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_daily_balances(u.data_source_id, min(u.posted_date))
+        FROM (
+            SELECT o.data_source_id, o.posted_date FROM changed o JOIN changed_new n ON n.id = o.id
+            WHERE (o.data_source_id, o.posted_date, o.amount) IS DISTINCT FROM (n.data_source_id, n.posted_date, n.amount)
+            UNION ALL
+            SELECT n.data_source_id, n.posted_date FROM changed o JOIN changed_new n ON n.id = o.id
+            WHERE (o.data_source_id, o.posted_date, o.amount) IS DISTINCT FROM (n.data_source_id, n.posted_date, n.amount)
+        ) AS u
+        GROUP BY u.data_source_id
+        ORDER BY u.data_source_id;
+    ELSE
+        PERFORM refresh_daily_balances(c.data_source_id, min(c.posted_date))
+        FROM changed c
+        GROUP BY c.data_source_id
+        ORDER BY c.data_source_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+/* A deleted or changed balance may have been its account's reference, which every day of the
+account is relative to, so its accounts are recomputed in full */
+CREATE OR REPLACE FUNCTION refresh_daily_balances_after_balances_change()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_daily_balances(u.accnt_id, NULL)
+        FROM (SELECT c.accnt_id FROM changed c UNION SELECT n.accnt_id FROM changed_new n) AS u
+        ORDER BY u.accnt_id;
+    ELSE
+        PERFORM refresh_daily_balances(c.accnt_id, NULL)
+        FROM (SELECT DISTINCT accnt_id FROM changed) AS c
+        ORDER BY c.accnt_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER transactions_delete_refresh_daily_balances
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_transactions_change();
+
+CREATE OR REPLACE TRIGGER transactions_update_refresh_daily_balances
+AFTER UPDATE ON transactions
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_transactions_change();
+
+CREATE OR REPLACE TRIGGER balances_delete_refresh_daily_balances
+AFTER DELETE ON balances
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_balances_change();
+
+CREATE OR REPLACE TRIGGER balances_update_refresh_daily_balances
+AFTER UPDATE ON balances
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_balances_change();
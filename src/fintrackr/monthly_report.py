@@ -0,0 +1,78 @@
+"""
+Print spending by category per month from the command line: the net amount of each category
+of a categorization in each month, summed over accounts, with transfers left out (see
+FinDB.monthly_category_totals, which reads the monthly_category_totals rollup rather than the
+ledger, after recomputing only the months that changed).
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+import pandas as pd
+
+from datetime import date
+
+import fintrackr.fin_db
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+UNCATEGORIZED = "(uncategorized)"
+
+
+def monthly_report(username: str, pw: str, first_month: str, last_month: str, categorization: str = "default") -> pd.DataFrame:
+    """
+    Uses the db name in config.yml.
+
+    Parameters
+    ----------
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    first_month, last_month : str
+        YYYY-MM
+    categorization : str
+        Name of the categorization whose categories are reported
+
+    Returns
+    -------
+    pd.DataFrame
+        Net amount by category (rows; UNCATEGORIZED for transactions in none) and month
+        (columns, YYYY-MM), summed over accounts
+    """
+    first = date.fromisoformat(f"{first_month}-01")
+    last = date.fromisoformat(f"{last_month}-01")
+
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        totals = FinDB.monthly_category_totals(categorization=categorization, date_range=[first, last])
+    finally:
+        FinDB.close()
+
+    totals["category"] = totals["category"].fillna(UNCATEGORIZED)
+    totals["month"] = pd.to_datetime(totals["month"]).dt.strftime("%Y-%m")
+    return totals.pivot_table(index="category", columns="month", values="amount", aggfunc="sum", fill_value=0.0)
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) not in (5, 6):
+        raise TypeError("monthly_report.py takes 4 or 5 input args: (1) db username; (2) db pw; (3) first month (YYYY-MM); "
+                        "(4) last month (YYYY-MM); (5, optional) categorization name (default: default)")
+
+    report = monthly_report(username = sys.argv[1], pw = sys.argv[2], first_month = sys.argv[3], last_month = sys.argv[4],
+                            categorization = sys.argv[5] if len(sys.argv) == 6 else "default")
+
+    print(report.to_string(float_format="{:,.2f}".format))
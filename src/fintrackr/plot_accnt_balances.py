@@ -7,14 +7,16 @@ Copyright (c) 2026 Stephanie Johnson
 import logging
 import yaml
 import os, sys
+import itertools
 import numpy as np
 import matplotlib.pyplot as plt
 
-from typing import List
+from typing import Iterable, Iterator, List, Tuple
 from datetime import date
 
 import fintrackr.fin_db
-from fintrackr.utils import Transaction
+from fintrackr.balances import running_balances, to_cents
+from fintrackr.utils import Transaction, TransactionBatch
 
 CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
 
@@ -24,7 +26,7 @@ DEFAULT_LOGGING_FORMAT = (
 )
 
 
-def relative_bal_by_date(references: List[Transaction], transactions: List[Transaction]) -> List[Transaction]:
+def relative_bal_by_date(references: List[Transaction], transactions: List[Transaction] | TransactionBatch) -> List[Transaction] | TransactionBatch:
     """
     Return a list of Transactions calculated relative to the amount on date in references.
     If references is a List of len>1, uses the chronologically *most recent* account balance.
@@ -39,62 +41,118 @@ def relative_bal_by_date(references: List[Transaction], transactions: List[Trans
     ----------
     references : List[Transactions]
         Calculate all balances relative to the amount for the most recent date
-    transactions : List[Transactions]
+    transactions : List[Transactions] or TransactionBatch
         List of transactions (date, amount); calculate account balance as a result of each transaction
     
     Return
     ------
-    List[Transaction]
+    List[Transaction] or TransactionBatch (whichever transactions was)
         Account balances as a result of the list of dated transactions.
         If there are multiple transactions per day, there will be multiple balances - 
         not aggregated per day.
     """
-
+    as_batch = isinstance(transactions, TransactionBatch)
     if len(transactions) == 0:
-        return []
+        return transactions[:0] if as_batch else []
+
+    if not as_batch:
+        transactions = TransactionBatch.from_transactions(transactions)
     
     # Set a single absolute account balance on a date, which all subsequent balances will be relative to
+    ref_date, ref_cents = None, 0 # None means zero at the end of the earliest transaction date
     if len(references) >= 1:
-        ref = sorted(references, key=lambda r: r.date)[-1] # [date, amount] of chronologically most recent account balance
-    else:
-        ref = Transaction(date = sorted(transactions, key=lambda t: t.date)[0].date, amount = 0.00) # Set balance for first transaction date to zero
+        ref = sorted(references, key=lambda r: r.date)[-1] # chronologically most recent account balance
+        ref_date, ref_cents = np.datetime64(ref.date, "D"), int(to_cents([ref.amount])[0])
 
-    # balances have to be cumulative relative to ref_bal, by date
-    transactions.sort(key=lambda a: a.date) # sort all transactions by date
+    balances = TransactionBatch(*running_balances(
+        dates = transactions.dates,
+        cents = transactions.cents,
+        ref_date = ref_date,
+        ref_cents = ref_cents
+    ))
 
-    earlier_trans = [t for t in transactions if t.date<=ref.date] # Balances are for end of day
-    if len(earlier_trans) > 0:
-        # Add the extra initial balance for the first day:
-        earlier_bals_tuple = list(zip([earlier_trans[0].date]+[a.date for a in earlier_trans[:-1]], reversed(ref.amount-np.cumsum([a.amount for a in reversed(earlier_trans)]))))
-        earlier_bals = [Transaction(date=d, amount=a) for d, a in earlier_bals_tuple]
-    else:
-        earlier_bals = []
-    
-    later_trans = [t for t in transactions if t.date>ref.date] 
-    if len(later_trans) > 0:
-        later_bals_tuple = list(zip([a.date for a in later_trans], np.cumsum([a.amount for a in later_trans])+ref.amount))
-        later_bals = [Transaction(date=d, amount=a) for d, a in later_bals_tuple]
-    else:
-        later_bals = []
-    
-    if len(earlier_trans) > 0:
-        return earlier_bals + [Transaction(date=earlier_trans[-1].date, amount=ref.amount)] + later_bals
+    return balances if as_batch else balances.to_list()
+
+def relative_bal_by_date_iter(transaction_batches: Iterable[TransactionBatch | List[Transaction]], reference: Transaction | None = None, 
+                              cents_through_reference: int = 0) -> Iterator[TransactionBatch]:
+    """
+    Streaming version of relative_bal_by_date, for transactions that arrive in batches
+    (e.g. from FinDB.iter_date_range). Only one batch is held at a time, so memory doesn't
+    grow with the number of transactions. Same end-of-day semantics as relative_bal_by_date,
+    including the extra initial balance when the first transaction is on or before the reference date.
+
+    Because balances before the reference depend on transactions that haven't arrived yet,
+    the caller passes in their total (e.g. from FinDB.sum_in_date_range).
+
+    Parameters
+    ----------
+    transaction_batches : Iterable[TransactionBatch or List[Transaction]]
+        Transactions, sorted by date across all batches.
+    reference : Transaction or None
+        Known balance (e.g. the most recent stored balance). If None, the balance at the end
+        of the earliest transaction date is zero, as in relative_bal_by_date.
+    cents_through_reference : int
+        Total of all transactions dated on or before reference.date, in cents. Ignored if reference is None.
+
+    Yields
+    ------
+    TransactionBatch
+        Account balances, one batch per input batch.
+    """
+    batches = (b if isinstance(b, TransactionBatch) else TransactionBatch.from_transactions(b)
+               for b in transaction_batches if len(b) > 0)
+    head = next(batches, None)
+    if head is None:
+        return
+
+    held = [head]
+    if reference is None:
+        # Zero at the end of the first day, so hold batches until the whole first day has been seen
+        reference = Transaction(date=head[0].date, amount=0.00)
+        while held[-1].dates[-1] == held[0].dates[0]:
+            next_batch = next(batches, None)
+            if next_batch is None:
+                break
+            held.append(next_batch)
+        running = -int(sum(b.cents[b.dates == head.dates[0]].sum() for b in held))
     else:
-        return earlier_bals + later_bals
+        running = int(to_cents([reference.amount])[0]) - int(cents_through_reference)
+
+    # running is now the balance before the first transaction, in cents; everything after is a running sum from here
+    first = head[0].date <= reference.date
+    for batch in itertools.chain(held, batches):
+        bals = running + np.cumsum(batch.cents)
+        running_before, running = running, int(bals[-1])
+        if first:
+            first = False
+            yield TransactionBatch(np.concatenate((batch.dates[:1], batch.dates)), np.concatenate(([running_before], bals)))
+        else:
+            yield TransactionBatch(batch.dates, bals)
+
+def _to_arrays(transactions: Iterable[Transaction] | TransactionBatch) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Dates and amounts of any iterable of Transactions (including a lazy one) as two arrays,
+    built in one pass without an intermediate list. A TransactionBatch's columns are used as is.
+    """
+    if isinstance(transactions, TransactionBatch):
+        return transactions.dates, transactions.amounts
+    rows = np.fromiter(((t.date, t.amount) for t in transactions), dtype=[("date", "datetime64[D]"), ("amount", "f8")])
+    return rows["date"], rows["amount"]
 
-def plot_balances(all_balances: List[Transaction], calculated_balances: List[Transaction]) -> None:
+def plot_balances(all_balances: List[Transaction] | TransactionBatch, calculated_balances: Iterable[Transaction] | TransactionBatch) -> None:
     """
     Plot calculated account balances (from transactions) as well as any stored balances in 
     the same range of dates. Dates are on x, balances are on y
     
     Parameters
     ----------
-    all_balances : List[Transaction]
+    all_balances : List[Transaction] or TransactionBatch
         Any balances stored in the db. Plotted as red o's for comparison to calculated values.
         Hopefully they match, but there's no guarantee they will (e.g. if some transactions
         are missing from the db)
-    calculated_balances : List[Transaction]
+    calculated_balances : Iterable[Transaction] or TransactionBatch
         Account balances calcualted from list of transactions. Plotted as blue .'s   
+        Can be a generator (it's consumed once, without making a list of it).
 
     Returns
     -------
@@ -102,12 +160,9 @@ def plot_balances(all_balances: List[Transaction], calculated_balances: List[Tra
 
     """
     
-    # Rearrange inputs into tuple of lists
-    calc_date, calc_amt = zip(*calculated_balances)
-    calculated = (list(calc_date), list(calc_amt))
-
-    input_date, input_amt = zip(*all_balances)
-    inputted = (list(input_date), list(input_amt))
+    # Rearrange inputs into tuple of arrays
+    calculated = _to_arrays(calculated_balances)
+    inputted = _to_arrays(all_balances)
 
     plt.plot(calculated[0], calculated[1], ".b")
     plt.plot(inputted[0], inputted[1], "or", markerfacecolor='none')
@@ -121,10 +176,10 @@ def plot_balances(all_balances: List[Transaction], calculated_balances: List[Tra
 def plot_accnt_balances(accnt_name: str, date_range: List[date], username: str, pw: str) -> None:
     """
     Plot specified account data within date range.
-    If no point-in-time account balance is saved in the db, 
-    balances will be relative to the first date in the date range.
-    If there are multiple balances in date range, balances will be
-    relative to the most recent; and the rest will be plotted for references.
+    Calculated balances are the end-of-day balances in the db's daily_balances table (one
+    per day with transactions), which are relative to the account's most recent saved
+    balance, or to zero before its first transaction if no balance is saved.
+    Saved balances in the date range are plotted for reference.
 
     Uses the db name in config.yml.
 
@@ -148,19 +203,17 @@ def plot_accnt_balances(accnt_name: str, date_range: List[date], username: str,
     with open(CONFIG_PATH, "r") as config_file:
         config = yaml.safe_load(config_file)
         db_name = config["db"]["db_name"]
+        pool_config = config.get("pool")
 
-    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
-
-    amts = FinDB.data_from_date_range(
-        data_source = accnt_name, 
-        date_range = date_range
-    )
-
-    FinDB.close()
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name, pool_config=pool_config)
 
-    abs_trans = relative_bal_by_date(references = amts["balances"], transactions = amts["transactions"])
+    try:
+        balances = FinDB.balances_in_date_range(data_source = accnt_name, date_range = date_range)
+        daily_balances = FinDB.daily_balances_in_date_range(data_source = accnt_name, date_range = date_range)
 
-    plot_balances(all_balances=amts["balances"], calculated_balances=abs_trans)
+        plot_balances(all_balances=balances, calculated_balances=daily_balances)
+    finally:
+        FinDB.close()
 
 if __name__ == "__main__":
     logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
@@ -170,4 +223,4 @@ if __name__ == "__main__":
 
     path_to_config = os.path.join(os.getcwd(), "src", "fintrackr", "config.yml")
 
-    plot_accnt_balances(accnt_name = sys.argv[1], date_range = [sys.argv[2], sys.argv[3]], username = sys.argv[4], pw = sys.argv[5])
+    plot_accnt_balances(accnt_name = sys.argv[1], date_range = [date.fromisoformat(sys.argv[2]), date.fromisoformat(sys.argv[3])], username = sys.argv[4], pw = sys.argv[5])
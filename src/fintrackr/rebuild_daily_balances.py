@@ -0,0 +1,60 @@
+"""
+Recompute the daily_balances table from the command line, for one account or all of them
+(see FinDB.rebuild_daily_balances).
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+
+import fintrackr.fin_db
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def rebuild_daily_balances(username: str, pw: str, accnt_name: str | None = None) -> int:
+    """
+    Uses the db name in config.yml.
+
+    Parameters
+    ----------
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    accnt_name : str or None
+        Account to rebuild (name field in data_sources); None for all accounts
+
+    Returns
+    -------
+    int
+        Number of daily balances written
+    """
+
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        return FinDB.rebuild_daily_balances(accnt=accnt_name)
+    finally:
+        FinDB.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) not in (3, 4):
+        raise TypeError("rebuild_daily_balances.py takes 2 or 3 input args: (1) db username; (2) db pw; (3, optional) account name (default: all accounts)")
+
+    num_days = rebuild_daily_balances(username = sys.argv[1], pw = sys.argv[2], accnt_name = sys.argv[3] if len(sys.argv) == 4 else None)
+
+    print(f"Rebuilt {num_days} daily balances")
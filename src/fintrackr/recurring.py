@@ -0,0 +1,193 @@
+"""
+Detection of recurring charges (see FinDB.detect_recurring_charges).
+
+Descriptions are normalized into merchant keys (lowercase, without store and reference
+numbers or punctuation), and a ledger's transactions grouped by (account, merchant key,
+expense or income) with one sort. Within each group, the days between one charge and the
+next, and the spread of the amounts, are computed for every group at once with array
+operations, and each group is tagged with a frequency from the recurrance type in
+schema.sql: monthly if most of its intervals are about a month, annual if they're about a
+year, otherwise irregular. Its confidence is the fraction of intervals that fit, scaled down
+by how much the amounts vary.
+
+Nothing here touches the db.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+
+from typing import Tuple
+
+from fintrackr.categorize import FREQUENCIES
+
+logger = logging.getLogger(__name__)
+
+# Days between charges that count as a month or a year apart (allowing for month lengths,
+# and for charges moved to the next business day)
+MONTHLY_DAYS = (26, 35)
+ANNUAL_DAYS = (350, 380)
+# Fewest charges (on different days) for each frequency
+MIN_MONTHLY = 3
+MIN_ANNUAL = 2
+MIN_CONFIDENCE = 0.5
+
+# Words containing a digit (store numbers, "#1234", "REF0001", "T-1832"), then anything that
+# isn't a letter or space
+_NUMBERED_WORD = r"\S*\d\S*"
+_NON_LETTERS = r"[^a-z ]+"
+
+
+def merchant_keys(descriptions: np.ndarray) -> np.ndarray:
+    """
+    Normalized merchant of each description: lowercase, with words containing digits and
+    punctuation removed (None counts as ""). e.g. "SAFEWAY #1234" and "Safeway" are both
+    "safeway".
+    """
+    # Descriptions repeat a lot, so only the distinct ones are normalized
+    codes, distinct = pd.factorize(pd.Series(descriptions, dtype=object).fillna(""))
+    keys = pd.Series(distinct, dtype=object).astype(str).str.lower()
+    keys = keys.str.replace(_NUMBERED_WORD, " ", regex=True).str.replace(_NON_LETTERS, " ", regex=True)
+    return keys.str.split().str.join(" ").to_numpy(dtype=object)[codes]
+
+def _in_window(intervals: np.ndarray, window: Tuple[int, int]) -> np.ndarray:
+    return (intervals >= window[0]) & (intervals <= window[1])
+
+def detect_recurring(keys: np.ndarray, days: np.ndarray, cents: np.ndarray, accounts: np.ndarray | None = None,
+                     min_confidence: float = MIN_CONFIDENCE) -> Tuple[pd.DataFrame, np.ndarray]:
+    """
+    Group transactions by (account, merchant key, whether they're income) and tag each group
+    monthly, annual or irregular.
+
+    Charges on the same day count once. Confidence of monthly (annual) is the fraction of
+    intervals between consecutive charges within MONTHLY_DAYS (ANNUAL_DAYS), times
+    1 / (1 + coefficient of variation of the amounts), and 0 for groups with fewer than
+    MIN_MONTHLY (MIN_ANNUAL) charges; a group gets the more confident of the two if that's at
+    least min_confidence, and is irregular (with confidence 1 minus the better of the two)
+    otherwise.
+
+    Parameters
+    ----------
+    keys : np.ndarray
+        Merchant key of each transaction (see merchant_keys)
+    days : np.ndarray
+        Dates (datetime64[D]), or days since any fixed day (int)
+    cents : np.ndarray
+        int64 amounts
+    accounts : np.ndarray or None
+        Account (e.g. data_source_id) of each transaction; all the same account if None
+    min_confidence : float
+        Least confidence (0 to 1) for monthly or annual
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, np.ndarray]
+        One row per group (by account, then merchant in order of first appearance, expenses
+        before income), with columns account, merchant, income (bool), num_charges (distinct
+        days), median_interval (days; NaN if only one charge), amount_cv, frequency and
+        confidence; and the group (row) of each transaction
+    """
+    n = len(keys)
+    days = np.asarray(days)
+    if np.issubdtype(days.dtype, np.datetime64):
+        days = days.astype("datetime64[D]").astype(np.int64)
+    days = days.astype(np.int64)
+    cents = np.asarray(cents, dtype=np.int64)
+    accounts = np.zeros(n, dtype=np.int64) if accounts is None else np.asarray(accounts)
+
+    key_codes, key_names = pd.factorize(pd.Series(keys, dtype=object))
+    income = cents > 0
+    # One sort by group, then day
+    order = np.lexsort((days, income, key_codes, accounts))
+    s_accounts, s_keys, s_income, s_days = accounts[order], key_codes[order], income[order], days[order]
+    new_group = np.ones(n, dtype=bool)
+    new_group[1:] = (s_accounts[1:] != s_accounts[:-1]) | (s_keys[1:] != s_keys[:-1]) | (s_income[1:] != s_income[:-1])
+    sorted_group = np.cumsum(new_group) - 1
+    n_groups = int(sorted_group[-1]) + 1 if n else 0
+    group = np.empty(n, dtype=np.int64)
+    group[order] = sorted_group
+    starts = np.flatnonzero(new_group)
+
+    # Amount stability, from sums of the amounts and their squares
+    amounts = np.abs(cents[order]).astype(np.float64)
+    num = np.bincount(sorted_group, minlength=n_groups)
+    mean = np.bincount(sorted_group, weights=amounts, minlength=n_groups) / np.maximum(num, 1)
+    variance = np.bincount(sorted_group, weights=amounts ** 2, minlength=n_groups) / np.maximum(num, 1) - mean ** 2
+    amount_cv = np.sqrt(np.maximum(variance, 0)) / np.maximum(mean, 1)
+
+    # Intervals between a group's distinct days
+    first_of_day = new_group.copy()
+    first_of_day[1:] |= s_days[1:] != s_days[:-1]
+    charge_group, charge_days = sorted_group[first_of_day], s_days[first_of_day]
+    num_charges = np.bincount(charge_group, minlength=n_groups)
+    same = charge_group[1:] == charge_group[:-1]
+    interval_group, intervals = charge_group[1:][same], np.diff(charge_days)[same]
+    num_intervals = np.maximum(num_charges - 1, 1)
+
+    # Median interval: sort intervals within groups and take the middle one
+    by_value = np.lexsort((intervals, interval_group))
+    interval_starts = np.concatenate([[0], np.cumsum(num_charges - 1)[:-1]]).astype(np.int64)
+    median_interval = np.full(n_groups, np.nan)
+    has_interval = num_charges > 1
+    if len(intervals):
+        middle = interval_starts[has_interval] + (num_charges[has_interval] - 2) // 2
+        median_interval[has_interval] = intervals[by_value][middle]
+
+    stability = 1 / (1 + amount_cv)
+    scores = {}
+    for frequency, window, min_charges in (("monthly", MONTHLY_DAYS, MIN_MONTHLY), ("annual", ANNUAL_DAYS, MIN_ANNUAL)):
+        fits = np.bincount(interval_group, weights=_in_window(intervals, window), minlength=n_groups) / num_intervals
+        scores[frequency] = np.where(num_charges >= min_charges, fits * stability, 0.0)
+
+    best = np.maximum(scores["monthly"], scores["annual"])
+    frequency = np.where(best < min_confidence, "irregular", np.where(scores["monthly"] >= scores["annual"], "monthly", "annual"))
+    confidence = np.where(best < min_confidence, 1 - best, best)
+
+    groups = pd.DataFrame({
+        "account": s_accounts[starts],
+        "merchant": key_names.to_numpy(dtype=object)[s_keys[starts]] if n else np.zeros(0, dtype=object),
+        "income": s_income[starts],
+        "num_charges": num_charges,
+        "median_interval": median_interval,
+        "amount_cv": amount_cv,
+        "frequency": pd.Categorical(frequency, categories=FREQUENCIES),
+        "confidence": confidence,
+    })
+    return groups, group
+
+def category_frequencies(groups: pd.DataFrame, group: np.ndarray, category_ids: np.ndarray,
+                         min_confidence: float = MIN_CONFIDENCE) -> pd.DataFrame:
+    """
+    Frequency of each category, from the groups of its transactions (see detect_recurring):
+    monthly (annual) with confidence the total confidence of its transactions in monthly
+    (annual) groups over its number of transactions, if that's at least min_confidence;
+    otherwise irregular, with confidence 1 minus the better of the two.
+
+    Parameters
+    ----------
+    category_ids : np.ndarray
+        Category of each transaction (int), negative for none
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns category_id, frequency and confidence, one row per category, by category_id
+    """
+    categorized = category_ids >= 0
+    codes, ids = pd.factorize(category_ids[categorized], sort=True)
+    transaction_group = group[categorized]
+    num = np.bincount(codes, minlength=len(ids))
+
+    scores = {}
+    for frequency in ("monthly", "annual"):
+        weights = np.where(groups["frequency"].to_numpy() == frequency, groups["confidence"].to_numpy(), 0.0)[transaction_group]
+        scores[frequency] = np.bincount(codes, weights=weights, minlength=len(ids)) / np.maximum(num, 1)
+
+    best = np.maximum(scores["monthly"], scores["annual"])
+    return pd.DataFrame({
+        "category_id": np.asarray(ids, dtype=np.int64),
+        "frequency": np.where(best < min_confidence, "irregular", np.where(scores["monthly"] >= scores["annual"], "monthly", "annual")),
+        "confidence": np.where(best < min_confidence, 1 - best, best),
+    })
@@ -0,0 +1,218 @@
+"""
+Render account balance charts to image files without a display (e.g. for a nightly
+report of every account), using matplotlib's Agg backend. Calculated balances are
+downsampled to what the image can actually show before drawing, and accounts are
+rendered in parallel worker processes.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import multiprocessing
+import re
+import yaml
+import os, sys
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import List, Tuple
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import fintrackr.fin_db
+from fintrackr.plot_accnt_balances import _to_arrays
+from fintrackr.utils import TransactionBatch
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+FORMATS = ("png", "svg")
+
+
+def downsample_min_max(x: np.ndarray, y: np.ndarray, n_buckets: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Reduce a series to at most 2*n_buckets + 2 points that draw the same as the whole series at
+    a width of n_buckets pixels: x is split into n_buckets equal-width buckets (one per pixel
+    column), and the lowest and highest point in each are kept, in their original order, along
+    with the first and last points so the line spans the same range.
+
+    Parameters
+    ----------
+    x : np.ndarray
+        Sorted x values (numbers or datetime64)
+    y : np.ndarray
+        y values, same length as x
+    n_buckets : int
+        Usually the plot's width in pixels
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        x and y of the points kept (the input itself if it's already small enough)
+    """
+    if len(x) <= 2 * n_buckets:
+        return x, y
+
+    xi = np.asarray(x).astype(np.int64) if np.issubdtype(np.asarray(x).dtype, np.datetime64) else np.asarray(x, dtype=np.float64)
+    span = xi[-1] - xi[0]
+    if span == 0:
+        buckets = np.zeros(len(xi), dtype=np.int64)
+    else:
+        buckets = np.minimum(((xi - xi[0]) / span * n_buckets).astype(np.int64), n_buckets - 1)
+
+    # Sorted by bucket, then y: each bucket's min is its first element and its max its last
+    order = np.lexsort((y, buckets))
+    starts = np.flatnonzero(np.r_[True, buckets[order][1:] != buckets[order][:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    keep = np.unique(np.concatenate(([0, len(order) - 1], order[starts], order[ends])))
+
+    return x[keep], y[keep]
+
+def render_balances(all_balances: TransactionBatch, calculated_balances: TransactionBatch, path: str,
+                    title: str = "", width_px: int = 1200, height_px: int = 600, dpi: int = 100) -> str:
+    """
+    Headless version of plot_accnt_balances.plot_balances: draw the same chart on an Agg
+    canvas and save it to path, instead of showing it. Calculated balances are downsampled
+    with downsample_min_max to the plot's width first.
+
+    Parameters
+    ----------
+    all_balances : TransactionBatch
+        Balances stored in the db, drawn as red o's
+    calculated_balances : TransactionBatch
+        Balances calculated from transactions, drawn as a blue line
+    path : str
+        File to write; the format (png or svg) is taken from its extension
+    title : str
+        Chart title
+    width_px, height_px, dpi : int
+        Image size
+
+    Returns
+    -------
+    str
+        path
+    """
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Can only render to {FORMATS}; got {path}")
+
+    # A Figure made directly (not through pyplot) never touches a GUI backend
+    fig = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+
+    calculated = downsample_min_max(*_to_arrays(calculated_balances), n_buckets=width_px)
+    inputted = _to_arrays(all_balances)
+
+    ax.plot(calculated[0], calculated[1], "-b", linewidth=0.8)
+    ax.plot(inputted[0], inputted[1], "or", markerfacecolor='none')
+
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Amount ($)")
+    ax.set_title(title)
+    ax.legend(["Balances calculated from transactions","Balances in db"])
+    fig.autofmt_xdate()
+
+    fig.savefig(path, format=fmt)
+    return path
+
+def _render_accnt(accnt_name: str, date_range: List[date], username: str, pw: str, db_name: str, path: str) -> str:
+    """
+    Fetch and render one account. Runs in a worker process, so it opens its own connection.
+    """
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+    try:
+        balances = FinDB.balances_in_date_range(data_source = accnt_name, date_range = list(date_range))
+        daily_balances = FinDB.daily_balances_in_date_range(data_source = accnt_name, date_range = list(date_range))
+    finally:
+        FinDB.close()
+
+    return render_balances(all_balances=balances, calculated_balances=daily_balances, path=path,
+                           title=f"{accnt_name}: {date_range[0]} to {date_range[1]}")
+
+def render_accnt_balances(date_range: List[date], username: str, pw: str, out_dir: str, accnt_names: List[str] | None = None,
+                          fmt: str = "png", max_workers: int = 4, path_to_config: str = CONFIG_PATH) -> dict[str, str]:
+    """
+    Render balance charts (as in plot_accnt_balances) for many accounts to files in out_dir,
+    one worker process per account at a time.
+
+    Parameters
+    ----------
+    date_range : List[datetime.date]
+        Date range to plot
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    out_dir : str
+        Directory to write to (created if it doesn't exist); files are named <account>.<fmt>,
+        with anything but letters, digits, _, - and . in the account name replaced by _
+    accnt_names : List[str] or None
+        Accounts to render; None (default) for every account in the db
+    fmt : str
+        png or svg
+    max_workers : int
+        Number of processes (and db connections) to render with
+    path_to_config : str
+        Config file to get db_name from
+
+    Returns
+    -------
+    dict[str, str]
+        Path of the chart for each account rendered. Accounts that failed are logged and left out.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {FORMATS}; got {fmt}")
+
+    with open(path_to_config, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+
+    if accnt_names is None:
+        FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+        try:
+            accnt_names = FinDB.data_source_names()
+        finally:
+            FinDB.close()
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    rendered = {}
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("forkserver")) as pool:
+        futures = {
+            pool.submit(_render_accnt, accnt, date_range, username, pw, db_name,
+                        os.path.join(out_dir, re.sub(r"[^\w.-]", "_", accnt) + f".{fmt}")): accnt
+            for accnt in accnt_names
+        }
+        for future, accnt in futures.items():
+            try:
+                rendered[accnt] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to render balances for {accnt}: {e}")
+
+    logger.info(f"Rendered {len(rendered)} of {len(accnt_names)} accounts to {out_dir}")
+    return rendered
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) < 6:
+        raise TypeError("render_balances.py takes at least 5 input args: (1) earliest date; (2) latest date; (3) output directory; (4) db username; (5) db pw; (6...) account names (default: all accounts)")
+
+    rendered = render_accnt_balances(
+        date_range = [date.fromisoformat(sys.argv[1]), date.fromisoformat(sys.argv[2])],
+        out_dir = sys.argv[3],
+        username = sys.argv[4],
+        pw = sys.argv[5],
+        accnt_names = sys.argv[6:] or None
+    )
+
+    for accnt, path in rendered.items():
+        print(f"{accnt}: {path}")
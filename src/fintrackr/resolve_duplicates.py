@@ -0,0 +1,68 @@
+"""
+Merge or dismiss reviewed pairs in the possible_duplicates queue (see find_duplicates.py and
+FinDB.resolve_duplicates) from the command line. Merging deletes the duplicate transaction.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+
+import fintrackr.fin_db
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+ACTIONS = ("merge", "dismiss")
+
+
+def resolve_duplicates(username: str, pw: str, action: str, queue_ids: list[int]) -> int:
+    """
+    Uses the db name in config.yml.
+
+    Parameters
+    ----------
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    action : str
+        "merge" or "dismiss"
+    queue_ids : list[int]
+        ids of the pairs in possible_duplicates (as printed by find_duplicates.py)
+
+    Returns
+    -------
+    int
+        Number of duplicates merged, or of pairs dismissed
+    """
+    if action not in ACTIONS:
+        raise ValueError(f"action must be one of {ACTIONS}, not {action}")
+
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+
+    try:
+        return FinDB.resolve_duplicates(queue_ids, merge=action == "merge")
+    finally:
+        FinDB.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) < 5:
+        raise TypeError("resolve_duplicates.py takes at least 4 input args: (1) db username; (2) db pw; "
+                        "(3) merge or dismiss; (4...) ids of the pairs in possible_duplicates")
+
+    num = resolve_duplicates(username = sys.argv[1], pw = sys.argv[2], action = sys.argv[3],
+                             queue_ids = [int(i) for i in sys.argv[4:]])
+
+    print(f"{'Merged' if sys.argv[3] == 'merge' else 'Dismissed'} {num} possible duplicates")
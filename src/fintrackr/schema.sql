@@ -30,18 +30,252 @@ CREATE TABLE data_load_metadata(
     date_added date NOT NULL,
     username text NOT NULL,
     source text UNIQUE NOT NULL, /* filename */
-    data_source_id integer REFERENCES data_sources(id)
+    data_source_id integer REFERENCES data_sources(id),
+    content_hash bytea UNIQUE, /* sha256 of the file, so a copy under another name is recognized; NULL for files loaded before this was added */
+    transfers_matched boolean NOT NULL DEFAULT false /* whether FinDB.match_transfers has looked at this file's transactions */
 );
 
-/* this table preserves the original data */
+/* this table preserves the original data. It's partitioned by posted_date (see
+ensure_transaction_partitions), so unique keys include posted_date */
 CREATE TABLE transactions(
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     posted_date date NOT NULL,
     amount money NOT NULL,
     description text, /* e.g merchant name on cc transaction */
-    metadatum_id integer NOT NULL REFERENCES data_load_metadata(id)
+    metadatum_id integer NOT NULL REFERENCES data_load_metadata(id),
+    data_source_id integer NOT NULL REFERENCES data_sources(id), /* copy of the metadatum's, so account queries don't need the join */
+    fingerprint uuid NOT NULL, /* see transaction_fingerprint; duplicates are rejected by the unique index below */
+    PRIMARY KEY (id, posted_date),
+    UNIQUE (fingerprint, posted_date) /* the fingerprint already depends on posted_date, so this is unique on fingerprint alone */
+) PARTITION BY RANGE (posted_date);
+
+/* Length of the periods transactions are partitioned into: 'year' (default), 'quarter' or 'month'.
+Only affects partitions created after it's changed, so set it before loading any data. */
+CREATE FUNCTION transaction_partition_unit()
+RETURNS text AS $$
+    SELECT 'year'::text
+$$ LANGUAGE sql IMMUTABLE;
+
+/* Create any missing partitions of transactions for the periods from from_day to to_day, e.g.
+transactions_2025 (year), transactions_2025q1 (quarter) or transactions_2025_01 (month).
+Called before every insert into transactions. Runs as the db owner (who owns transactions) so
+that users can call it. Returns the number of partitions created. */
+CREATE FUNCTION ensure_transaction_partitions(from_day date, to_day date)
+RETURNS integer AS $$
+DECLARE
+    unit text := transaction_partition_unit();
+    step interval := ('1 ' || transaction_partition_unit())::interval;
+    period_start date;
+    partition_name text;
+    num_created integer := 0;
+BEGIN
+    IF from_day IS NULL OR to_day IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    /* Concurrent loads would otherwise race to create the same partition */
+    PERFORM pg_advisory_xact_lock('transactions'::regclass::oid::bigint);
+
+    period_start := date_trunc(unit, from_day)::date;
+    WHILE period_start <= to_day LOOP
+        partition_name := 'transactions_' || to_char(period_start,
+            CASE unit WHEN 'year' THEN 'YYYY' WHEN 'quarter' THEN 'YYYY"q"Q' ELSE 'YYYY_MM' END);
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF transactions FOR VALUES FROM (%L) TO (%L)',
+                partition_name, period_start, (period_start + step)::date);
+            num_created := num_created + 1;
+        END IF;
+        period_start := (period_start + step)::date;
+    END LOOP;
+
+    RETURN num_created;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public;
+
+/* Date-range queries filter by account and posted_date; balances are already covered by
+the UNIQUE (accnt_id, date, amount) index, and daily_balances by UNIQUE (accnt_id, day) */
+CREATE INDEX transactions_data_source_id_posted_date_idx ON transactions (data_source_id, posted_date);
+CREATE INDEX transactions_metadatum_id_idx ON transactions (metadatum_id);
+CREATE INDEX data_load_metadata_data_source_id_idx ON data_load_metadata (data_source_id);
+
+/* Identity of a transaction for dedup: date, amount and description, plus which occurrence
+of that triple it is within its source file (so two identical charges on the same day are
+both kept). Text forms are pinned so the hash doesn't depend on DateStyle. */
+CREATE FUNCTION transaction_fingerprint(posted_date date, amount money, description text, occurrence bigint)
+RETURNS uuid AS $$
+    SELECT md5(to_char(posted_date, 'YYYY-MM-DD') || '|' || amount::numeric::text || '|' ||
+        coalesce(description, '') || '|' || occurrence::text)::uuid
+$$ LANGUAGE sql STABLE;
+
+/* End-of-day balance of each account on each day it has transactions (or a stored balance),
+relative to the account's most recent row in balances; with no balances, relative to zero
+before its first transaction. Maintained by the triggers below; see refresh_daily_balances. */
+CREATE TABLE daily_balances(
+    id SERIAL PRIMARY KEY,
+    accnt_id integer NOT NULL REFERENCES data_sources(id),
+    day date NOT NULL,
+    amount money NOT NULL,
+    UNIQUE (accnt_id, day)
 );
 
+/* Recompute daily_balances for one account, for days on or after from_day (all days if NULL).
+Starts from the stored balance of the last day before from_day when that's still valid (the
+reference balance is before from_day), so only the affected days are read. Otherwise the
+whole account is recomputed. Returns the number of days written. */
+CREATE FUNCTION refresh_daily_balances(p_accnt_id integer, from_day date)
+RETURNS integer AS $$
+DECLARE
+    ref_date date;
+    ref_amount money;
+    opening money; /* balance at the end of the day before the first day recomputed */
+    num_days integer;
+BEGIN
+    /* Refreshes of the same account are serialized: otherwise two loads into it at once would
+    both delete its days and re-insert them, and the second insert would fail on UNIQUE (accnt_id, day) */
+    PERFORM pg_advisory_xact_lock('daily_balances'::regclass::oid::integer, p_accnt_id);
+
+    SELECT b.date, b.amount INTO ref_date, ref_amount
+    FROM balances b
+    WHERE b.accnt_id = p_accnt_id
+    ORDER BY b.date DESC, b.id DESC
+    LIMIT 1;
+
+    IF from_day IS NOT NULL AND (ref_date IS NULL OR ref_date < from_day) THEN
+        SELECT d.amount INTO opening
+        FROM daily_balances d
+        WHERE d.accnt_id = p_accnt_id AND d.day < from_day
+        ORDER BY d.day DESC
+        LIMIT 1;
+    END IF;
+
+    IF opening IS NULL THEN
+        from_day := NULL;
+        SELECT coalesce(ref_amount, 0::money) - coalesce(sum(t.amount), 0::money) INTO opening
+        FROM transactions t
+        WHERE t.data_source_id = p_accnt_id AND t.posted_date <= ref_date;
+    END IF;
+
+    DELETE FROM daily_balances d
+    WHERE d.accnt_id = p_accnt_id AND (from_day IS NULL OR d.day >= from_day);
+
+    INSERT INTO daily_balances (accnt_id, day, amount)
+    SELECT p_accnt_id, n.day, opening + sum(n.net) OVER (ORDER BY n.day)
+    FROM (
+        SELECT u.day, sum(u.net) AS net
+        FROM (
+            SELECT t.posted_date AS day, t.amount AS net
+            FROM transactions t
+            WHERE t.data_source_id = p_accnt_id AND (from_day IS NULL OR t.posted_date >= from_day)
+            UNION ALL /* the reference day always gets a row */
+            SELECT ref_date, 0::money
+            WHERE ref_date IS NOT NULL AND (from_day IS NULL OR ref_date >= from_day)
+        ) AS u
+        GROUP BY u.day
+    ) AS n;
+
+    GET DIAGNOSTICS num_days = ROW_COUNT;
+    RETURN num_days;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION refresh_daily_balances_after_transactions()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_daily_balances(i.data_source_id, min(i.posted_date))
+    FROM inserted i
+    GROUP BY i.data_source_id
+    ORDER BY i.data_source_id; /* locks taken in a fixed order, so concurrent loads can't deadlock */
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION refresh_daily_balances_after_balances()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM refresh_daily_balances(i.accnt_id, min(i.date))
+    FROM inserted i
+    GROUP BY i.accnt_id
+    ORDER BY i.accnt_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+/* Deletes and updates refresh each account from the earliest day a changed row was on, before
+or after the change (an update that leaves the account, day and amount alone changes nothing).
+The transition table is called changed (and changed_new for the new rows of an UPDATE). */
+CREATE FUNCTION refresh_daily_balances_after_transactions_change()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_daily_balances(u.data_source_id, min(u.posted_date))
+        FROM (
+            SELECT o.data_source_id, o.posted_date FROM changed o JOIN changed_new n ON n.id = o.id
+            WHERE (o.data_source_id, o.posted_date, o.amount) IS DISTINCT FROM (n.data_source_id, n.posted_date, n.amount)
+            UNION ALL
+            SELECT n.data_source_id, n.posted_date FROM changed o JOIN changed_new n ON n.id = o.id
+            WHERE (o.data_source_id, o.posted_date, o.amount) IS DISTINCT FROM (n.data_source_id, n.posted_date, n.amount)
+        ) AS u
+        GROUP BY u.data_source_id
+        ORDER BY u.data_source_id;
+    ELSE
+        PERFORM refresh_daily_balances(c.data_source_id, min(c.posted_date))
+        FROM changed c
+        GROUP BY c.data_source_id
+        ORDER BY c.data_source_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+/* A deleted or changed balance may have been its account's reference, which every day of the
+account is relative to, so its accounts are recomputed in full */
+CREATE FUNCTION refresh_daily_balances_after_balances_change()
+RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM refresh_daily_balances(u.accnt_id, NULL)
+        FROM (SELECT c.accnt_id FROM changed c UNION SELECT n.accnt_id FROM changed_new n) AS u
+        ORDER BY u.accnt_id;
+    ELSE
+        PERFORM refresh_daily_balances(c.accnt_id, NULL)
+        FROM (SELECT DISTINCT accnt_id FROM changed) AS c
+        ORDER BY c.accnt_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+/* Once per INSERT statement (not per row), so a bulk load refreshes each account once */
+CREATE TRIGGER transactions_refresh_daily_balances
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS inserted
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_transactions();
+
+CREATE TRIGGER balances_refresh_daily_balances
+AFTER INSERT ON balances
+REFERENCING NEW TABLE AS inserted
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_balances();
+
+CREATE TRIGGER transactions_delete_refresh_daily_balances
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_transactions_change();
+
+CREATE TRIGGER transactions_update_refresh_daily_balances
+AFTER UPDATE ON transactions
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_transactions_change();
+
+CREATE TRIGGER balances_delete_refresh_daily_balances
+AFTER DELETE ON balances
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_balances_change();
+
+CREATE TRIGGER balances_update_refresh_daily_balances
+AFTER UPDATE ON balances
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_daily_balances_after_balances_change();
+
 CREATE TABLE categorizations(
     id SERIAL PRIMARY KEY,
     username text NOT NULL,
@@ -52,12 +286,203 @@ CREATE TABLE categories(
     id SERIAL PRIMARY KEY,
     label text NOT NULL, /* e.g. "groceries" */
     frequency recurrance DEFAULT 'irregular',
+    frequency_confidence real, /* 0 to 1, if frequency was inferred from the transactions (see FinDB.detect_recurring_charges) */
     categorization_id integer NOT NULL REFERENCES categorizations(id),
     other text /* optional additional super-category (e.g. "discretionary") */
 );
 
 CREATE TABLE transactions_categories_xref(
     id SERIAL PRIMARY KEY,
-    transaction_id integer NOT NULL REFERENCES transactions(id),
-    category_id integer NOT NULL REFERENCES categories(id)
-);
\ No newline at end of file
+    transaction_id integer NOT NULL,
+    transaction_posted_date date NOT NULL, /* part of transactions' key, since it's partitioned */
+    category_id integer NOT NULL REFERENCES categories(id),
+    FOREIGN KEY (transaction_id, transaction_posted_date) REFERENCES transactions(id, posted_date)
+);
+CREATE INDEX transactions_categories_xref_transaction_idx ON transactions_categories_xref (transaction_id, transaction_posted_date);
+CREATE INDEX transactions_categories_xref_category_id_idx ON transactions_categories_xref (category_id);
+CREATE INDEX categories_categorization_id_idx ON categories (categorization_id);
+
+/* Pairs of transactions that are one transfer between two accounts (e.g. a credit card payment
+from checking, seen in both), found by FinDB.match_transfers. A transaction is in at most one. */
+CREATE TABLE transfers(
+    id SERIAL PRIMARY KEY,
+    out_transaction_id integer NOT NULL, /* the expense, in the account the money left */
+    out_posted_date date NOT NULL,
+    in_transaction_id integer NOT NULL, /* the income, in the account it went to */
+    in_posted_date date NOT NULL,
+    FOREIGN KEY (out_transaction_id, out_posted_date) REFERENCES transactions(id, posted_date),
+    FOREIGN KEY (in_transaction_id, in_posted_date) REFERENCES transactions(id, posted_date),
+    UNIQUE (out_transaction_id, out_posted_date),
+    UNIQUE (in_transaction_id, in_posted_date)
+);
+
+CREATE INDEX data_load_metadata_transfers_unmatched_idx ON data_load_metadata (id) WHERE NOT transfers_matched;
+
+/* Transactions that are spending or income, i.e. not one side of a transfer; what spending by
+category should be summed over (balances include transfers) */
+CREATE VIEW spending_transactions AS
+SELECT t.*
+FROM transactions AS t
+WHERE NOT EXISTS (SELECT 1 FROM transfers AS f WHERE f.out_transaction_id = t.id AND f.out_posted_date = t.posted_date)
+AND NOT EXISTS (SELECT 1 FROM transfers AS f WHERE f.in_transaction_id = t.id AND f.in_posted_date = t.posted_date);
+
+/* Review queue of likely duplicates that exact dedup missed (a bank's re-export of a transaction
+with a shifted posted_date or a different description), found by FinDB.find_duplicates: the
+transaction from the later load, and the original it seems to repeat. Merging one (see
+FinDB.resolve_duplicates) deletes the duplicate, and with it its rows here; dismissed pairs are
+kept so they aren't queued again. */
+CREATE TABLE possible_duplicates(
+    id SERIAL PRIMARY KEY,
+    transaction_id integer NOT NULL, /* the duplicate */
+    transaction_posted_date date NOT NULL,
+    original_id integer NOT NULL,
+    original_posted_date date NOT NULL,
+    similarity real NOT NULL, /* of the descriptions, 0 to 1 (see fintrackr.duplicates) */
+    dismissed boolean NOT NULL DEFAULT false, /* reviewed, and not a duplicate */
+    FOREIGN KEY (transaction_id, transaction_posted_date) REFERENCES transactions(id, posted_date) ON DELETE CASCADE,
+    FOREIGN KEY (original_id, original_posted_date) REFERENCES transactions(id, posted_date) ON DELETE CASCADE,
+    UNIQUE (transaction_id, transaction_posted_date, original_id, original_posted_date)
+);
+
+/* Net amount and number of spending transactions (see spending_transactions) of each account in
+each month, per category, and in total (category_id NULL, so uncategorized spending is the total
+less the categories of a categorization); what budgeting reports read instead of the ledger (see
+FinDB.monthly_category_totals). Kept up to date by refresh_monthly_category_totals, which only
+recomputes the months in monthly_totals_stale. */
+CREATE TABLE monthly_category_totals(
+    id SERIAL PRIMARY KEY,
+    accnt_id integer NOT NULL REFERENCES data_sources(id),
+    month date NOT NULL, /* first day of the month */
+    category_id integer REFERENCES categories(id), /* NULL: all of the account's spending transactions that month */
+    amount money NOT NULL,
+    num_transactions integer NOT NULL
+);
+CREATE UNIQUE INDEX monthly_category_totals_key_idx ON monthly_category_totals (month, accnt_id, coalesce(category_id, 0));
+
+/* Months whose rows in monthly_category_totals are out of date, because transactions, their
+categories or transfers in them changed since the last refresh. Filled by the triggers below.
+Not unique, so that loads at the same time don't wait on each other's uncommitted rows; a month
+already marked isn't added again. */
+CREATE TABLE monthly_totals_stale(
+    month date NOT NULL
+);
+CREATE INDEX monthly_totals_stale_month_idx ON monthly_totals_stale (month);
+
+/* Recompute monthly_category_totals for the stale months, and mark them up to date. Refreshes
+run one at a time (others wait). Returns the number of months recomputed. */
+CREATE FUNCTION refresh_monthly_category_totals()
+RETURNS integer AS $$
+DECLARE
+    months date[];
+    first_day date;
+    end_day date;
+BEGIN
+    PERFORM pg_advisory_xact_lock('monthly_category_totals'::regclass::oid::integer, 0);
+
+    WITH refreshed AS (DELETE FROM monthly_totals_stale RETURNING month)
+    SELECT coalesce(array_agg(DISTINCT month), '{}') INTO months FROM refreshed;
+    IF cardinality(months) = 0 THEN
+        RETURN 0;
+    END IF;
+
+    DELETE FROM monthly_category_totals r WHERE r.month = ANY(months);
+
+    /* One scan of the range the months span (pruned to its partitions), keeping the stale months */
+    SELECT min(m), (max(m) + interval '1 month')::date INTO first_day, end_day FROM unnest(months) AS m;
+
+    INSERT INTO monthly_category_totals (accnt_id, month, category_id, amount, num_transactions)
+    SELECT t.data_source_id, date_trunc('month', t.posted_date)::date, NULL, sum(t.amount), count(*)
+    FROM spending_transactions t
+    WHERE t.posted_date >= first_day AND t.posted_date < end_day AND date_trunc('month', t.posted_date)::date = ANY(months)
+    GROUP BY 1, 2;
+
+    INSERT INTO monthly_category_totals (accnt_id, month, category_id, amount, num_transactions)
+    SELECT t.data_source_id, date_trunc('month', t.posted_date)::date, x.category_id, sum(t.amount), count(*)
+    FROM spending_transactions t
+    JOIN transactions_categories_xref x ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date
+    WHERE t.posted_date >= first_day AND t.posted_date < end_day AND date_trunc('month', t.posted_date)::date = ANY(months)
+    GROUP BY 1, 2, 3;
+
+    RETURN cardinality(months);
+END;
+$$ LANGUAGE plpgsql;
+
+/* Mark months stale, unless they already are */
+CREATE FUNCTION mark_months_stale(days date[])
+RETURNS void AS $$
+    INSERT INTO monthly_totals_stale (month)
+    SELECT DISTINCT date_trunc('month', d.day)::date FROM unnest(days) AS d(day)
+    WHERE NOT EXISTS (SELECT 1 FROM monthly_totals_stale s WHERE s.month = date_trunc('month', d.day)::date);
+$$ LANGUAGE sql;
+
+/* Once per statement, like the daily_balances triggers: each changed row's month is stale. The
+transition table is called changed in every trigger (and changed_new for the new rows of an UPDATE). */
+CREATE FUNCTION mark_months_stale_after_transactions()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM mark_months_stale(array_agg(DISTINCT c.posted_date)) FROM changed c;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION mark_months_stale_after_xref()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM mark_months_stale(array_agg(DISTINCT c.transaction_posted_date)) FROM changed c;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM mark_months_stale(array_agg(DISTINCT c.transaction_posted_date)) FROM changed_new c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION mark_months_stale_after_transfers()
+RETURNS trigger AS $$
+BEGIN
+    PERFORM mark_months_stale(array_agg(DISTINCT c.out_posted_date) || array_agg(DISTINCT c.in_posted_date)) FROM changed c;
+    IF TG_OP = 'UPDATE' THEN
+        PERFORM mark_months_stale(array_agg(DISTINCT c.out_posted_date) || array_agg(DISTINCT c.in_posted_date)) FROM changed_new c;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER transactions_insert_mark_months_stale
+AFTER INSERT ON transactions
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transactions();
+
+CREATE TRIGGER transactions_delete_mark_months_stale
+AFTER DELETE ON transactions
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transactions();
+
+CREATE TRIGGER xref_insert_mark_months_stale
+AFTER INSERT ON transactions_categories_xref
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_xref();
+
+CREATE TRIGGER xref_update_mark_months_stale
+AFTER UPDATE ON transactions_categories_xref
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_xref();
+
+CREATE TRIGGER xref_delete_mark_months_stale
+AFTER DELETE ON transactions_categories_xref
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_xref();
+
+CREATE TRIGGER transfers_insert_mark_months_stale
+AFTER INSERT ON transfers
+REFERENCING NEW TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transfers();
+
+CREATE TRIGGER transfers_update_mark_months_stale
+AFTER UPDATE ON transfers
+REFERENCING OLD TABLE AS changed NEW TABLE AS changed_new
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transfers();
+
+CREATE TRIGGER transfers_delete_mark_months_stale
+AFTER DELETE ON transfers
+REFERENCING OLD TABLE AS changed
+FOR EACH STATEMENT EXECUTE FUNCTION mark_months_stale_after_transfers();
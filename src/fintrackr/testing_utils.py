@@ -17,13 +17,15 @@ def config_params() -> dict:
         config = yaml.safe_load(config_file)
         test_db_name = config["db"]["db_name"]
         test_owner = config["db"]["admin_name"]
+        pool_config = config.get("pool")
 
     return {
         "test_db_name" : test_db_name,
         "test_owner": test_owner,
         "owner_pw": "test_pw",
         "user": "test_user",
-        "user_pw" :"pw"
+        "user_pw" :"pw",
+        "pool": pool_config
     }
 
 def set_up_test_DB(params: dict) -> None:
@@ -47,6 +49,6 @@ def set_up_test_DB(params: dict) -> None:
                 path_to_config=CONFIG_PATH
     )
 
-    FinDB = fintrackr.fin_db.FinDB(user=params["user"], pw=params["user_pw"], db_name=params["test_db_name"])
+    FinDB = fintrackr.fin_db.FinDB(user=params["user"], pw=params["user_pw"], db_name=params["test_db_name"], pool_config=params.get("pool"))
 
     return FinDB
\ No newline at end of file
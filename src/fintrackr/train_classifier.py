@@ -0,0 +1,85 @@
+"""
+Train a naive Bayes classifier of transactions from the command line (see fintrackr.classify),
+on transactions already categorized in the db and any labeled csvs, and save it for
+classify_transactions.py. Prints training time, and accuracy and speed on held-out transactions.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import yaml
+import os, sys
+import numpy as np
+
+from typing import List
+
+import fintrackr.fin_db
+from fintrackr.classify import TrainingReport, fit_and_evaluate, read_labeled_csv
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+
+def train_classifier(path_to_model: str, username: str, pw: str, categorization: str = "default",
+                     labeled_csvs: List[str] = ()) -> TrainingReport:
+    """
+    Uses the db name and classifier settings in config.yml.
+
+    Parameters
+    ----------
+    path_to_model : str
+        .npz file to save the model to
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    categorization : str
+        Name of the categorization whose labels are learned
+    labeled_csvs : List[str]
+        More labeled transactions (see fintrackr.classify.read_labeled_csv)
+
+    Returns
+    -------
+    TrainingReport
+
+    Raises
+    ------
+    ValueError
+        If a csv can't be read, or there are no labeled transactions
+    """
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+        classifier_config = config.get("classifier") or {}
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name)
+    try:
+        labeled = [FinDB.labeled_transactions(categorization=categorization)]
+    finally:
+        FinDB.close()
+    labeled += [read_labeled_csv(path) for path in labeled_csvs]
+
+    descriptions, cents, labels = (np.concatenate(arrays) for arrays in zip(*labeled))
+    if len(labels) == 0:
+        raise ValueError(f"No transactions in categorization {categorization} or the csvs to learn from")
+
+    model, report = fit_and_evaluate(descriptions, cents, labels, test_fraction=classifier_config.get("test_fraction", 0.2),
+                                     alpha=classifier_config.get("alpha", 0.1))
+    model.save(path_to_model)
+    return report
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) < 5:
+        raise TypeError("train_classifier.py takes 4 or more input args: (1) model file to write (.npz); (2) db username; (3) db pw; "
+                        "(4) categorization name; (5, ...) labeled csvs")
+
+    report = train_classifier(path_to_model = sys.argv[1], username = sys.argv[2], pw = sys.argv[3],
+                              categorization = sys.argv[4], labeled_csvs = sys.argv[5:])
+
+    print(report)
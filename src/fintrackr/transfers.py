@@ -0,0 +1,125 @@
+"""
+Matching of transfers between accounts (see FinDB.match_transfers): a payment from one
+account to another (e.g. a credit card payment from checking) shows up in both, as an
+expense in one and the same amount as income in the other, on the same day or a few days
+apart.
+
+Candidate pairs are found with a sort-merge join: expenses and income are each sorted by
+(amount, day), and the income that could match each expense (same amount, another account,
+within window_days) is a contiguous range of the sorted income, found with two binary
+searches. Each transaction can be in at most one transfer, so pairs are then picked in
+rounds: an expense and an income are paired when each is the other's closest unpaired
+candidate (by days apart, then earliest), which always pairs at least the closest remaining
+candidates, so a few rounds pair nearly everything. Each step is a sort or array operation
+over all candidates at once, so the whole match is O(n log n) in the number of transactions.
+
+Nothing here touches the db.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import logging
+import numpy as np
+
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+WINDOW_DAYS = 3
+
+
+def candidate_pairs(days: np.ndarray, cents: np.ndarray, accounts: np.ndarray, new: np.ndarray | None = None,
+                    window_days: int = WINDOW_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Every (expense, income) pair of transactions with opposite amounts, in different accounts,
+    at most window_days apart, and with at least one of the two new.
+
+    Parameters
+    ----------
+    days : np.ndarray
+        Dates (datetime64[D]), or days since any fixed day (int)
+    cents : np.ndarray
+        int64 amounts
+    accounts : np.ndarray
+        Account (e.g. data_source_id) of each transaction
+    new : np.ndarray or None
+        bool, whether each transaction is new (e.g. from a load not matched yet); all new if None
+    window_days : int
+        Most days apart
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Indices of the expense and the income of each pair (int64)
+    """
+    days = np.asarray(days)
+    if np.issubdtype(days.dtype, np.datetime64):
+        days = days.astype("datetime64[D]").astype(np.int64)
+    days = days.astype(np.int64)
+    cents = np.asarray(cents, dtype=np.int64)
+    accounts = np.asarray(accounts)
+    new = np.ones(len(days), dtype=bool) if new is None else np.asarray(new, dtype=bool)
+
+    # (amount, day) as one sortable int64 key; days are offset so they're nonnegative
+    first_day = days.min() - window_days if len(days) else 0
+    span = int(days.max() - first_day) + window_days + 1 if len(days) else 1
+    expenses, income = np.flatnonzero(cents < 0), np.flatnonzero(cents > 0)
+    income = income[np.argsort(cents[income] * span + (days[income] - first_day), kind="stable")]
+    income_keys = cents[income] * span + (days[income] - first_day)
+
+    expense_keys = -cents[expenses] * span + (days[expenses] - first_day)
+    lo = np.searchsorted(income_keys, expense_keys - window_days, side="left")
+    hi = np.searchsorted(income_keys, expense_keys + window_days, side="right")
+
+    # Expand each expense's range of income into pairs
+    counts = hi - lo
+    out_idx = np.repeat(expenses, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    in_idx = income[np.repeat(lo, counts) + offsets]
+
+    keep = (accounts[out_idx] != accounts[in_idx]) & (new[out_idx] | new[in_idx])
+    return out_idx[keep], in_idx[keep]
+
+def match_transfers(days: np.ndarray, cents: np.ndarray, accounts: np.ndarray, new: np.ndarray | None = None,
+                    window_days: int = WINDOW_DAYS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pair transactions into transfers (see candidate_pairs for the arguments), each transaction
+    in at most one pair, preferring pairs fewer days apart.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Indices of the expense and the income of each transfer (int64), in order of expense
+    """
+    out_idx, in_idx = candidate_pairs(days, cents, accounts, new=new, window_days=window_days)
+    days = np.asarray(days)
+    if np.issubdtype(days.dtype, np.datetime64):
+        days = days.astype("datetime64[D]").astype(np.int64)
+
+    # Rank candidates once: fewest days apart, then earliest expense, then earliest income
+    order = np.lexsort((in_idx, out_idx, np.abs(days[out_idx] - days[in_idx])))
+    out_idx, in_idx = out_idx[order], in_idx[order]
+
+    matched = np.zeros(len(days), dtype=bool)
+    pairs_out, pairs_in = [], []
+    while len(out_idx):
+        # Each transaction's best candidate is its first in rank order
+        _, best_of_out = np.unique(out_idx, return_index=True)
+        _, best_of_in = np.unique(in_idx, return_index=True)
+        mutual = np.zeros(len(out_idx), dtype=bool)
+        mutual[best_of_out] = True
+        is_best_of_in = np.zeros(len(out_idx), dtype=bool)
+        is_best_of_in[best_of_in] = True
+        mutual &= is_best_of_in
+
+        pairs_out.append(out_idx[mutual])
+        pairs_in.append(in_idx[mutual])
+        matched[out_idx[mutual]] = matched[in_idx[mutual]] = True
+        free = ~(matched[out_idx] | matched[in_idx])
+        out_idx, in_idx = out_idx[free], in_idx[free]
+
+    if not pairs_out:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pairs_out, pairs_in = np.concatenate(pairs_out), np.concatenate(pairs_in)
+    order = np.argsort(pairs_out, kind="stable")
+    return pairs_out[order], pairs_in[order]
@@ -8,7 +8,7 @@ import logging
 
 from datetime import date
 
-from fintrackr.fin_db import FinDB
+import fintrackr.fin_db
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +18,7 @@ DEFAULT_LOGGING_FORMAT = (
 
 # TODO add click interface
 
-def log_balance(accnt_name: str, balance_date: tuple[int], balance_amt: float, username: str, pw: str, db_name: str="fin_db") -> None:
+def log_balance(accnt_name: str, balance_date: tuple[int], balance_amt: float, username: str, pw: str, db_name: str="fin_db", pool_config: dict | None = None) -> None:
     """
     Log an account balance in the database
 
@@ -39,6 +39,9 @@ def log_balance(accnt_name: str, balance_date: tuple[int], balance_amt: float, u
         User's pw to connect to db
     db_name : str
         db to connect to (default fin_db; this is not hard-coded for testing purposes)
+    pool_config : dict or None
+        "pool" section of config.yml; with pooling enabled, calling this in a loop reuses
+        connections instead of opening a new one per call
 
     Returns
     -------
@@ -47,14 +50,17 @@ def log_balance(accnt_name: str, balance_date: tuple[int], balance_amt: float, u
 
     d = date(year=balance_date[0], month=balance_date[1],day=balance_date[2])
 
-    FinDB = FinDB(user=username, pw=pw, db_name=db_name)
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name, pool_config=pool_config)
 
-    result = FinDB.add_balance(accnt = accnt_name, bal_date = d, bal_amt = balance_amt)
+    try:
+        result = FinDB.add_balance(accnt = accnt_name, bal_date = d, bal_amt = balance_amt)
+    finally:
+        FinDB.close()
 
     if result == 1:
-        logger.info("Successfully logged balance of {balance_amt} to account {account_name} on date {balance_date} in {db_name}")
+        logger.info(f"Successfully logged balance of {balance_amt} to account {accnt_name} on date {balance_date} in {db_name}")
     else:
-        logger.warning("Unsuccessful attempt to log balance of {balance_amt} to account {account_name} on date {balance_date} in {db_name}")
+        logger.warning(f"Unsuccessful attempt to log balance of {balance_amt} to account {accnt_name} on date {balance_date} in {db_name}")
 
 # TODO add Correct balance (in case a balance was entered wrong)
 
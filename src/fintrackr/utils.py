@@ -1,12 +1,91 @@
+
+import numpy as np
+
 from dataclasses import dataclass
 from datetime import date
+from typing import Iterable, Iterator, List
+
+from fintrackr.balances import from_cents, to_cents
 
 
-@dataclass
+@dataclass(slots=True)
 class Transaction:
     date: date
     amount: float
 
     def __iter__(self):
         yield self.date
-        yield self.amount
\ No newline at end of file
+        yield self.amount
+
+
+class TransactionBatch:
+    """
+    Many (date, amount) pairs stored as two NumPy columns: dates as datetime64[D] and
+    amounts as int64 cents. About 16 bytes per transaction, versus well over 100 for a
+    list of Transaction objects, and the balance and plotting code can work on the
+    columns directly.
+
+    Behaves like a sequence of Transactions where that's convenient: len(), indexing
+    (an int gives a Transaction, a slice gives a TransactionBatch) and iteration, so
+    `for d, a in batch` and `zip(*batch)` work as they did on List[Transaction].
+    """
+    __slots__ = ("dates", "cents")
+
+    def __init__(self, dates: np.ndarray, cents: np.ndarray):
+        self.dates = np.asarray(dates, dtype="datetime64[D]")
+        self.cents = np.asarray(cents, dtype=np.int64)
+        if self.dates.shape != self.cents.shape:
+            raise ValueError(f"dates and cents must be the same length; got {len(self.dates)} and {len(self.cents)}")
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[tuple]) -> "TransactionBatch":
+        """
+        From (date, cents) rows, e.g. straight from a db cursor, without an intermediate list.
+        """
+        cols = np.fromiter(rows, dtype=[("date", "datetime64[D]"), ("cents", np.int64)])
+        return cls(cols["date"], cols["cents"])
+
+    @classmethod
+    def from_transactions(cls, transactions: Iterable[Transaction]) -> "TransactionBatch":
+        """
+        From Transactions with dollar amounts (or anything else that unpacks to (date, amount)).
+        """
+        cols = np.fromiter(((d, a) for d, a in transactions), dtype=[("date", "datetime64[D]"), ("amount", np.float64)])
+        return cls(cols["date"], to_cents(cols["amount"]))
+
+    @classmethod
+    def concatenate(cls, batches: Iterable["TransactionBatch"]) -> "TransactionBatch":
+        batches = list(batches)
+        if len(batches) == 0:
+            return cls(np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64))
+        return cls(np.concatenate([b.dates for b in batches]), np.concatenate([b.cents for b in batches]))
+
+    @property
+    def amounts(self) -> np.ndarray:
+        """
+        Amounts in dollars, float64.
+        """
+        return from_cents(self.cents)
+
+    def to_list(self) -> List[Transaction]:
+        return [Transaction(date=d, amount=a) for d, a in zip(self.dates.tolist(), self.amounts.tolist())]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return TransactionBatch(self.dates[key], self.cents[key])
+        return Transaction(date=self.dates[key].item(), amount=float(self.cents[key]) / 100)
+
+    def __iter__(self) -> Iterator[Transaction]:
+        for d, a in zip(self.dates.tolist(), self.amounts.tolist()):
+            yield Transaction(date=d, amount=a)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TransactionBatch):
+            return NotImplemented
+        return np.array_equal(self.dates, other.dates) and np.array_equal(self.cents, other.cents)
+
+    def __repr__(self) -> str:
+        return f"TransactionBatch({len(self)} transactions)"
@@ -0,0 +1,406 @@
+"""
+Watch drop directories for new csvs of transactions and load them as they arrive.
+
+Each directory in the watch section of config.yml belongs to one account (the name field
+in data_sources). New csvs are collected into batches, and each batch is loaded with
+FinDB.add_transactions_many, one staging cycle per account in the batch, over one FinDB
+(and its pool of connections) kept open for as long as the watch runs. A batch is loaded
+once it has batch_size files, once no new file has arrived for debounce seconds, or once
+its oldest file has waited max_wait seconds, whichever comes first.
+
+New files are noticed with inotify on Linux, and by listing the directories every
+poll_interval seconds elsewhere. Either way nothing is read from the directories while a
+batch is loading, so a burst of files waits (in the kernel's inotify queue, or on disk)
+rather than piling up in memory.
+
+Run from the command line with:
+
+    python ./src/fintrackr/watch_folders.py <username> <pw>
+
+and stop with Ctrl-C (or SIGTERM); files already collected are loaded before it exits.
+
+Copyright (c) 2026 Stephanie Johnson
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os, sys
+import select
+import signal
+import struct
+import threading
+import time
+import yaml
+
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import fintrackr.fin_db
+from fintrackr.ingest import IngestReport
+from fintrackr.metrics import Metrics, add_hook, remove_hook, set_statement_log_sample_rate
+
+CONFIG_PATH = os.path.join(os.getcwd(),"src","fintrackr","config.yml")
+
+logger = logging.getLogger(__name__)
+DEFAULT_LOGGING_FORMAT = (
+    "%(levelname)s %(asctime)-15s @ %(module)s.%(funcName)s.%(lineno)d - %(msg)s"
+)
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+INOTIFY_EVENT = struct.Struct("iIII") # wd, mask, cookie, len (of the name that follows)
+
+
+def list_csvs(directory: str) -> List[str]:
+    """
+    Paths of the csvs in directory, oldest first. Hidden files (e.g. partial downloads
+    some browsers write before renaming) are left out.
+    """
+    with os.scandir(directory) as entries:
+        csvs = [e for e in entries if e.is_file() and _is_csv_name(e.name)]
+    return [e.path for e in sorted(csvs, key=lambda e: e.stat().st_mtime_ns)]
+
+def _is_csv_name(name: str) -> bool:
+    return name.lower().endswith(".csv") and not name.startswith(".")
+
+
+class PollingWatcher:
+    """
+    Notices new csvs by listing the directories every poll_interval seconds. A file is
+    reported once its size and modification time are the same on two listings in a row,
+    so files still being written aren't picked up half-done.
+    """
+    def __init__(self, directories: List[str], poll_interval: float = 1.0):
+        self.directories = list(directories)
+        self.poll_interval = poll_interval
+        self._last_stat = {}
+        self._reported = {}
+        self._next_scan = time.monotonic()
+
+    def poll(self, timeout: float) -> List[str]:
+        """
+        Wait up to timeout seconds, and return the paths of files that are new (or changed)
+        and finished since the last call.
+        """
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(wait, 0))
+        self._next_scan = time.monotonic() + self.poll_interval
+
+        ready = []
+        for directory in self.directories:
+            for path in list_csvs(directory):
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                stat = (st.st_size, st.st_mtime_ns)
+                if self._last_stat.get(path) == stat and self._reported.get(path) != stat:
+                    ready.append(path)
+                    self._reported[path] = stat
+                self._last_stat[path] = stat
+        return ready
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Notices new csvs with inotify (Linux only): a file is reported when it is closed after
+    writing, or moved into a watched directory. Files already in the directories when the
+    watcher starts are reported by the first poll().
+
+    Raises
+    ------
+    OSError
+        If inotify isn't available, or a directory can't be watched.
+    """
+    def __init__(self, directories: List[str]):
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or libc_name is None:
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available from this libc")
+
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        try:
+            for directory in directories:
+                wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"Can't watch {directory}")
+                self._dirs[wd] = directory
+        except OSError:
+            os.close(self._fd)
+            raise
+        # Watches are set up first, so files arriving in between aren't missed (at worst reported twice)
+        self._backlog = self._rescan()
+
+    def _rescan(self) -> List[str]:
+        return [p for directory in self._dirs.values() for p in list_csvs(directory)]
+
+    def poll(self, timeout: float) -> List[str]:
+        """
+        Wait up to timeout seconds for events, and return the paths of files that are new
+        and finished since the last call.
+        """
+        if self._backlog:
+            ready, self._backlog = self._backlog, []
+            return ready
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        ready = []
+        data = os.read(self._fd, 1 << 16)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped while a batch was loading; files already loaded are skipped by add_transactions_many
+                logger.warning("inotify queue overflowed; rescanning watched directories")
+                ready.extend(self._rescan())
+            elif wd in self._dirs and _is_csv_name(name):
+                ready.append(os.path.join(self._dirs[wd], name))
+        return list(dict.fromkeys(ready))
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def make_watcher(directories: List[str], poll_interval: float = 1.0, use_inotify: bool = True) -> InotifyWatcher | PollingWatcher:
+    """
+    An InotifyWatcher if use_inotify and inotify is available, otherwise a PollingWatcher.
+    """
+    if use_inotify:
+        try:
+            return InotifyWatcher(directories)
+        except OSError as e:
+            logger.info(f"inotify unavailable ({e}); polling every {poll_interval} s instead")
+    return PollingWatcher(directories, poll_interval=poll_interval)
+
+
+class IngestBatcher:
+    """
+    Files waiting to be loaded, in order of arrival, and the rules for when to load them.
+    Times are time.monotonic() values, passed in so the rules can be tested without waiting.
+    """
+    def __init__(self, batch_size: int = 100, debounce: float = 2.0, max_wait: float = 30.0):
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be at least 1, not {batch_size}")
+        self.batch_size = batch_size
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self._pending = {} # path: (accnt, arrival time)
+        self._last_arrival = None
+        self._not_before = float("-inf") # see retry
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, path: str, accnt: str, now: float) -> None:
+        # A file that changes again while waiting keeps its place
+        if path not in self._pending:
+            self._pending[path] = (accnt, now)
+        self._last_arrival = now
+
+    def ready(self, now: float) -> bool:
+        if len(self._pending) == 0 or now < self._not_before:
+            return False
+        oldest = next(iter(self._pending.values()))[1]
+        return (len(self._pending) >= self.batch_size
+                or now - self._last_arrival >= self.debounce
+                or now - oldest >= self.max_wait)
+
+    def wait_time(self, now: float) -> float:
+        """
+        Seconds until ready() becomes true if no more files arrive (inf if nothing is waiting).
+        """
+        if len(self._pending) == 0:
+            return float("inf")
+        if self.ready(now):
+            return 0.0
+        oldest = next(iter(self._pending.values()))[1]
+        return max(min(self._last_arrival + self.debounce, oldest + self.max_wait), self._not_before) - now
+
+    def take(self) -> Dict[str, List[str]]:
+        """
+        Remove up to batch_size of the oldest files, and return them grouped by account.
+        """
+        batch = defaultdict(list)
+        for path in list(self._pending)[:self.batch_size]:
+            accnt, _ = self._pending.pop(path)
+            batch[accnt].append(path)
+        return dict(batch)
+
+    def retry(self, batch: Dict[str, List[str]], now: float, delay: float) -> None:
+        """
+        Put files taken with take() that failed to load back at the front of the queue, and
+        hold every batch back for delay seconds (the db is likely to be down for them all).
+        """
+        failed = {path: (accnt, now) for accnt, paths in batch.items() for path in paths}
+        self._pending = {**failed, **self._pending}
+        self._not_before = now + delay
+
+
+def watch(FinDB: fintrackr.fin_db.FinDB, directories: Dict[str, str], stop: threading.Event,
+          batch_size: int = 100, debounce: float = 2.0, max_wait: float = 30.0, poll_interval: float = 1.0,
+          max_workers: int = 4, use_inotify: bool = True, retry_delay: float = 30.0,
+          on_batch: Callable[[str, IngestReport], None] | None = None) -> None:
+    """
+    Load csvs dropped into directories until stop is set, then load whatever is still
+    waiting and return. Files already in the directories are loaded first; files that
+    fail, or were already loaded, are logged and left where they are.
+
+    If loading a batch fails altogether (e.g. the db is unreachable), the error is logged
+    and the batch is tried again after retry_delay seconds. After stop is set, a failed
+    batch isn't retried; its files are left in place, and are loaded the next time the
+    directories are watched.
+
+    Parameters
+    ----------
+    FinDB : FinDB
+        Open FinDB to load with; best with a pool, so add_transactions_many's extra
+        connections are already open
+    directories : Dict[str, str]
+        Directory to watch: name of the account (data_sources name) its files belong to
+    stop : threading.Event
+        Set to stop watching
+    batch_size : int
+        Most files loaded in one batch
+    debounce : float
+        Seconds without a new file before a partial batch is loaded
+    max_wait : float
+        Most seconds a file waits before its batch is loaded, even if files keep arriving
+    poll_interval : float
+        Seconds between listings of the directories, when not using inotify
+    max_workers : int
+        Passed to add_transactions_many
+    use_inotify : bool
+        Use inotify if available (otherwise always poll)
+    retry_delay : float
+        Seconds to wait before trying again after a batch fails to load
+    on_batch : callable or None
+        Called with (account, IngestReport) after each add_transactions_many
+    """
+    accnt_of = {os.path.abspath(d): accnt for d, accnt in directories.items()}
+    for directory in accnt_of:
+        if not os.path.isdir(directory):
+            raise ValueError(f"Watched directory {directory} does not exist")
+
+    batcher = IngestBatcher(batch_size=batch_size, debounce=debounce, max_wait=max_wait)
+    watcher = make_watcher(list(accnt_of), poll_interval=poll_interval, use_inotify=use_inotify)
+    logger.info(f"Watching {len(accnt_of)} directories with {type(watcher).__name__}")
+
+    def load_batch() -> Dict[str, List[str]]:
+        """
+        Load the next batch; returns the files of the accounts whose load failed.
+        """
+        failed = {}
+        for accnt, paths in batcher.take().items():
+            try:
+                report = FinDB.add_transactions_many(paths=paths, source_info=accnt, max_workers=max_workers)
+            except Exception as e:
+                logger.exception(f"Failed to load a batch of {len(paths)} files for {accnt}: {e}")
+                failed[accnt] = paths
+                continue
+            logger.info(f"Loaded batch for {accnt}:\n{report.summary()}")
+            if on_batch is not None:
+                on_batch(accnt, report)
+        return failed
+
+    try:
+        while not stop.is_set():
+            # Short enough waits that stop is noticed promptly
+            for path in watcher.poll(timeout=min(batcher.wait_time(time.monotonic()), 0.5)):
+                batcher.add(path, accnt_of[os.path.dirname(path)], now=time.monotonic())
+            while batcher.ready(time.monotonic()):
+                failed = load_batch()
+                if failed:
+                    logger.info(f"Trying again in {retry_delay} s")
+                    batcher.retry(failed, now=time.monotonic(), delay=retry_delay)
+        while len(batcher) > 0:
+            failed = load_batch()
+            if failed:
+                num_left = sum(map(len, failed.values())) + len(batcher)
+                logger.error(f"Stopping with {num_left} files not loaded; they'll be loaded the next time these directories are watched")
+                break
+    finally:
+        watcher.close()
+
+def run_watch(username: str, pw: str) -> None:
+    """
+    Watch the directories in the watch section of config.yml until SIGINT or SIGTERM.
+    Uses the db name and pool settings in config.yml (with the pool enabled); if the
+    metrics section has an export_path, timings are written there after every batch.
+
+    Parameters
+    ----------
+    username : str
+        username to use to connect to db
+    pw : str
+        pw to use to connect to db
+    """
+    with open(CONFIG_PATH, "r") as config_file:
+        config = yaml.safe_load(config_file)
+        db_name = config["db"]["db_name"]
+        pool_config = dict(config.get("pool") or {}, enabled=True)
+        metrics_config = config.get("metrics") or {}
+        watch_config = config.get("watch") or {}
+
+    directories = watch_config.get("directories") or {}
+    if len(directories) == 0:
+        raise ValueError(f"No directories to watch in the watch section of {CONFIG_PATH}")
+
+    set_statement_log_sample_rate(metrics_config.get("log_sample_rate", 1.0))
+    export_path = metrics_config.get("export_path")
+    metrics = Metrics()
+    if export_path:
+        add_hook(metrics)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop.set())
+
+    def write_metrics(accnt: str, report: IngestReport) -> None:
+        if export_path:
+            metrics.write(export_path)
+
+    FinDB = fintrackr.fin_db.FinDB(user=username, pw=pw, db_name=db_name, pool_config=pool_config)
+    try:
+        watch(FinDB, directories=directories, stop=stop,
+              batch_size=watch_config.get("batch_size", 100),
+              debounce=watch_config.get("debounce", 2.0),
+              max_wait=watch_config.get("max_wait", 30.0),
+              poll_interval=watch_config.get("poll_interval", 1.0),
+              max_workers=watch_config.get("max_workers", 4),
+              use_inotify=watch_config.get("use_inotify", True),
+              retry_delay=watch_config.get("retry_delay", 30.0),
+              on_batch=write_metrics)
+    finally:
+        FinDB.close()
+        fintrackr.fin_db.close_pools()
+        if export_path:
+            remove_hook(metrics)
+
+if __name__ == "__main__":
+    logging.basicConfig(level="INFO", format=DEFAULT_LOGGING_FORMAT)
+
+    if len(sys.argv) != 3:
+        raise TypeError("watch_folders.py takes 2 input args: (1) db username; (2) db pw")
+
+    run_watch(username = sys.argv[1], pw = sys.argv[2])
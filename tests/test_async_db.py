@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_async_db.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+import unittest
+import asyncio
+import subprocess, os
+import tempfile
+
+from datetime import date
+
+import fintrackr.testing_utils as utils
+import fintrackr.async_fin_db
+
+class TestAsyncFinDB(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.params = utils.config_params()
+        cls.FinDB = utils.set_up_test_DB(params=cls.params)
+        cls.FinDB.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        exit_code = subprocess.run(["dropdb", cls.params["test_db_name"]])
+        exit_code2 = subprocess.run(["dropuser",cls.params["user"]])
+        exit_code3 = subprocess.run(["dropuser",cls.params["test_owner"]])
+
+        assert exit_code.returncode==0, "Failed to remove testing db, must now remove manually"
+        assert exit_code2.returncode==0, "Failed to remove testing user, must now remove manually"
+        assert exit_code3.returncode==0, "Failed to remove testing db owner, must now remove manually"
+
+    async def asyncSetUp(self):
+        self.db = await fintrackr.async_fin_db.AsyncFinDB.connect(
+            user=self.params["user"], pw=self.params["user_pw"], db_name=self.params["test_db_name"], pool_config=self.params["pool"]
+        )
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await fintrackr.async_fin_db.close_async_pools()
+
+    async def test_add_and_read(self):
+        self.assertEqual(await self.db.add_balance(accnt="async", bal_date=date(year=2025,month=9,day=9), bal_amt=5000.00), 1)
+        self.assertEqual(await self.db.add_balance(accnt="async", bal_date=date(year=2025,month=9,day=9), bal_amt=5000.00), 0)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "async.csv")
+            with open(path, "w") as f:
+                f.write("09/08/2025,-3.00,Async cafe\n09/08/2025,-3.00,Async cafe\n09/10/2025,20.00,Async refund\n")
+            self.assertEqual(await self.db.add_transactions(path_to_source_file=path, source_info="async"), 3)
+            self.assertEqual(await self.db.add_transactions(path_to_source_file=path, source_info="async"), 0, "File was already loaded")
+
+            # As FinDB.add_transactions, bad input is logged and nothing is added
+            self.assertEqual(await self.db.add_transactions(path_to_source_file=os.path.join(tmp_dir, "missing.csv"), source_info="async"), 0)
+            bad_path = os.path.join(tmp_dir, "bad.csv")
+            with open(bad_path, "w") as f:
+                f.write("09/08/2025,not an amount,Async cafe\n")
+            self.assertEqual(await self.db.add_transactions(path_to_source_file=bad_path, source_info="async"), 0)
+
+        amts = await self.db.data_from_date_range(data_source="async", date_range=[date(year=2025,month=9,day=30), date(year=2025,month=9,day=1)])
+        self.assertEqual(sorted(t.amount for t in amts["transactions"]), [-3.00, -3.00, 20.00])
+        self.assertEqual(amts["balances"][0].amount, 5000.00)
+
+        self.assertIsNone(await self.db.execute_query("SELECT * FROM no_such_table;"))
+
+    async def test_concurrent_queries(self):
+        # Independent queries run at the same time, each on its own pooled connection
+        start = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*(self.db.execute_query("SELECT pg_backend_pid() FROM pg_sleep(0.2);") for _ in range(3)))
+        elapsed = asyncio.get_running_loop().time() - start
+
+        self.assertEqual(len({r[0][0] for r in results}), 3, "Each query should have had its own connection")
+        self.assertLess(elapsed, 0.5, "Queries should have run concurrently")
+
+    async def test_concurrent_loads_same_account(self):
+        # Each load's trigger refreshes the account's daily balances; run at once, they must not collide
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = []
+            for i in range(4):
+                paths.append(os.path.join(tmp_dir, f"concurrent_{i}.csv"))
+                with open(paths[-1], "w") as f:
+                    f.writelines(f"10/{day:02d}/2025,-{i + 1}.00,Concurrent shop {i}\n" for day in range(1, 29))
+            added = await asyncio.gather(*(self.db.add_transactions(path_to_source_file=p, source_info="concurrent") for p in paths))
+        self.assertEqual(added, [28] * 4)
+
+        daily = await self.db.execute_query(
+            "SELECT d.day, d.amount FROM daily_balances d JOIN data_sources s ON s.id = d.accnt_id "
+            "WHERE s.name = 'concurrent' ORDER BY d.day;"
+        )
+        self.assertEqual(len(daily), 28)
+        self.assertEqual(daily[-1][1], -(1 + 2 + 3 + 4) * 28, "Every load should be in the daily balances")
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_categorize.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+import unittest
+import os
+import tempfile
+import numpy as np
+
+from fintrackr.categorize import CategoryRule, CompiledRules, load_rules
+
+class TestCategorize(unittest.TestCase):
+    # Writing categories to the db is tested in test_db
+
+    def test_match(self):
+        rules = CompiledRules([
+            CategoryRule(label="refunds", contains=["safeway"], min_amount=0),
+            CategoryRule(label="groceries", contains=["Safeway", "trader joe's"]),
+            CategoryRule(label="subs", pattern=r"patreon|netflix\.com", frequency="monthly"),
+            CategoryRule(label="big", min_amount=-1000, max_amount=-500),
+            CategoryRule(label="income", min_amount=0.01),
+        ])
+        descriptions = np.array(["SAFEWAY #123", "Safeway", "Trader Joe's", "netflix.com", "netflixxcom",
+                                 "Alaska airlines", "Paycheck", None, "Patreon Safeway"], dtype=object)
+        cents = np.array([-2657, 1000, -1500, -1599, -1599, -53659, 250000, -70000, -500], dtype=np.int64)
+
+        self.assertEqual(rules.match(descriptions, cents).tolist(), [1, 0, 1, 2, -1, 3, 4, 3, 1],
+                         "Each transaction should get the first rule it matches")
+        self.assertEqual(rules.match(np.array([], dtype=object), np.array([], dtype=np.int64)).tolist(), [])
+
+        # An earlier rule wins even if it matches further right, or overlapping a later rule's match
+        overlapping = CompiledRules([CategoryRule(label="a", contains=["bcd"]), CategoryRule(label="b", pattern="ab+c"),
+                                     CategoryRule(label="c", contains=["xy"]), CategoryRule(label="d", pattern="x(y)z")])
+        self.assertEqual(overlapping.match(np.array(["abcd", "xy abc", "xyz", "xyz xy", "ab"], dtype=object), np.zeros(5, dtype=np.int64)).tolist(),
+                         [0, 1, 2, 2, -1])
+
+        # One candidate per amount range whose rules a description matches
+        positions, indices = rules.candidates(np.array(["Safeway", "netflixxcom"], dtype=object))
+        self.assertEqual(sorted(zip(positions.tolist(), indices.tolist())), [(0, 0), (0, 1), (0, 3), (0, 4), (1, 3), (1, 4)])
+
+    def test_load_rules(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "rules.yml")
+            with open(path, "w") as f:
+                f.write("rules:\n  - label: groceries\n    contains: safeway\n  - label: subs\n    pattern: patreon\n    frequency: monthly\n")
+            self.assertEqual(load_rules(path), [CategoryRule(label="groceries", contains=["safeway"]),
+                                                CategoryRule(label="subs", pattern="patreon", frequency="monthly")])
+
+            for bad in ("  - label: x\n    colour: red\n", "  - label: x\n    pattern: '('\n",
+                        "  - label: x\n    frequency: weekly\n", "  - label: x\n    min_amount: 5\n    max_amount: 1\n",
+                        "  - label: x\n    pattern: '(a)\\1'\n", "  - label: x\n    pattern: '(?P<x>a)'\n"):
+                with open(path, "w") as f:
+                    f.write("rules:\n" + bad)
+                with self.assertRaises(ValueError):
+                    load_rules(path)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_classify.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+import unittest
+import os
+import tempfile
+import numpy as np
+
+from fintrackr.classify import NaiveBayesModel, amount_buckets, fit_and_evaluate, labels_block, ngram_features, read_labeled_csv
+
+TEST_DATA = os.path.join(os.path.dirname(__file__), "data")
+
+class TestClassify(unittest.TestCase):
+    # Reading training data from and writing labels to the db is tested in test_db
+
+    def test_features(self):
+        doc_ids, feature_ids = ngram_features(np.array(["AB", None, "ab c"], dtype=object), n_features=1 << 10, ngram_range=(2, 3))
+        # " ab " has 3 bigrams and 2 trigrams, "  " 1 bigram, " ab c " 5 and 4; none straddle two descriptions
+        self.assertEqual(np.bincount(doc_ids).tolist(), [5, 1, 9])
+        self.assertTrue(np.all((feature_ids >= 0) & (feature_ids < 1 << 10)))
+        # Case-insensitive, and the same n-grams hash the same wherever they are
+        self.assertEqual(sorted(feature_ids[doc_ids == 0]), sorted(feature_ids[doc_ids == 2][:3].tolist() + feature_ids[doc_ids == 2][5:7].tolist()))
+        self.assertEqual(len(ngram_features(np.array([], dtype=object))[0]), 0)
+        with self.assertRaises(ValueError):
+            ngram_features(np.array(["a"], dtype=object), n_features=1000)
+
+        self.assertEqual(amount_buckets(np.array([-1, 0, 5, -2657, 250000, -10**12])).tolist(), [0, 0, 8, 3, 13, 7])
+
+    def test_fit_predict(self):
+        descriptions, cents, labels = (np.concatenate(a) for a in zip(read_labeled_csv(os.path.join(TEST_DATA, "test_data_cc_labeled.csv")),
+                                                                      read_labeled_csv(os.path.join(TEST_DATA, "test_data_checking_labeled.csv"))))
+        self.assertEqual((len(descriptions), descriptions[0], cents[0], labels[0]), (24, "Safeway", -2657, "groceries"))
+
+        model = NaiveBayesModel.fit(descriptions, cents, labels)
+        predicted, confidence = model.predict(np.array(["SAFEWAY #1234", "patreon* membership", "Payroll", None], dtype=object),
+                                              np.array([-1999, -500, 250000, -500]))
+        self.assertEqual(model.labels[predicted[:3]].tolist(), ["groceries", "subs", "salary"])
+        self.assertTrue(np.all((confidence > 0) & (confidence <= 1)))
+        self.assertEqual(len(model.predict(np.array([], dtype=object), np.array([], dtype=np.int64))[0]), 0)
+
+        # Batches and duplicates don't change the result
+        batched, _ = model.predict(descriptions, cents, batch_size=3)
+        self.assertEqual(batched.tolist(), model.predict(descriptions, cents)[0].tolist())
+        self.assertGreater(np.mean(model.labels[batched] == labels.astype(str)), 0.9)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "model.npz")
+            model.save(path)
+            loaded = NaiveBayesModel.load(path)
+            self.assertEqual(loaded.labels.tolist(), model.labels.tolist())
+            self.assertEqual(loaded.predict(descriptions, cents)[0].tolist(), batched.tolist())
+            with self.assertRaises(ValueError):
+                NaiveBayesModel.load(os.path.join(tmp_dir, "missing.npz"))
+
+        num_rows, block = labels_block(model, np.array(["Safeway", "Venmo"], dtype=object), np.array([-100, 3100]),
+                                       np.arange(len(model.labels)) + 100, min_confidence=0.0)
+        self.assertEqual((num_rows, block.splitlines()[0]), (2, f"Safeway,-100,{100 + list(model.labels).index('groceries')}"))
+        self.assertEqual(labels_block(model, np.array(["Safeway"], dtype=object), np.array([-100]), np.arange(len(model.labels)),
+                                      min_confidence=1.01)[0], 0)
+
+        model, report = fit_and_evaluate(descriptions, cents, labels, test_fraction=0.25)
+        self.assertEqual((report.n_train, report.n_test, len(model.labels)), (18, 6, 12))
+        self.assertTrue(0 <= report.accuracy <= 1)
+
+        with self.assertRaises(ValueError):
+            NaiveBayesModel.fit(descriptions, cents[:1], labels)
@@ -7,12 +7,24 @@
 
 import unittest
 import subprocess, os
+import tempfile
+import threading
+import time
 import yaml
 import pandas as pd
+import psycopg
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+from decimal import Decimal
 
 import fintrackr.testing_utils as utils
+import fintrackr.fin_db
+import fintrackr.ingest
+import fintrackr.metrics as metrics
+import fintrackr.watch_folders as watch_folders
+from fintrackr.categorize import CategoryRule
+from fintrackr.classify import NaiveBayesModel
 
 class TestDBSetup(unittest.TestCase):
     @classmethod
@@ -27,8 +39,7 @@ class TestDBSetup(unittest.TestCase):
         # Some test fixtures shared by multiple tests:
         cls.path_to_test_transactions = utils.TEST_TRANSACTIONS_PATH
         cls.transactions_to_add = pd.read_csv(cls.path_to_test_transactions, header=None)
-        cls.element_to_match = str(cls.transactions_to_add.iloc[1,1])
-        cls.element_to_match = cls.element_to_match[0] + "$" + cls.element_to_match[1:] + "0"
+        cls.element_to_match = Decimal(str(cls.transactions_to_add.iloc[1,1])).quantize(Decimal("0.01"))
 
         cls.source_info = "cc"
         cls.balance_date = date(year=2025, month=9, day=9)
@@ -37,6 +48,7 @@ class TestDBSetup(unittest.TestCase):
     @classmethod
     def tearDownClass(cls):
         cls.FinDB.close()
+        fintrackr.fin_db.close_pools()
         # Delete testing db
         exit_code = subprocess.run(["dropdb", cls.params["test_db_name"]])
         exit_code2 = subprocess.run(["dropuser",cls.params["user"]])
@@ -66,6 +78,40 @@ class TestDBSetup(unittest.TestCase):
                             ),
                          0)
     
+    def test_money_loaders(self):
+        # money comes back as Decimal dollars, whatever the server's money text format looks like
+        rows = self.FinDB.execute_query("SELECT '5000.00'::money, '-12.34'::money, '0'::money;")
+        self.assertEqual(rows[0], (Decimal("5000.00"), Decimal("-12.34"), Decimal("0.00")))
+        # Types with no binary loader still come back as text, not raw bytes
+        rows = self.FinDB.execute_query("SELECT 'monthly'::recurrance, 'data_sources'::regclass;")
+        self.assertEqual(rows[0], ("monthly", "data_sources"))
+
+        loader = fintrackr.fin_db.MoneyLoader(fintrackr.fin_db.MONEY_OID)
+        self.assertEqual(loader.load(b"$5,000.00"), Decimal("5000.00"))
+        self.assertEqual(loader.load(b"-$12.34"), Decimal("-12.34"))
+
+    def test_pooled_connections(self):
+        # A fixed-size pool, so it can't open a third connection in the background and hand that out to db_3
+        pool_config = dict(self.params["pool"], enabled=True, min_size=2, max_size=2)
+        connect = lambda: fintrackr.fin_db.FinDB(user=self.params["user"], pw=self.params["user_pw"], db_name=self.params["test_db_name"], pool_config=pool_config)
+
+        db_1, db_2 = connect(), connect()
+        try:
+            self.assertIs(db_1._pool, db_2._pool, "FinDBs with the same credentials should share one pool")
+            self.assertEqual(db_1.execute_query("SELECT 1;"), [(1,)])
+            backend_pids = {db_1._conn.info.backend_pid, db_2._conn.info.backend_pid}
+            self.assertEqual(len(backend_pids), 2, "Two open FinDBs should not share a connection")
+        finally:
+            db_1.close()
+            db_2.close()
+
+        # close() hands the connection back to the pool rather than closing it
+        db_3 = connect()
+        self.assertIn(db_3._conn.info.backend_pid, backend_pids, "Connection was not reused from the pool")
+        db_3.close()
+
+        fintrackr.fin_db.close_pools()
+
     def test_stage_transactions(self):
         # stage_transactions adds rows to a staging table that should be empty at start
         num_rows_added = self.FinDB.stage_transactions(path_to_transactions=self.path_to_test_transactions)
@@ -89,6 +135,63 @@ class TestDBSetup(unittest.TestCase):
         # self.assertEqual(num_rows_added_2, 0, "No rows should have been added, malformed input")
         
     
+    def test_import_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "import.csv")
+            with open(path, "w") as f:
+                f.write('09/03/2025,-12.00,Import bakery\n2025-09-04,1234.5,"Import, with comma"\n09/05/2025, -0.07 ,Import gum\n09/06/2025,-1.00,\n')
+            bad_path = os.path.join(tmp_dir, "bad.csv")
+            with open(bad_path, "w") as f:
+                f.write("09/03/2025,-12.00,Import bakery\n09/04/2025,lots,Import oops\n")
+
+            for table in ("import_text", "import_binary"):
+                self.FinDB._execute_action(f"CREATE TABLE {table}(posted_date date, amount money, description text);")
+            try:
+                # Blocks smaller than a line, to check they're joined back up correctly
+                block_size = fintrackr.fin_db.IMPORT_BLOCK_SIZE
+                fintrackr.fin_db.IMPORT_BLOCK_SIZE = 7
+                try:
+                    self.assertEqual(self.FinDB._import_file("import_text", path), 4)
+                finally:
+                    fintrackr.fin_db.IMPORT_BLOCK_SIZE = block_size
+                self.assertEqual(self.FinDB._import_file("import_binary", path, binary=True), 4)
+
+                query = "SELECT posted_date, amount, description FROM {} ORDER BY posted_date;"
+                rows = self.FinDB.execute_query(query.format("import_binary"))
+                self.assertEqual(rows, self.FinDB.execute_query(query.format("import_text")), "Binary import should match csv import")
+                self.assertEqual(rows[1], (date(2025, 9, 4), Decimal("1234.50"), "Import, with comma"))
+                self.assertIsNone(rows[3][2], "An empty description should be NULL")
+
+                self.assertEqual(self.FinDB._import_file("import_binary", bad_path, binary=True), 0, "Malformed row should fail the import")
+                self.assertEqual(self.FinDB._import_file("balances", path, binary=True), 0, "Columns don't match a transactions file")
+            finally:
+                for table in ("import_text", "import_binary"):
+                    self.FinDB._execute_action(f"DROP TABLE {table};")
+
+    def test_concurrent_imports(self):
+        # Each FinDB stages into a temporary table of its own connection, so imports can overlap
+        connect = lambda: fintrackr.fin_db.FinDB(user=self.params["user"], pw=self.params["user_pw"], db_name=self.params["test_db_name"])
+        db_1, db_2 = connect(), connect()
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                paths = [os.path.join(tmp_dir, f"concurrent_{i}.csv") for i in range(2)]
+                for i, path in enumerate(paths):
+                    with open(path, "w") as f:
+                        f.writelines(f"11/{1 + j % 28:02d}/2025,-{j}.25,Concurrent {i} {j}\n" for j in range(200 * (i + 1)))
+
+                self.assertEqual(db_1.stage_transactions(path_to_transactions=paths[0]), 200)
+                self.assertEqual(db_2.stage_transactions(path_to_transactions=paths[1]), 400)
+                self.assertEqual(db_1.execute_query("SELECT count(*) FROM staging;"), [(200,)], "Staging tables should not be shared")
+                self.assertEqual(db_1.execute_query("SELECT relpersistence FROM pg_class WHERE oid = 'staging'::regclass;"), [("t",)])
+
+                with ThreadPoolExecutor(max_workers=2) as pool:
+                    added = list(pool.map(lambda args: args[0].add_transactions(path_to_source_file=args[1], source_info=args[2]),
+                                          [(db_1, paths[0], "concurrent_1"), (db_2, paths[1], "concurrent_2")]))
+                self.assertEqual(added, [200, 400])
+        finally:
+            db_1.close()
+            db_2.close()
+
     def test_add_transactions(self):
         # Add_transactions calls stage_transactions (which we test separately above)
 
@@ -123,6 +226,419 @@ class TestDBSetup(unittest.TestCase):
             )
         self.assertEqual(num_transactions_added, num_new_trans, "Duplicates should not have been successfully loaded")
 
+    def test_known_contents_skipped(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first, renamed, overlapping = (os.path.join(tmp_dir, name) for name in ("march.csv", "march (1).csv", "march_april.csv"))
+            rows = ["03/02/2025,-4.50,Hash coffee\n", "03/02/2025,-4.50,Hash coffee\n", "03/09/2025,-60.00,Hash groceries\n"]
+            with open(first, "w") as f:
+                f.writelines(rows)
+            with open(renamed, "w") as f:
+                f.writelines(rows)
+            with open(overlapping, "w") as f:
+                # One more of the repeated charge, and a new one
+                f.writelines(rows + ["03/02/2025,-4.50,Hash coffee\n", "04/01/2025,-9.99,Hash streaming\n"])
+
+            self.assertEqual(self.FinDB.add_transactions(path_to_source_file=first, source_info="hash"), 3)
+            self.assertEqual(self.FinDB.add_transactions(path_to_source_file=renamed, source_info="hash"), 0,
+                             "A copy of a loaded file should have been skipped")
+            self.assertEqual(self.FinDB.execute_query("SELECT count(*) FROM data_load_metadata WHERE source=%s;", (renamed,)), [(0,)])
+
+            self.assertEqual(self.FinDB.add_transactions(path_to_source_file=overlapping, source_info="hash", skip_known_rows=True), 2)
+            self.assertEqual(self.FinDB.execute_query("SELECT count(*) FROM transactions WHERE description='Hash coffee';"), [(3,)])
+
+            # Fingerprints computed client-side match the ones the db computed
+            chunk = next(fintrackr.ingest.iter_transaction_chunks(overlapping, chunk_rows=10))
+            stored = self.FinDB.execute_query("SELECT fingerprint FROM transactions WHERE description LIKE 'Hash %%';")
+            self.assertEqual(set(fintrackr.ingest.transaction_fingerprints(*chunk)), {f for (f,) in stored})
+
+    def test_formatted_amounts(self):
+        # Currency symbols, thousands separators and parenthesized negatives, as money input accepts them
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "formatted.csv")
+            with open(path, "w") as f:
+                f.write('08/01/2024,"$1,234.56",Formatted paycheck\n08/02/2024,(12.00),Formatted cafe\n'
+                        '08/03/2024,-$5.00,Formatted parking\n08/04/2024, 7.25 ,Formatted refund\n')
+
+            num_rows, block = fintrackr.ingest.read_transactions_file(path)
+            self.assertEqual(num_rows, 4)
+            _, cents, _ = next(fintrackr.ingest.iter_transaction_chunks(path))
+            self.assertEqual(cents.tolist(), [123456, -1200, -500, 725])
+
+            self.FinDB.add_transactions(path_to_source_file=path, source_info="formatted")
+            self.assertEqual(self.FinDB.execute_query("SELECT amount FROM transactions WHERE description LIKE 'Formatted %%' ORDER BY posted_date;"),
+                             [(Decimal("1234.56"),), (Decimal("-12.00"),), (Decimal("-5.00"),), (Decimal("7.25"),)])
+
+            with open(path, "w") as f:
+                f.write("08/05/2024,$12.x0,Formatted typo\n")
+            with self.assertRaises(ValueError):
+                fintrackr.ingest.read_transactions_file(path)
+
+    def test_add_transactions_many(self):
+        # Uses its own account and descriptions so it doesn't depend on what the other tests loaded
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, f"bulk_{i}.csv") for i in range(3)]
+            with open(paths[0], "w") as f:
+                f.write("09/03/2025,-12.00,Bulk bakery\n09/04/2025,-30.10,Bulk hardware\n")
+            with open(paths[1], "w") as f:
+                # First row duplicates a row from the first file
+                f.write("09/03/2025,-12.00,Bulk bakery\n09/06/2025,100.00,Bulk refund\n09/06/2025,-7.77,Bulk cafe\n")
+            with open(paths[2], "w") as f:
+                f.write("09/07/2025,,Bulk oops\n")
+            malformed = os.path.join(os.getcwd(),"tests","data","test_data_cc_wrongnumcols.csv")
+
+            report = self.FinDB.add_transactions_many(paths=paths + [malformed], source_info="bulk", max_workers=2)
+
+            self.assertEqual([f.staged for f in report.files], [2, 3, 0, 0], "Rows staged per file do not match files")
+            self.assertEqual([f.inserted for f in report.files], [2, 2, 0, 0], "Duplicate within the batch should have been skipped")
+            self.assertEqual(report.files[1].skipped, 1)
+            self.assertIsNotNone(report.files[2].error, "Row with no amount should have failed validation")
+            self.assertIsNotNone(report.files[3].error, "File with too many columns should have failed validation")
+            self.assertGreater(report.wall_time, 0)
+
+            # Loading the same files again is reported, not raised
+            report = self.FinDB.add_transactions_many(paths=paths[:2], source_info="bulk")
+            self.assertEqual(report.inserted, 0, "Already-loaded files should not have been loaded again")
+            self.assertEqual([f.error for f in report.files], ["already loaded", "already loaded"])
+
+    def test_watch_folders(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dirs = {os.path.join(tmp_dir, accnt): accnt for accnt in ("watch_cc", "watch_checking")}
+            for d in dirs:
+                os.mkdir(d)
+            for i in range(5):
+                with open(os.path.join(tmp_dir, "watch_cc", f"statement_{i}.csv"), "w") as f:
+                    f.write(f"10/{i + 1:02d}/2025,-{i}.50,Watch cafe {i}\n")
+
+            batches = []
+            stop = threading.Event()
+            watcher = threading.Thread(target=watch_folders.watch, args=(self.FinDB, dirs, stop),
+                                       kwargs=dict(batch_size=3, debounce=0.2, poll_interval=0.05, max_workers=2,
+                                                   on_batch=lambda accnt, report: batches.append((accnt, len(report.files)))))
+            watcher.start()
+            try:
+                time.sleep(0.5)
+                with open(os.path.join(tmp_dir, "watch_checking", "statement.csv"), "w") as f:
+                    f.write("10/09/2025,250.00,Watch paycheck\n")
+                deadline = time.monotonic() + 30
+                while sum(n for _, n in batches) < 6 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                stop.set()
+                watcher.join()
+
+            self.assertEqual(batches, [("watch_cc", 3), ("watch_cc", 2), ("watch_checking", 1)], "Files should be loaded in batches of at most 3")
+            self.assertEqual(self.FinDB.execute_query(
+                "SELECT d.name, count(*) FROM transactions t JOIN data_sources d ON d.id = t.data_source_id "
+                "WHERE t.description LIKE 'Watch %%' GROUP BY d.name ORDER BY d.name;"),
+                [("watch_cc", 5), ("watch_checking", 1)])
+
+    def test_categorize_transactions(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "categorize.csv")
+            with open(path, "w") as f:
+                f.write("07/01/2024,-20.00,Categorize SAFEWAY 1\n07/02/2024,-20.00,Categorize SAFEWAY 1\n"
+                        "07/03/2024,-9.99,Categorize Patreon\n07/04/2024,-3.00,Categorize mystery\n")
+            self.FinDB.add_transactions(path_to_source_file=path, source_info="categorize")
+
+        rules = [CategoryRule(label="groceries", contains=["safeway"]), CategoryRule(label="subs", pattern="patreon", frequency="monthly")]
+        scope = "WHERE t.description LIKE 'Categorize %%' "
+        query = ("SELECT t.description, c.label, c.frequency FROM transactions t "
+                 "JOIN transactions_categories_xref x ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date "
+                 "JOIN categories c ON c.id = x.category_id JOIN categorizations z ON z.id = c.categorization_id "
+                 + scope + "AND z.name = %s ORDER BY t.posted_date;")
+
+        self.assertGreaterEqual(self.FinDB.categorize_transactions(rules=rules, categorization="test_rules", batch_size=2), 3)
+        self.assertEqual(self.FinDB.execute_query(query, ("test_rules",)),
+                         [("Categorize SAFEWAY 1", "groceries", "irregular"), ("Categorize SAFEWAY 1", "groceries", "irregular"),
+                          ("Categorize Patreon", "subs", "monthly")])
+
+        # Only what's still uncategorized is looked at again, and existing categories are reused
+        rules.append(CategoryRule(label="other", contains=["mystery"]))
+        self.assertEqual(self.FinDB.categorize_transactions(rules=rules, categorization="test_rules"), 1)
+        self.assertEqual(len(self.FinDB.execute_query(query, ("test_rules",))), 4)
+        self.assertEqual(self.FinDB.execute_query(
+            "SELECT count(*) FROM categories c JOIN categorizations z ON z.id = c.categorization_id WHERE z.name = 'test_rules';"), [(3,)])
+
+        # The foreign keys are checked
+        bad_xref = "SELECT id, posted_date + 1, (SELECT min(id) FROM categories) FROM transactions"
+        with self.assertRaises(psycopg.errors.ForeignKeyViolation):
+            self.FinDB._conn.execute("INSERT INTO transactions_categories_xref (transaction_id, transaction_posted_date, category_id) " + bad_xref)
+        with self.assertRaises(psycopg.errors.ForeignKeyViolation):
+            self.FinDB._conn.execute("DELETE FROM categories;")
+        self.assertEqual(len(self.FinDB.execute_query(query, ("test_rules",))), 4)
+
+    def test_classify_transactions(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            labeled, unlabeled = os.path.join(tmp_dir, "labeled.csv"), os.path.join(tmp_dir, "unlabeled.csv")
+            with open(labeled, "w") as f:
+                f.write("08/01/2024,-20.00,Classify SAFEWAY 12\n08/02/2024,-25.00,Classify Safeway 9\n"
+                        "08/03/2024,-9.99,Classify Patreon\n08/15/2024,2500.00,Classify Payroll ACME\n")
+            with open(unlabeled, "w") as f:
+                f.write("09/01/2024,-31.00,Classify SAFEWAY 77\n09/03/2024,-9.99,Classify Patreon\n09/15/2024,2500.00,Classify Payroll ACME\n")
+            self.FinDB.add_transactions(path_to_source_file=labeled, source_info="classify")
+
+            rules = [CategoryRule(label="groceries", contains=["classify safeway"]), CategoryRule(label="subs", contains=["classify patreon"]),
+                     CategoryRule(label="income", contains=["classify payroll"])]
+            self.assertEqual(self.FinDB.categorize_transactions(rules=rules, categorization="test_classifier"), 4)
+            descriptions, cents, labels = self.FinDB.labeled_transactions(categorization="test_classifier")
+            self.assertEqual(sorted(zip(descriptions, cents.tolist(), labels)),
+                             [("Classify Patreon", -999, "subs"), ("Classify Payroll ACME", 250000, "income"),
+                              ("Classify SAFEWAY 12", -2000, "groceries"), ("Classify Safeway 9", -2500, "groceries")])
+            self.assertEqual(len(self.FinDB.labeled_transactions(categorization="no_such_categorization")[0]), 0)
+
+            model = NaiveBayesModel.fit(descriptions, cents, labels)
+            self.FinDB.add_transactions(path_to_source_file=unlabeled, source_info="classify")
+
+        query = ("SELECT t.description, c.label FROM transactions t "
+                 "JOIN transactions_categories_xref x ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date "
+                 "JOIN categories c ON c.id = x.category_id JOIN categorizations z ON z.id = c.categorization_id "
+                 "WHERE t.description LIKE 'Classify %%' AND t.posted_date >= '2024-09-01' AND z.name = %s ORDER BY t.posted_date;")
+        # No label is certain enough
+        self.assertEqual(self.FinDB.classify_transactions(model=model, categorization="test_classifier", min_confidence=1.01), 0)
+        self.assertGreaterEqual(self.FinDB.classify_transactions(model=model, categorization="test_classifier", batch_size=2), 3)
+        self.assertEqual(self.FinDB.execute_query(query, ("test_classifier",)),
+                         [("Classify SAFEWAY 77", "groceries"), ("Classify Patreon", "subs"), ("Classify Payroll ACME", "income")])
+        # Categories are reused
+        self.assertEqual(self.FinDB.execute_query(
+            "SELECT count(*) FROM categories c JOIN categorizations z ON z.id = c.categorization_id WHERE z.name = 'test_classifier';"), [(3,)])
+
+    def test_detect_recurring_charges(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "recurring.csv")
+            with open(path, "w") as f:
+                for month, deli_day in zip(range(1, 7), [3, 20, 7, 28, 1, 15]):
+                    f.write(f"{month:02d}/0{month % 3 + 1}/2023,-15.99,Recurring STREAMFLIX #{month}00\n")
+                    f.write(f"{month:02d}/{deli_day:02d}/2023,-{month * 7}.50,Recurring Deli\n")
+                f.write("03/10/2022,-480.00,Recurring Insurance\n03/09/2023,-495.00,RECURRING INSURANCE 2023\n")
+            self.FinDB.add_transactions(path_to_source_file=path, source_info="recurring")
+
+        rules = [CategoryRule(label="subs", contains=["recurring streamflix"]), CategoryRule(label="food", contains=["recurring deli"]),
+                 CategoryRule(label="insurance", contains=["recurring insurance"], frequency="monthly")]
+        self.FinDB.categorize_transactions(rules=rules, categorization="test_recurring")
+
+        groups = self.FinDB.detect_recurring_charges(categorization="test_recurring")
+        groups = groups[groups["merchant"].str.startswith("recurring")].set_index("merchant")
+        self.assertEqual(groups["frequency"].to_dict(),
+                         {"recurring streamflix": "monthly", "recurring deli": "irregular", "recurring insurance": "annual"})
+        self.assertEqual(groups.loc["recurring streamflix", ["account", "num_charges"]].tolist(), ["recurring", 6])
+
+        categories = self.FinDB.execute_query(
+            "SELECT c.label, c.frequency::text, c.frequency_confidence > 0.5 FROM categories c JOIN categorizations z ON z.id = c.categorization_id "
+            "WHERE z.name = 'test_recurring' ORDER BY c.label;")
+        self.assertEqual(categories, [("food", "irregular", True), ("insurance", "annual", True), ("subs", "monthly", True)])
+        # Without a categorization nothing is written
+        self.assertEqual(len(self.FinDB.detect_recurring_charges(categorization=None)), len(self.FinDB.detect_recurring_charges(categorization="no_such")))
+
+    def test_match_transfers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = [os.path.join(tmp_dir, name) for name in ("checking.csv", "card.csv", "refund.csv")]
+            for path, rows in zip(paths, ["02/03/2022,-500.00,Transfer CARD PAYMENT\n02/03/2022,-42.10,Transfer Grocery\n",
+                                          "02/05/2022,500.00,Transfer PAYMENT THANK YOU\n02/12/2022,-500.00,Transfer Airline\n",
+                                          "02/04/2022,42.10,Transfer Refund\n"]):
+                with open(path, "w") as f:
+                    f.write(rows)
+            self.FinDB.add_transactions(path_to_source_file=paths[0], source_info="transfer_checking")
+            self.FinDB.add_transactions(path_to_source_file=paths[1], source_info="transfer_card")
+
+            pairs = ("SELECT o.description, i.description FROM transfers f "
+                     "JOIN transactions o ON o.id = f.out_transaction_id AND o.posted_date = f.out_posted_date "
+                     "JOIN transactions i ON i.id = f.in_transaction_id AND i.posted_date = f.in_posted_date "
+                     "WHERE o.description LIKE 'Transfer %%' ORDER BY o.posted_date;")
+            self.assertGreaterEqual(self.FinDB.match_transfers(window_days=3), 1)
+            self.assertEqual(self.FinDB.execute_query(pairs), [("Transfer CARD PAYMENT", "Transfer PAYMENT THANK YOU")])
+            # Loads already matched aren't looked at again
+            self.assertEqual(self.FinDB.match_transfers(window_days=3), 0)
+
+            # A new transaction is matched with an older one in another account
+            self.FinDB.add_transactions(path_to_source_file=paths[2], source_info="transfer_card")
+            self.assertEqual(self.FinDB.match_transfers(window_days=3), 1)
+            self.assertEqual(self.FinDB.execute_query(pairs), [("Transfer CARD PAYMENT", "Transfer PAYMENT THANK YOU"),
+                                                               ("Transfer Grocery", "Transfer Refund")])
+
+        self.assertEqual(self.FinDB.execute_query("SELECT description FROM spending_transactions WHERE description LIKE 'Transfer %%';"),
+                         [("Transfer Airline",)])
+
+    def test_find_duplicates(self):
+        accnt = "duplicates"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # The second export overlaps the first, with a day shifted and descriptions changed
+            paths = [os.path.join(tmp_dir, name) for name in ("dup_march.csv", "dup_april.csv")]
+            for path, rows in zip(paths, ["03/01/2021,-3.00,Dup Kiosk\n03/10/2021,-25.00,Dup SAFEWAY #1234\n"
+                                          "03/20/2021,-15.99,Dup Netflix\n03/28/2021,-9.00,Dup Deli\n",
+                                          "03/09/2021,-1.50,Dup Parking\n03/11/2021,-25.00,Dup Safeway\n03/20/2021,-15.99,Dup NETFLIX.COM\n"
+                                          "03/29/2021,-9.00,Dup Hardware\n04/05/2021,-40.00,Dup Gas\n"]):
+                with open(path, "w") as f:
+                    f.write(rows)
+                self.FinDB.add_transactions(path_to_source_file=path, source_info=accnt)
+        # The later copy's category moves to the original when it's merged
+        self.FinDB.categorize_transactions([CategoryRule(label="Dup groceries", pattern="dup safeway$")], categorization="dups")
+
+        num_queued, num_merged = self.FinDB.find_duplicates(window_days=3, min_similarity=0.5)
+        self.assertGreaterEqual(num_queued, 2)
+        self.assertEqual(num_merged, 0)
+        queue = self.FinDB.possible_duplicates()
+        queue = queue[queue["account"] == accnt]
+        self.assertEqual(list(zip(queue["original_description"], queue["duplicate_description"])),
+                         [("Dup SAFEWAY #1234", "Dup Safeway"), ("Dup Netflix", "Dup NETFLIX.COM")])
+        self.assertEqual(self.FinDB.find_duplicates(window_days=3, min_similarity=0.5)[0], 0, "Pairs aren't queued twice")
+
+        safeway, netflix = queue["id"].tolist()
+        self.assertEqual(self.FinDB.resolve_duplicates([netflix], merge=False), 1)
+        self.assertEqual(self.FinDB.resolve_duplicates([safeway]), 1)
+        self.assertFalse(self.FinDB.possible_duplicates()["account"].eq(accnt).any())
+        self.assertEqual(self.FinDB.find_duplicates(window_days=3, min_similarity=0.5)[0], 0, "Dismissed pairs aren't queued again")
+
+        self.assertEqual(self.FinDB.execute_query("SELECT t.description, c.label FROM transactions t "
+                                                  "JOIN transactions_categories_xref x ON x.transaction_id = t.id AND x.transaction_posted_date = t.posted_date "
+                                                  "JOIN categories c ON c.id = x.category_id WHERE t.description LIKE 'Dup %%';"),
+                         [("Dup SAFEWAY #1234", "Dup groceries")])
+        balances = self.FinDB.daily_balances_in_date_range(data_source=accnt, date_range=[date(2021, 3, 1), date(2021, 4, 30)])
+        self.assertEqual([(t.date.isoformat(), t.amount) for t in balances][1:4],
+                         [("2021-03-09", -4.50), ("2021-03-10", -29.50), ("2021-03-20", -61.48)])
+
+    def test_monthly_category_totals(self):
+        accnt = "rollup"
+        totals = lambda **kwargs: [tuple(row) for row in self.FinDB.monthly_category_totals(
+            categorization="rollups", data_sources=[accnt], **kwargs).itertuples(index=False)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "rollup.csv")
+            with open(path, "w") as f:
+                f.write("05/03/2019,-10.00,Rollup Grocer\n05/20/2019,-20.00,Rollup Cafe\n06/02/2019,100.00,Rollup Pay\n")
+            self.FinDB.add_transactions(path_to_source_file=path, source_info=accnt)
+
+        self.assertEqual(totals(), [(accnt, date(2019, 5, 1), None, -30.0, 2), (accnt, date(2019, 6, 1), None, 100.0, 1)])
+        self.assertEqual(self.FinDB.refresh_monthly_totals(), 0, "Up to date after reading")
+
+        # Only the month with newly categorized transactions is recomputed
+        self.FinDB.categorize_transactions([CategoryRule(label="Rollup food", contains=["rollup grocer"])], categorization="rollups")
+        self.assertEqual(self.FinDB.refresh_monthly_totals(), 1)
+        self.assertEqual(totals(), [(accnt, date(2019, 5, 1), "Rollup food", -10.0, 1), (accnt, date(2019, 5, 1), None, -20.0, 1),
+                                    (accnt, date(2019, 6, 1), None, 100.0, 1)])
+        self.assertEqual(totals(date_range=[date(2019, 6, 30), date(2019, 6, 15)]), [(accnt, date(2019, 6, 1), None, 100.0, 1)])
+
+    def test_metrics_hook(self):
+        registry = metrics.Metrics()
+        metrics.add_hook(registry)
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                path = os.path.join(tmp_dir, "metrics.csv")
+                with open(path, "w") as f:
+                    f.write("10/03/2025,-4.00,Metrics kiosk\n10/04/2025,-5.50,Metrics deli\n")
+                self.FinDB.add_transactions_many(paths=[path], source_info="metrics", max_workers=1)
+            self.FinDB.data_from_date_range("metrics", [date(2025, 10, 1), date(2025, 10, 31)])
+        finally:
+            metrics.remove_hook(registry)
+
+        stats = registry.to_dict()
+        for operation in ["parse", "stage", "dedup_insert", "date_range_fetch"]:
+            self.assertIn(operation, stats)
+        self.assertEqual(stats["stage"]["rows"], 2)
+        self.assertGreater(stats["stage"]["bytes"], 0)
+        self.assertEqual(stats["dedup_insert"]["rows"], 2)
+        self.assertEqual(stats["date_range_fetch"]["rows"], 2, "Two transactions, no balances")
+
+    def test_daily_balances(self):
+        # Own account and descriptions, as in test_add_transactions_many
+        accnt = "daily"
+        date_range = [date(year=2024,month=12,day=1), date(year=2025,month=1,day=31)]
+        daily = lambda: [(t.date.isoformat(), t.amount) for t in self.FinDB.daily_balances_in_date_range(data_source=accnt, date_range=date_range)]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            def load(name, rows):
+                path = os.path.join(tmp_dir, name)
+                with open(path, "w") as f:
+                    f.write(rows)
+                self.FinDB.add_transactions(path_to_source_file=path, source_info=accnt)
+
+            # No stored balance: relative to zero before the first transaction
+            load("daily_0.csv", "01/01/2025,100.00,Daily pay\n01/01/2025,-30.00,Daily lunch\n01/03/2025,50.00,Daily refund\n")
+            self.assertEqual(daily(), [("2025-01-01", 70.00), ("2025-01-03", 120.00)])
+
+            # A stored balance re-anchors every day, and gets a row of its own
+            self.FinDB.add_balance(accnt=accnt, bal_date=date(year=2025,month=1,day=2), bal_amt=1000.00)
+            self.assertEqual(daily(), [("2025-01-01", 1000.00), ("2025-01-02", 1000.00), ("2025-01-03", 1050.00)])
+
+            # Transactions after the stored balance only add days; earlier rows are left alone
+            ids_before = self.FinDB.execute_query("SELECT d.id FROM daily_balances d JOIN data_sources s ON s.id = d.accnt_id WHERE s.name=%s ORDER BY d.day;", (accnt,))
+            load("daily_1.csv", "01/05/2025,-20.00,Daily gas\n")
+            self.assertEqual(daily()[-1], ("2025-01-05", 1030.00))
+            ids_after = self.FinDB.execute_query("SELECT d.id FROM daily_balances d JOIN data_sources s ON s.id = d.accnt_id WHERE s.name=%s ORDER BY d.day;", (accnt,))
+            self.assertEqual(ids_after[:len(ids_before)], ids_before, "Days before the new transactions should not have been rewritten")
+
+            # Earlier than the stored balance: everything before it shifts
+            load("daily_2.csv", "12/31/2024,10.00,Daily gift\n")
+            expected = [("2024-12-31", 930.00), ("2025-01-01", 1000.00), ("2025-01-02", 1000.00), ("2025-01-03", 1050.00), ("2025-01-05", 1030.00)]
+            self.assertEqual(daily(), expected)
+
+        # Deleted and changed transactions refresh from their day on
+        self.FinDB._execute_action("DELETE FROM transactions WHERE description = 'Daily gas';")
+        self.FinDB._execute_action("UPDATE transactions SET amount = 60.00 WHERE description = 'Daily refund';")
+        self.assertEqual(daily(), [("2024-12-31", 930.00), ("2025-01-01", 1000.00), ("2025-01-02", 1000.00), ("2025-01-03", 1060.00)])
+
+        # Without the stored balance, relative to zero again
+        self.FinDB._execute_action("DELETE FROM balances WHERE accnt_id = (SELECT id FROM data_sources WHERE name = 'daily');")
+        expected = [("2024-12-31", 10.00), ("2025-01-01", 80.00), ("2025-01-03", 140.00)]
+        self.assertEqual(daily(), expected)
+
+        # Repair
+        self.FinDB._execute_action("DELETE FROM daily_balances;")
+        self.assertEqual(self.FinDB.rebuild_daily_balances(accnt=accnt), len(expected))
+        self.assertEqual(daily(), expected)
+        self.FinDB.rebuild_daily_balances()
+
+    def test_data_from_date_range_many(self):
+        self.FinDB.add_transactions(path_to_source_file=self.path_to_test_transactions, source_info=self.source_info)
+        self.FinDB.add_balance(accnt=self.source_info, bal_date=self.balance_date, bal_amt=self.balance_amount)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "many.csv")
+            with open(path, "w") as f:
+                f.write("09/08/2025,-3.00,Many cafe\n09/01/2025,20.00,Many refund\n")
+            self.FinDB.add_transactions(path_to_source_file=path, source_info="many")
+
+        date_range = [date(year=2025,month=9,day=1), date(year=2025,month=9,day=30)]
+        names = ["many", self.source_info, "no such account", "many"]
+        by_accnt = self.FinDB.data_from_date_range_many(data_sources=names, date_range=date_range)
+
+        self.assertEqual(list(by_accnt), ["many", self.source_info, "no such account"])
+        for name in ["many", self.source_info]:
+            one = self.FinDB.data_from_date_range(data_source=name, date_range=list(date_range))
+            self.assertEqual(by_accnt[name]["balances"], one["balances"])
+            self.assertEqual(sorted(by_accnt[name]["transactions"].to_list(), key=lambda t: (t.date, t.amount)),
+                             sorted(one["transactions"].to_list(), key=lambda t: (t.date, t.amount)))
+        self.assertEqual(by_accnt["many"]["transactions"].to_list()[0].amount, 20.00, "Transactions should be in date order")
+        self.assertEqual(len(by_accnt["no such account"]["transactions"]), 0)
+        self.assertEqual(len(by_accnt["no such account"]["balances"]), 0)
+
+    def test_transaction_partitions(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "parts.csv")
+            with open(path, "w") as f:
+                f.write("12/31/2011,-1.00,Parts old\n01/02/2012,-2.00,Parts new\n")
+            self.assertEqual(self.FinDB.add_transactions(path_to_source_file=path, source_info="parts"), 2)
+
+        partitions = [p for (p,) in self.FinDB.execute_query("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'transactions'::regclass;")]
+        self.assertIn("transactions_2011", partitions)
+        self.assertIn("transactions_2012", partitions)
+
+        # Reads of a date range only touch the partitions for those dates
+        plan = "\n".join(r[0] for r in self.FinDB.execute_query(
+            "EXPLAIN SELECT * FROM transactions WHERE posted_date BETWEEN %s AND %s;", (date(2012,1,1), date(2012,1,31))
+        ))
+        self.assertIn("transactions_2012", plan)
+        self.assertNotIn("transactions_2011", plan)
+
+    def test_render_accnt_balances(self):
+        import fintrackr.render_balances
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rendered = fintrackr.render_balances.render_accnt_balances(
+                date_range=[date(year=2024,month=1,day=1), date(year=2025,month=12,day=31)],
+                username=self.params["user"], pw=self.params["user_pw"], out_dir=tmp_dir,
+                accnt_names=[self.source_info, "no such account"], max_workers=2, path_to_config=utils.CONFIG_PATH
+            )
+            self.assertEqual(list(rendered), [self.source_info, "no such account"], "Accounts with no data still get a (blank) chart")
+            self.assertTrue(all(os.path.getsize(p) > 0 for p in rendered.values()))
+
     def test_data_from_date_range(self):
         # pytest runs each test case independently, so re-set-up the db
         # Neither of these functions allow duplicates
@@ -142,9 +658,20 @@ class TestDBSetup(unittest.TestCase):
             date_range = [date(year=2025,month=9,day=5),date(year=2025,month=9,day=10)]
         )
         
-        bal_money = "$"+f"{self.balance_amount}"[0]+","+f"{self.balance_amount}"[1:]+"0"
-        self.assertEqual(amts["balances"][0].amount, bal_money, "data_from_date_range did not return correct balance amount")
+        self.assertEqual(amts["balances"][0].amount, self.balance_amount, "data_from_date_range did not return correct balance amount")
 
         self.assertEqual(len(amts["transactions"]), 3, "data_from_date_range did not return the correct number of transactions") # assumes BETWEEN is inclusive
 
+        # Streaming version returns the same transactions, in date order, in batches
+        date_range = [date(year=2025,month=9,day=10),date(year=2025,month=9,day=1)]
+        batches = list(self.FinDB.iter_date_range(data_source=self.source_info, date_range=date_range, batch_size=2))
+        streamed = [t for batch in batches for t in batch]
+        all_in_range = self.FinDB.data_from_date_range(data_source=self.source_info, date_range=date_range)["transactions"]
+        self.assertEqual(len(streamed), len(all_in_range))
+        self.assertTrue(all(len(b) == 2 for b in batches[:-1]), "Batches should be full except the last")
+        self.assertEqual([t.date for t in streamed], sorted(t.date for t in all_in_range), "Streamed transactions not in date order")
+        self.assertEqual(sum(int(c) for batch in batches for c in batch.cents), self.FinDB.sum_in_date_range(data_source=self.source_info, date_range=date_range))
+
+        self.assertEqual(self.FinDB.balances_in_date_range(data_source=self.source_info, date_range=date_range)[0].amount, self.balance_amount)
+
 
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_duplicates.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+import unittest
+import numpy as np
+
+from fintrackr.duplicates import candidate_duplicates, description_similarity, find_duplicates
+
+class TestDuplicates(unittest.TestCase):
+    # Reading the ledger and the review queue in the db is tested in test_db
+
+    def test_description_similarity(self):
+        a = np.array(["Safeway", "Netflix", "Amazon Mktp", "Shell", None], dtype=object)
+        b = np.array(["SAFEWAY #1234", "NETFLIX.COM", "AMAZON MKTPLACE US*2K3", "Chevron", ""], dtype=object)
+        similarity = description_similarity(a, b)
+        self.assertEqual(similarity[0], 1.0, "Same merchant key")
+        self.assertEqual(similarity[4], 1.0)
+        self.assertGreater(similarity[1], 0.5)
+        self.assertGreater(similarity[2], 0.5)
+        self.assertLess(similarity[3], 0.2)
+        self.assertEqual(len(description_similarity(a[:0], b[:0])), 0)
+
+    def test_find_duplicates(self):
+        # Loads 1 (days 0 to 20) and 2 (days 9 to 40) overlap on days 9 to 20
+        descriptions = np.array(["Kiosk", "SAFEWAY #1234", "Netflix", "Deli", "Safeway", "NETFLIX.COM", "Hardware", "Gas",
+                                 "Safeway", "Deli"], dtype=object)
+        days = np.array([0, 10, 15, 20, 11, 15, 19, 40, 9, 30])
+        cents = np.array([-300, -2500, -1599, -900, -2500, -1599, -900, -4000, -2500, -900])
+        accounts = np.ones(len(days), dtype=np.int64)
+        loads = np.array([1, 1, 1, 1, 2, 2, 2, 2, 2, 2])
+
+        # Same load, too far apart, and outside the other load's days (day 30) aren't candidates
+        original, duplicate = candidate_duplicates(days, cents, accounts, loads, window_days=3)
+        self.assertEqual(sorted(zip(original.tolist(), duplicate.tolist())), [(1, 4), (1, 8), (2, 5), (3, 6)])
+
+        # Dissimilar descriptions are left out, and each original gets its closest duplicate
+        pairs = find_duplicates(descriptions, days, cents, accounts, loads, window_days=3, min_similarity=0.5)
+        self.assertEqual(list(zip(pairs["original"], pairs["duplicate"])), [(1, 4), (2, 5)])
+        self.assertEqual(pairs["similarity"].iloc[0], 1.0)
+
+        # Another account isn't a candidate
+        accounts[4] = 2
+        pairs = find_duplicates(descriptions, days, cents, accounts, loads, window_days=3)
+        self.assertEqual(list(zip(pairs["original"], pairs["duplicate"])), [(1, 8), (2, 5)])
+
+        empty = np.array([], dtype=np.int64)
+        self.assertEqual(len(find_duplicates(empty.astype(object), empty, empty, empty, empty)), 0)
@@ -0,0 +1,62 @@
+import unittest
+import json
+import os
+import tempfile
+
+import fintrackr.metrics as metrics
+
+class TestMetrics(unittest.TestCase):
+    # FinDB's use of the hooks needs db access, so it's tested in test_db
+
+    def test_metrics(self):
+        m = metrics.Metrics()
+        m("stage", 0.002, 10, 300, False)
+        m("stage", 2.0, 5, 100, False)
+        m("dedup_insert", 0.5, 12, 0, True)
+
+        stats = m.to_dict()
+        self.assertEqual(list(stats), ["dedup_insert", "stage"])
+        self.assertEqual((stats["stage"]["count"], stats["stage"]["rows"], stats["stage"]["bytes"]), (2, 15, 400))
+        self.assertEqual(stats["stage"]["buckets"]["0.005"], 1)
+        self.assertEqual(stats["stage"]["buckets"]["5.0"], 1)
+        self.assertEqual(stats["dedup_insert"]["errors"], 1)
+        self.assertEqual(stats["dedup_insert"]["buckets"]["0.5"], 1, "Bucket bounds should be inclusive")
+
+        prom = m.to_prometheus()
+        self.assertIn('fintrackr_db_operation_seconds_bucket{operation="stage",le="+Inf"} 2', prom)
+        self.assertIn('fintrackr_db_operation_seconds_bucket{operation="stage",le="1.0"} 1', prom, "Buckets should be cumulative")
+        self.assertIn('fintrackr_db_operation_bytes_total{operation="stage"} 400', prom)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            m.write(os.path.join(tmp_dir, "db.json"))
+            with open(os.path.join(tmp_dir, "db.json")) as f:
+                self.assertEqual(json.load(f), stats)
+            m.write(os.path.join(tmp_dir, "db.prom"))
+            with open(os.path.join(tmp_dir, "db.prom")) as f:
+                self.assertEqual(f.read(), prom)
+            self.assertEqual(sorted(os.listdir(tmp_dir)), ["db.json", "db.prom"])
+
+        m.reset()
+        self.assertEqual(m.to_dict(), {})
+
+    def test_instrument(self):
+        calls = []
+        hook = lambda *args: calls.append(args)
+        metrics.add_hook(hook)
+        try:
+            with metrics.instrument("fetch") as m:
+                m.rows = 3
+            with self.assertRaises(RuntimeError):
+                with metrics.instrument("fetch"):
+                    raise RuntimeError("failed")
+        finally:
+            metrics.remove_hook(hook)
+
+        with metrics.instrument("fetch"):
+            pass
+
+        self.assertEqual([(c[0], c[2], c[4]) for c in calls], [("fetch", 3, False), ("fetch", 0, True)])
+        self.assertGreaterEqual(calls[0][1], 0)
+
+        with self.assertRaises(ValueError):
+            metrics.set_statement_log_sample_rate(1.5)
@@ -4,7 +4,7 @@ import matplotlib.pyplot as plt
 from datetime import date
 
 import fintrackr.plot_accnt_balances as plot
-from fintrackr.utils import Transaction
+from fintrackr.utils import Transaction, TransactionBatch
 
 class TestPlotAccntBalances(unittest.TestCase):
     # The main function in plot_accnt_balances doesn't have testing coverage because it requires db access
@@ -132,6 +132,59 @@ class TestPlotAccntBalances(unittest.TestCase):
 
         self.assertEqual(rel_bals_8, [])
 
+    def test_relative_bal_by_date_iter(self):
+        # Streaming in batches should give the same balances as relative_bal_by_date
+        trans = sorted(self.trans, key=lambda t: t.date)
+        batches = [trans[i:i+2] for i in range(0, len(trans), 2)]
+
+        references = [None, self.bals[-1], self.bals[0], 
+                      Transaction(date=date(year=2026,month=1,day=1), amount=5000.00),
+                      Transaction(date=date(year=2023, month=10, day=4),amount=2500.00)]
+        for ref in references:
+            expected = plot.relative_bal_by_date(references=[] if ref is None else [ref], transactions=list(trans))
+            cents_through_ref = 0 if ref is None else round(100 * sum(t.amount for t in trans if t.date <= ref.date))
+
+            streamed = [b for batch in plot.relative_bal_by_date_iter(batches, reference=ref, cents_through_reference=cents_through_ref) for b in batch]
+
+            self.assertEqual([b.date for b in streamed], [e.date for e in expected], f"Dates differ relative to {ref}")
+            for b, e in zip(streamed, expected):
+                self.assertAlmostEqual(b.amount, e.amount, places=6, msg=f"Balances differ relative to {ref}")
+
+        # First day split across batches, with no reference
+        split_first_day = [[trans[1]], [trans[2], trans[3]]]
+        streamed = [b for batch in plot.relative_bal_by_date_iter(split_first_day) for b in batch]
+        self.assertEqual(streamed[0], Transaction(date=date(year=2024,month=1,day=1), amount=200.00))
+        self.assertEqual(streamed[2].amount, 0.00, "Balance at end of first day should be zero")
+
+        self.assertEqual(list(plot.relative_bal_by_date_iter([])), [])
+
+    def test_running_balances_exact_cents(self):
+        # Summing floats drifts (sum of 1000 dimes is not 100.0 in floating point); balances are kept in cents
+        dimes = [Transaction(date=date(year=2025,month=1,day=1), amount=0.10) for _ in range(1000)]
+        rel_bals = plot.relative_bal_by_date(references=[], transactions=dimes + [Transaction(date=date(year=2025,month=1,day=2), amount=0.00)])
+        self.assertEqual(rel_bals[0].amount, -100.00)
+        self.assertEqual(rel_bals[-1].amount, 0.00)
+        self.assertEqual(len(rel_bals), 1002)
+
+    def test_transaction_batch(self):
+        batch = TransactionBatch.from_transactions(self.trans)
+        self.assertEqual(len(batch), len(self.trans))
+        self.assertEqual(batch.to_list(), self.trans)
+        self.assertEqual(batch[0], self.trans[0])
+        self.assertEqual(batch[-1], self.trans[-1])
+        self.assertEqual(batch[1:3].to_list(), self.trans[1:3])
+        self.assertEqual([d for d, _ in batch], [t.date for t in self.trans])
+        self.assertEqual(TransactionBatch.concatenate([batch[:2], batch[2:]]), batch)
+
+        # Batches in, batches out, with the same balances as lists
+        rel_bals = plot.relative_bal_by_date(references=self.bals, transactions=batch)
+        self.assertIsInstance(rel_bals, TransactionBatch)
+        self.assertEqual(rel_bals.to_list(), plot.relative_bal_by_date(references=self.bals, transactions=self.trans))
+        self.assertEqual(len(plot.relative_bal_by_date(references=[], transactions=batch[:0])), 0)
+
+        with self.assertRaises(ValueError):
+            TransactionBatch(batch.dates, batch.cents[:-1])
+
     def test_plot_balances(self):
         # Just a smoke test (does it run)
 
@@ -147,6 +200,10 @@ class TestPlotAccntBalances(unittest.TestCase):
 
         plot.plot_balances(all_balances=self.bals, calculated_balances=calc_bals)
 
+        # Calculated balances can also be streamed in
+        plot.plot_balances(all_balances=self.bals, calculated_balances=(b for b in calc_bals))
+        plot.plot_balances(all_balances=TransactionBatch.from_transactions(self.bals), calculated_balances=TransactionBatch.from_transactions(calc_bals))
+
         plt.close('all') # may not need this, may get handled by pytest/unittest
 
     
\ No newline at end of file
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_recurring.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+import unittest
+import numpy as np
+
+from fintrackr.recurring import category_frequencies, detect_recurring, merchant_keys
+
+class TestRecurring(unittest.TestCase):
+    # Reading the ledger from and writing frequencies to the db is tested in test_db
+
+    def test_merchant_keys(self):
+        self.assertEqual(merchant_keys(np.array(["SAFEWAY #1234", "Safeway", "Target T-1832", None, "Thai Basil, Inc. 123 x0001",
+                                                 "Payroll ACME Corp REF0001"], dtype=object)).tolist(),
+                         ["safeway", "safeway", "target", "", "thai basil inc", "payroll acme corp"])
+
+    def test_detect_recurring(self):
+        days = np.array(["2024-01-05", "2024-02-05", "2024-03-06", "2024-04-05", "2024-05-04", # monthly, one charged twice on a day
+                         "2024-01-10", "2024-01-11", "2024-03-01", "2024-03-02",               # irregular
+                         "2023-06-01", "2024-06-02",                                           # annual
+                         "2024-01-05", "2024-02-05", "2024-03-05",                             # monthly, but in another account
+                         "2024-01-15", "2024-02-15"], dtype="datetime64[D]")                   # only twice
+        keys = np.array(["netflix"] * 5 + ["grocer"] * 4 + ["insurance"] * 2 + ["netflix"] * 3 + ["gym"] * 2, dtype=object)
+        cents = np.array([-1599] * 5 + [-2000, -3500, -1200, -800, -50000, -52000] + [-1599] * 3 + [-4500] * 2)
+        accounts = np.array([1] * 11 + [2] * 3 + [1] * 2)
+        days[4] = days[3]
+
+        groups, group = detect_recurring(keys, days, cents, accounts=accounts)
+        self.assertEqual(list(zip(groups["account"], groups["merchant"], groups["frequency"])),
+                         [(1, "netflix", "monthly"), (1, "grocer", "irregular"), (1, "insurance", "annual"), (1, "gym", "irregular"),
+                          (2, "netflix", "monthly")])
+        self.assertEqual(group.tolist(), [0] * 5 + [1] * 4 + [2] * 2 + [4] * 3 + [3] * 2)
+        self.assertEqual(groups["num_charges"].tolist(), [4, 4, 2, 2, 3])
+        self.assertEqual(groups["median_interval"].tolist()[:3], [30, 1, 367])
+        self.assertEqual(groups["confidence"].iloc[0], 1.0)
+        # Varying amounts make a group less certain
+        self.assertLess(groups["confidence"].iloc[2], 1.0)
+
+        # Income and expenses at the same merchant are separate
+        groups, _ = detect_recurring(keys[:5], days[:5], -cents[:5] * np.array([1, -1, -1, 1, 1]))
+        self.assertEqual(groups["frequency"].tolist(), ["irregular", "irregular"])
+
+        self.assertEqual(len(detect_recurring(np.array([], dtype=object), np.array([], dtype="datetime64[D]"), np.array([], dtype=np.int64))[0]), 0)
+
+    def test_category_frequencies(self):
+        keys = np.array(["netflix"] * 4 + ["grocer"] * 3, dtype=object)
+        days = np.array([0, 31, 61, 92, 3, 4, 40])
+        groups, group = detect_recurring(keys, days, np.full(7, -1000))
+        frequencies = category_frequencies(groups, group, np.array([7, 7, 7, 7, 9, 9, -1]))
+        self.assertEqual(frequencies["category_id"].tolist(), [7, 9])
+        self.assertEqual(frequencies["frequency"].tolist(), ["monthly", "irregular"])
+
+        # A category mostly of irregular charges is irregular
+        frequencies = category_frequencies(groups, group, np.array([7, -1, -1, -1, 7, 7, 7]))
+        self.assertEqual(frequencies["frequency"].tolist(), ["irregular"])
@@ -0,0 +1,46 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+
+from datetime import date
+
+import fintrackr.render_balances as render
+from fintrackr.utils import Transaction, TransactionBatch
+
+class TestRenderBalances(unittest.TestCase):
+    # render_accnt_balances needs db access, so it's tested in test_db
+
+    def test_downsample_min_max(self):
+        rng = np.random.default_rng(0)
+        x = np.datetime64("2020-01-01") + np.sort(rng.integers(0, 2000, size=50_000)).astype("timedelta64[D]")
+        y = rng.normal(size=50_000).cumsum()
+
+        dx, dy = render.downsample_min_max(x, y, n_buckets=100)
+
+        self.assertLessEqual(len(dx), 202)
+        self.assertTrue(np.all(dx[1:] >= dx[:-1]), "Points should stay in order")
+        self.assertEqual(dy.min(), y.min())
+        self.assertEqual(dy.max(), y.max())
+        self.assertEqual((dx[0], dx[-1]), (x[0], x[-1]))
+
+        # Already small enough: unchanged
+        sx, sy = render.downsample_min_max(x[:150], y[:150], n_buckets=100)
+        self.assertEqual(len(sx), 150)
+
+    def test_render_balances(self):
+        bals = TransactionBatch.from_transactions([Transaction(date=date(year=2025,month=9,day=10), amount=5000.00)])
+        calc = TransactionBatch(np.datetime64("2025-01-01") + np.arange(5000).astype("timedelta64[D]") // 10,
+                                np.arange(5000, dtype=np.int64) * 100)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            png = render.render_balances(all_balances=bals, calculated_balances=calc, path=os.path.join(tmp_dir, "a.png"), title="a")
+            with open(png, "rb") as f:
+                self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+
+            svg = render.render_balances(all_balances=bals, calculated_balances=calc[:0], path=os.path.join(tmp_dir, "a.svg"))
+            with open(svg, "r") as f:
+                self.assertIn("<svg", f.read())
+
+            with self.assertRaises(ValueError):
+                render.render_balances(all_balances=bals, calculated_balances=calc, path=os.path.join(tmp_dir, "a.jpg"))
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_transfers.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+import unittest
+import numpy as np
+
+from fintrackr.transfers import candidate_pairs, match_transfers
+
+class TestTransfers(unittest.TestCase):
+    # Reading candidates from and writing transfers to the db is tested in test_db
+
+    def test_match_transfers(self):
+        days = np.array([0, 1, 0, 2, 10, 10, 5, 5, 20, 30, 40, 41], dtype="datetime64[D]")
+        cents = np.array([-500, 500, -500, 500, -700, 700, -300, 300, -900, 900, -100, 200])
+        accounts = np.array([1, 2, 1, 2, 1, 1, 1, 3, 2, 1, 1, 2])
+
+        # Same account, too far apart and different amounts aren't candidates
+        out_idx, in_idx = candidate_pairs(days, cents, accounts, window_days=3)
+        self.assertEqual(sorted(zip(out_idx.tolist(), in_idx.tolist())), [(0, 1), (0, 3), (2, 1), (2, 3), (6, 7)])
+
+        # Each transaction is in one transfer; the closest pair goes first
+        out_idx, in_idx = match_transfers(days, cents, accounts, window_days=3)
+        self.assertEqual(list(zip(out_idx.tolist(), in_idx.tolist())), [(0, 1), (2, 3), (6, 7)])
+        out_idx, in_idx = match_transfers(days, cents, accounts, window_days=10)
+        self.assertEqual(list(zip(out_idx.tolist(), in_idx.tolist())), [(0, 1), (2, 3), (6, 7), (8, 9)])
+
+        # Only pairs with a new transaction
+        new = np.zeros(len(days), dtype=bool)
+        new[7] = True
+        out_idx, in_idx = match_transfers(days, cents, accounts, new=new, window_days=3)
+        self.assertEqual(list(zip(out_idx.tolist(), in_idx.tolist())), [(6, 7)])
+
+        empty = np.array([], dtype=np.int64)
+        self.assertEqual(len(match_transfers(empty, empty, empty)[0]), 0)
+
+    def test_match_chain(self):
+        # Alternating expenses and income a day apart: each round pairs the closest, earliest ones
+        days = np.arange(6)
+        cents = np.array([-100, 100, -100, 100, -100, 100])
+        out_idx, in_idx = match_transfers(days, cents, np.array([1, 2, 1, 2, 1, 2]), window_days=1)
+        self.assertEqual(list(zip(out_idx.tolist(), in_idx.tolist())), [(0, 1), (2, 3), (4, 5)])
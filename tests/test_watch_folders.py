@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# test_watch_folders.py
+#
+# Copyright (c) 2026 Stephanie Johnson
+
+import unittest
+import os
+import tempfile
+import threading
+import time
+
+import psycopg
+
+import fintrackr.watch_folders as watch_folders
+from fintrackr.ingest import FileIngestResult, IngestReport
+
+class TestWatchFolders(unittest.TestCase):
+    # Loading batches into a real db is tested in test_db
+
+    def test_batcher(self):
+        batcher = watch_folders.IngestBatcher(batch_size=3, debounce=2.0, max_wait=10.0)
+        self.assertFalse(batcher.ready(now=0.0))
+        self.assertEqual(batcher.wait_time(now=0.0), float("inf"))
+
+        batcher.add("a.csv", "cc", now=0.0)
+        batcher.add("b.csv", "checking", now=1.0)
+        self.assertFalse(batcher.ready(now=2.5))
+        self.assertEqual(batcher.wait_time(now=2.5), 0.5)
+        self.assertTrue(batcher.ready(now=3.0), "Partial batch should load after the debounce window")
+
+        batcher.add("b.csv", "checking", now=2.5)
+        batcher.add("c.csv", "cc", now=2.5)
+        batcher.add("d.csv", "cc", now=2.5)
+        self.assertTrue(batcher.ready(now=2.5), "A full batch should load straight away")
+        self.assertEqual(batcher.take(), {"cc": ["a.csv", "c.csv"], "checking": ["b.csv"]},
+                         "Should take the oldest batch_size files, with a changed file keeping its place")
+        self.assertEqual(len(batcher), 1)
+
+        # Files that keep arriving don't hold a batch back past max_wait
+        batcher = watch_folders.IngestBatcher(batch_size=100, debounce=2.0, max_wait=5.0)
+        for i in range(5):
+            batcher.add(f"burst_{i}.csv", "cc", now=float(i))
+        self.assertFalse(batcher.ready(now=4.5))
+        batcher.add("burst_5.csv", "cc", now=5.0)
+        self.assertTrue(batcher.ready(now=5.5))
+
+        # A batch that failed to load goes back first in line, and nothing loads until the retry delay is up
+        batcher = watch_folders.IngestBatcher(batch_size=2, debounce=1.0, max_wait=10.0)
+        batcher.add("a.csv", "cc", now=0.0)
+        batcher.add("b.csv", "cc", now=0.0)
+        batcher.add("c.csv", "cc", now=0.0)
+        failed = batcher.take()
+        batcher.retry(failed, now=1.0, delay=5.0)
+        self.assertFalse(batcher.ready(now=5.5))
+        self.assertEqual(batcher.wait_time(now=5.5), 0.5)
+        self.assertTrue(batcher.ready(now=6.0))
+        self.assertEqual(batcher.take(), {"cc": ["a.csv", "b.csv"]})
+
+        with self.assertRaises(ValueError):
+            watch_folders.IngestBatcher(batch_size=0)
+
+    def test_watch_retries_failed_batch(self):
+        class FlakyDB:
+            # Fails its first load, as if the db were briefly unreachable
+            def __init__(self):
+                self.calls = []
+            def add_transactions_many(self, paths, source_info, max_workers):
+                self.calls.append(sorted(paths))
+                if len(self.calls) == 1:
+                    raise psycopg.OperationalError("connection refused")
+                return IngestReport(files=[FileIngestResult(path=p, staged=1, inserted=1) for p in paths])
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "statement.csv")
+            with open(path, "w") as f:
+                f.write("10/01/2025,-4.50,Watch cafe\n")
+
+            db = FlakyDB()
+            loaded = []
+            stop = threading.Event()
+            watcher = threading.Thread(target=watch_folders.watch, args=(db, {tmp_dir: "cc"}, stop),
+                                       kwargs=dict(debounce=0.05, poll_interval=0.05, retry_delay=0.2,
+                                                   on_batch=lambda accnt, report: loaded.append(accnt)))
+            watcher.start()
+            try:
+                deadline = time.monotonic() + 10
+                while len(loaded) == 0 and watcher.is_alive() and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            finally:
+                stop.set()
+                watcher.join()
+
+            self.assertEqual(db.calls, [[path], [path]], "The failed batch should be tried again")
+            self.assertEqual(loaded, ["cc"])
+
+    def test_watchers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            existing = os.path.join(tmp_dir, "existing.csv")
+            with open(existing, "w") as f:
+                f.write("09/03/2025,-12.00,Watch bakery\n")
+            with open(os.path.join(tmp_dir, ".partial.csv"), "w") as f:
+                f.write("09/03/2025,-12.00,Watch bakery\n")
+
+            for make_watcher in (lambda: watch_folders.PollingWatcher([tmp_dir], poll_interval=0.05),
+                                 lambda: watch_folders.InotifyWatcher([tmp_dir])):
+                try:
+                    watcher = make_watcher()
+                except OSError:
+                    continue # not on Linux: only polling can be tested
+                with self.subTest(watcher=type(watcher).__name__):
+                    new = os.path.join(tmp_dir, "new.csv")
+                    try:
+                        seen = []
+                        deadline = time.monotonic() + 5
+                        while existing not in seen and time.monotonic() < deadline:
+                            seen += watcher.poll(timeout=0.1)
+                        self.assertEqual(seen, [existing], "Files already there should be reported once")
+
+                        with open(new, "w") as f:
+                            f.write("09/04/2025,-30.10,Watch hardware\n")
+                        with open(os.path.join(tmp_dir, "notes.txt"), "w") as f:
+                            f.write("not a csv\n")
+                        seen = []
+                        deadline = time.monotonic() + 5
+                        while new not in seen and time.monotonic() < deadline:
+                            seen += watcher.poll(timeout=0.1)
+                        self.assertEqual(seen, [new])
+                        self.assertEqual(watcher.poll(timeout=0.1), [], "Nothing new should be reported")
+                    finally:
+                        watcher.close()
+                        os.remove(new)